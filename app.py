@@ -1,14 +1,40 @@
 from flask import Flask, render_template, request, redirect, url_for, flash, session
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
+import os
 from functools import wraps
+from repository import (
+    Repository, Program, Participant, Document, Course, Quiz, Video, Test, Certification
+)
+from storage import LogBackend
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-change-this-in-production'
 
+# FLASK_STORAGE=django reads and writes the Django project's database (see
+# shared_store.py). Otherwise set FLASK_DATA_DIR to keep data across restarts
+# and share it between worker processes; without it everything lives in
+# memory and is lost on restart
+SHARED_DB = os.environ.get('FLASK_STORAGE') == 'django'
+DATA_DIR = os.environ.get('FLASK_DATA_DIR')
+
+if SHARED_DB:
+    import shared_store
+    shared_store.setup()
+    shared_store.init_app(app)
+    render_template = shared_store.render_template  # the templates are Django templates
+    shared_repositories = shared_store.repositories()
+
+def make_repository(record_class, name):
+    if SHARED_DB:
+        return shared_repositories[name]
+    if DATA_DIR:
+        return Repository(record_class, backend=LogBackend(os.path.join(DATA_DIR, name), record_class))
+    return Repository(record_class)
+
 # Sample data structure - in a real app, this would be a database
-programs = []
-participants = []
+programs = make_repository(Program, 'programs')
+participants = make_repository(Participant, 'participants')
 
 # Admin credentials - In production, store these securely in environment variables or database
 # Default: username='admin', password='admin123' (CHANGE THIS!)
@@ -18,12 +44,12 @@ ADMIN_CREDENTIALS = {
 }
 
 # Content storage - In production, use a database
-documents = []
-courses = []
-quizzes = []
-videos = []
-tests = []
-certifications = []
+documents = make_repository(Document, 'documents')
+courses = make_repository(Course, 'courses')
+quizzes = make_repository(Quiz, 'quizzes')
+videos = make_repository(Video, 'videos')
+tests = make_repository(Test, 'tests')
+certifications = make_repository(Certification, 'certifications')
 
 # Authentication decorator
 def login_required(f):
@@ -38,27 +64,25 @@ def login_required(f):
 @app.route('/')
 def index():
     """Home page"""
-    return render_template('index.html', programs=programs, participant_count=len(participants))
+    return render_template('index.html', programs=programs.all(), participant_count=len(participants))
 
 @app.route('/programs')
 def list_programs():
     """List all programs"""
-    return render_template('programs.html', programs=programs)
+    return render_template('programs.html', programs=programs.all())
 
 @app.route('/programs/new', methods=['GET', 'POST'])
 def new_program():
     """Create a new program"""
     if request.method == 'POST':
-        program = {
-            'id': len(programs) + 1,
-            'title': request.form['title'],
-            'description': request.form['description'],
-            'date': request.form['date'],
-            'time': request.form['time'],
-            'location': request.form['location'],
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        programs.append(program)
+        program = programs.add(
+            title=request.form['title'],
+            description=request.form['description'],
+            date=request.form['date'],
+            time=request.form['time'],
+            location=request.form['location'],
+            created_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        )
         flash('Program created successfully!', 'success')
         return redirect(url_for('list_programs'))
     return render_template('new_program.html')
@@ -66,21 +90,19 @@ def new_program():
 @app.route('/participants')
 def list_participants():
     """List all participants"""
-    return render_template('participants.html', participants=participants)
+    return render_template('participants.html', participants=participants.all())
 
 @app.route('/participants/new', methods=['GET', 'POST'])
 def new_participant():
     """Register a new participant"""
     if request.method == 'POST':
-        participant = {
-            'id': len(participants) + 1,
-            'name': request.form['name'],
-            'email': request.form['email'],
-            'phone': request.form['phone'],
-            'children_ages': request.form['children_ages'],
-            'registered_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        participants.append(participant)
+        participant = participants.add(
+            name=request.form['name'],
+            email=request.form['email'],
+            phone=request.form['phone'],
+            children_ages=request.form['children_ages'],
+            registered_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        )
         flash('Participant registered successfully!', 'success')
         return redirect(url_for('list_participants'))
     return render_template('new_participant.html')
@@ -157,22 +179,20 @@ def admin_dashboard():
 @login_required
 def list_documents():
     """List all documents"""
-    return render_template('admin/documents/list.html', documents=documents)
+    return render_template('admin/documents/list.html', documents=documents.all())
 
 @app.route('/admin/documents/new', methods=['GET', 'POST'])
 @login_required
 def new_document():
     """Create a new document"""
     if request.method == 'POST':
-        document = {
-            'id': len(documents) + 1,
-            'title': request.form['title'],
-            'content': request.form['content'],
-            'category': request.form.get('category', 'General'),
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'created_by': session.get('admin_username', 'Admin')
-        }
-        documents.append(document)
+        document = documents.add(
+            title=request.form['title'],
+            content=request.form['content'],
+            category=request.form.get('category', 'General'),
+            created_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            created_by=session.get('admin_username', 'Admin')
+        )
         flash('Document created successfully!', 'success')
         return redirect(url_for('list_documents'))
     return render_template('admin/documents/new.html')
@@ -181,7 +201,7 @@ def new_document():
 @login_required
 def view_document(doc_id):
     """View a document"""
-    document = next((d for d in documents if d['id'] == doc_id), None)
+    document = documents.get(doc_id)
     if not document:
         flash('Document not found.', 'error')
         return redirect(url_for('list_documents'))
@@ -193,24 +213,22 @@ def view_document(doc_id):
 @login_required
 def list_courses():
     """List all courses"""
-    return render_template('admin/courses/list.html', courses=courses)
+    return render_template('admin/courses/list.html', courses=courses.all())
 
 @app.route('/admin/courses/new', methods=['GET', 'POST'])
 @login_required
 def new_course():
     """Create a new course"""
     if request.method == 'POST':
-        course = {
-            'id': len(courses) + 1,
-            'title': request.form['title'],
-            'description': request.form['description'],
-            'content': request.form['content'],
-            'duration': request.form.get('duration', ''),
-            'level': request.form.get('level', 'Beginner'),
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'created_by': session.get('admin_username', 'Admin')
-        }
-        courses.append(course)
+        course = courses.add(
+            title=request.form['title'],
+            description=request.form['description'],
+            content=request.form['content'],
+            duration=request.form.get('duration', ''),
+            level=request.form.get('level', 'Beginner'),
+            created_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            created_by=session.get('admin_username', 'Admin')
+        )
         flash('Course created successfully!', 'success')
         return redirect(url_for('list_courses'))
     return render_template('admin/courses/new.html')
@@ -219,7 +237,7 @@ def new_course():
 @login_required
 def view_course(course_id):
     """View a course"""
-    course = next((c for c in courses if c['id'] == course_id), None)
+    course = courses.get(course_id)
     if not course:
         flash('Course not found.', 'error')
         return redirect(url_for('list_courses'))
@@ -231,7 +249,7 @@ def view_course(course_id):
 @login_required
 def list_quizzes():
     """List all quizzes"""
-    return render_template('admin/quizzes/list.html', quizzes=quizzes)
+    return render_template('admin/quizzes/list.html', quizzes=quizzes.all())
 
 @app.route('/admin/quizzes/new', methods=['GET', 'POST'])
 @login_required
@@ -254,16 +272,14 @@ def new_quiz():
                     'correct_answer': int(request.form.get(f'correct_{i}', 1))
                 })
         
-        quiz = {
-            'id': len(quizzes) + 1,
-            'title': request.form['title'],
-            'description': request.form['description'],
-            'questions': questions,
-            'time_limit': request.form.get('time_limit', ''),
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'created_by': session.get('admin_username', 'Admin')
-        }
-        quizzes.append(quiz)
+        quiz = quizzes.add(
+            title=request.form['title'],
+            description=request.form['description'],
+            questions=questions,
+            time_limit=request.form.get('time_limit', ''),
+            created_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            created_by=session.get('admin_username', 'Admin')
+        )
         flash('Quiz created successfully!', 'success')
         return redirect(url_for('list_quizzes'))
     return render_template('admin/quizzes/new.html')
@@ -272,7 +288,7 @@ def new_quiz():
 @login_required
 def view_quiz(quiz_id):
     """View a quiz"""
-    quiz = next((q for q in quizzes if q['id'] == quiz_id), None)
+    quiz = quizzes.get(quiz_id)
     if not quiz:
         flash('Quiz not found.', 'error')
         return redirect(url_for('list_quizzes'))
@@ -284,25 +300,23 @@ def view_quiz(quiz_id):
 @login_required
 def list_videos():
     """List all videos"""
-    return render_template('admin/videos/list.html', videos=videos)
+    return render_template('admin/videos/list.html', videos=videos.all())
 
 @app.route('/admin/videos/new', methods=['GET', 'POST'])
 @login_required
 def new_video():
     """Create a new video"""
     if request.method == 'POST':
-        video = {
-            'id': len(videos) + 1,
-            'title': request.form['title'],
-            'description': request.form['description'],
-            'video_url': request.form['video_url'],
-            'thumbnail_url': request.form.get('thumbnail_url', ''),
-            'duration': request.form.get('duration', ''),
-            'category': request.form.get('category', 'General'),
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'created_by': session.get('admin_username', 'Admin')
-        }
-        videos.append(video)
+        video = videos.add(
+            title=request.form['title'],
+            description=request.form['description'],
+            video_url=request.form['video_url'],
+            thumbnail_url=request.form.get('thumbnail_url', ''),
+            duration=request.form.get('duration', ''),
+            category=request.form.get('category', 'General'),
+            created_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            created_by=session.get('admin_username', 'Admin')
+        )
         flash('Video added successfully!', 'success')
         return redirect(url_for('list_videos'))
     return render_template('admin/videos/new.html')
@@ -311,7 +325,7 @@ def new_video():
 @login_required
 def view_video(video_id):
     """View a video"""
-    video = next((v for v in videos if v['id'] == video_id), None)
+    video = videos.get(video_id)
     if not video:
         flash('Video not found.', 'error')
         return redirect(url_for('list_videos'))
@@ -323,7 +337,7 @@ def view_video(video_id):
 @login_required
 def list_tests():
     """List all tests"""
-    return render_template('admin/tests/list.html', tests=tests)
+    return render_template('admin/tests/list.html', tests=tests.all())
 
 @app.route('/admin/tests/new', methods=['GET', 'POST'])
 @login_required
@@ -347,17 +361,15 @@ def new_test():
                     'points': int(request.form.get(f'points_{i}', 1))
                 })
         
-        test = {
-            'id': len(tests) + 1,
-            'title': request.form['title'],
-            'description': request.form['description'],
-            'questions': questions,
-            'time_limit': request.form.get('time_limit', ''),
-            'passing_score': int(request.form.get('passing_score', 70)),
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'created_by': session.get('admin_username', 'Admin')
-        }
-        tests.append(test)
+        test = tests.add(
+            title=request.form['title'],
+            description=request.form['description'],
+            questions=questions,
+            time_limit=request.form.get('time_limit', ''),
+            passing_score=int(request.form.get('passing_score', 70)),
+            created_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            created_by=session.get('admin_username', 'Admin')
+        )
         flash('Test created successfully!', 'success')
         return redirect(url_for('list_tests'))
     return render_template('admin/tests/new.html')
@@ -366,7 +378,7 @@ def new_test():
 @login_required
 def view_test(test_id):
     """View a test"""
-    test = next((t for t in tests if t['id'] == test_id), None)
+    test = tests.get(test_id)
     if not test:
         flash('Test not found.', 'error')
         return redirect(url_for('list_tests'))
@@ -380,33 +392,31 @@ def view_test(test_id):
 @login_required
 def list_certifications():
     """List all certifications"""
-    return render_template('admin/certifications/list.html', certifications=certifications)
+    return render_template('admin/certifications/list.html', certifications=certifications.all())
 
 @app.route('/admin/certifications/new', methods=['GET', 'POST'])
 @login_required
 def new_certification():
     """Create a new certification"""
     if request.method == 'POST':
-        certification = {
-            'id': len(certifications) + 1,
-            'title': request.form['title'],
-            'description': request.form['description'],
-            'requirements': request.form['requirements'],
-            'validity_period': request.form.get('validity_period', ''),
-            'associated_course': request.form.get('associated_course', ''),
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'created_by': session.get('admin_username', 'Admin')
-        }
-        certifications.append(certification)
+        certification = certifications.add(
+            title=request.form['title'],
+            description=request.form['description'],
+            requirements=request.form['requirements'],
+            validity_period=request.form.get('validity_period', ''),
+            associated_course=request.form.get('associated_course', ''),
+            created_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            created_by=session.get('admin_username', 'Admin')
+        )
         flash('Certification created successfully!', 'success')
         return redirect(url_for('list_certifications'))
-    return render_template('admin/certifications/new.html', courses=courses)
+    return render_template('admin/certifications/new.html', courses=courses.all())
 
 @app.route('/admin/certifications/<int:cert_id>')
 @login_required
 def view_certification(cert_id):
     """View a certification"""
-    certification = next((c for c in certifications if c['id'] == cert_id), None)
+    certification = certifications.get(cert_id)
     if not certification:
         flash('Certification not found.', 'error')
         return redirect(url_for('list_certifications'))
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main.instrumentation.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,7 +57,8 @@ ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that also reports render time to PerformanceMiddleware
+        'BACKEND': 'main.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -77,6 +81,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'TEST': {
+            # A file rather than SQLite's in-memory default, whose shared-cache table locks
+            # fail concurrent writers outright; the enrollment tests run many at once.
+            # In the temp directory, so test runs leave nothing in the checkout.
+            'NAME': Path(tempfile.gettempdir()) / 'parent_enrichment_test_db.sqlite3',
+        },
     }
 }
 
@@ -123,3 +133,56 @@ STATICFILES_DIRS = [
 # Media files (user uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Cache, sessions and logins (see main/auth.py and main/caching.py). With
+# REDIS_URL set (redis://host:6379/0; needs the redis package) every process
+# shares one cache, so sessions are read from it (cached_db) and users and
+# permissions come from CachedModelBackend. Without it each process has its
+# own LocMemCache, which can't tell the others about a logout or a
+# deactivated user, so sessions and users are read from the database; the
+# main.E001/E002 system checks refuse the cached ones over a per-process cache.
+REDIS_URL = os.environ.get('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+    }
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    AUTHENTICATION_BACKENDS = ['main.auth.CachedModelBackend']
+else:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+    AUTHENTICATION_BACKENDS = ['django.contrib.auth.backends.ModelBackend']
+# Seconds a user and their permissions are served from the cache without a query
+AUTH_CACHE_TIMEOUT = 300
+
+# Outbound email, sent in batches by the run_jobs workers (see main/notifications.py).
+# For development, `python manage.py smtp_standin` accepts mail on port 1025.
+EMAIL_HOST = 'localhost'
+EMAIL_PORT = 1025 if DEBUG else 25
+EMAIL_TIMEOUT = 30
+DEFAULT_FROM_EMAIL = 'Parent Enrichment Program <noreply@localhost>'
+
+# PayPal IPN: notifications are verified by posting them back to this URL.
+# Use https://ipnpb.sandbox.paypal.com/cgi-bin/webscr for sandbox testing, or
+# the paypal_ipn_standin command's address for local testing.
+PAYPAL_IPN_VERIFY_URL = 'https://ipnpb.paypal.com/cgi-bin/webscr'
+# If set, notifications for any other receiver_email are rejected
+PAYPAL_RECEIVER_EMAIL = ''
+# If set, notifications in any other mc_currency are rejected
+PAYPAL_CURRENCY = 'USD'
+
+# Request instrumentation (see main/instrumentation.py)
+# Add Server-Timing headers with DB/template/total time to every response
+PERFORMANCE_SERVER_TIMING = DEBUG
+# Log a warning when a view runs more queries than this
+PERFORMANCE_QUERY_BUDGET = 50
+# Per-view overrides, keyed by URL name, e.g. {'main:admin_dashboard': 20}
+PERFORMANCE_QUERY_BUDGETS = {}
+# Log a possible N+1 when one query shape runs this many times in a request (0 = off)
+PERFORMANCE_NPLUSONE_THRESHOLD = 5 if DEBUG else 0
+# Opt-in allowlist of addresses (e.g. a Prometheus scraper) that may read /metrics/
+# without a staff login. Empty means staff only; behind a reverse proxy every request
+# arrives from the proxy's address, so don't list it there
+PERFORMANCE_METRICS_IPS = []
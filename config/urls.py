@@ -20,8 +20,9 @@ from django.conf import settings
 from django.conf.urls.static import static
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    # main comes first: its admin/... pages would otherwise fall into the Django admin's catch-all
     path('', include('main.urls')),
+    path('admin/', admin.site.urls),
 ]
 
 # Serve media files during development
@@ -1,19 +1,46 @@
 from django.contrib import admin
+from .changelists import LargeTableAdminMixin
+from .forms import ProgramForm
 from .models import (
-    Program, Participant, Document, Course, Quiz, QuizQuestion,
+    Program, Participant, Enrollment, Document, Course, Quiz, QuizQuestion,
     Video, Test, TestQuestion, Certification, MemberDocument,
-    VendorSubmission, Donation, FundDistribution, DataVaultItem
+    VendorSubmission, Donation, FundDistribution, DataVaultItem, VendorPriceItem,
+    PaymentNotification, Job, Notification
 )
 
 
 @admin.register(Program)
 class ProgramAdmin(admin.ModelAdmin):
-    list_display = ['title', 'date', 'time', 'location', 'created_at']
+    form = ProgramForm  # same double-booking check as the new program page
+    list_display = ['title', 'date', 'time', 'duration_minutes', 'location', 'capacity', 'seats_taken', 'min_age', 'max_age', 'created_at']
     list_filter = ['date', 'created_at']
     search_fields = ['title', 'description', 'location']
     date_hierarchy = 'created_at'
 
 
+@admin.register(Enrollment)
+class EnrollmentAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ['participant', 'program', 'status', 'created_at', 'enrolled_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['participant__name', 'participant__email', 'program__title']
+    raw_id_fields = ['program', 'participant']
+    # Seats and waitlist places come from the enrollment page; cancel here rather than edit
+    readonly_fields = ['status', 'created_at', 'enrolled_at']
+    actions = ['cancel_enrollments']
+
+    def has_add_permission(self, request):
+        return False
+
+    def cancel_enrollments(self, request, queryset):
+        from .enrollment import cancel
+        cancelled = promoted = 0
+        for enrollment in queryset.exclude(status='CANCELLED'):
+            promoted += len(cancel(enrollment))
+            cancelled += 1
+        self.message_user(request, f'{cancelled} enrollment(s) cancelled, {promoted} promoted from the waitlist.')
+    cancel_enrollments.short_description = 'Cancel selected enrollments (frees seats for the waitlist)'
+
+
 @admin.register(Participant)
 class ParticipantAdmin(admin.ModelAdmin):
     list_display = ['name', 'email', 'phone', 'registered_at']
@@ -135,11 +162,25 @@ class CertificationAdmin(admin.ModelAdmin):
 
 
 @admin.register(MemberDocument)
-class MemberDocumentAdmin(admin.ModelAdmin):
-    list_display = ['participant', 'document_type', 'is_verified', 'uploaded_at']
-    list_filter = ['document_type', 'is_verified', 'uploaded_at']
+class MemberDocumentAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ['participant', 'document_type', 'is_reviewed', 'is_verified', 'uploaded_at']
+    list_filter = ['document_type', 'is_reviewed', 'is_verified', 'uploaded_at']
     search_fields = ['participant__name', 'participant__email', 'notes']
     date_hierarchy = 'uploaded_at'
+    readonly_fields = ['reviewed_at']
+    actions = ['mark_verified', 'mark_rejected']
+
+    def mark_verified(self, request, queryset):
+        from django.utils import timezone
+        updated = queryset.update(is_reviewed=True, is_verified=True, reviewed_at=timezone.now())
+        self.message_user(request, f'{updated} document(s) marked as verified.')
+    mark_verified.short_description = 'Mark selected documents as verified'
+
+    def mark_rejected(self, request, queryset):
+        from django.utils import timezone
+        updated = queryset.update(is_reviewed=True, is_verified=False, reviewed_at=timezone.now())
+        self.message_user(request, f'{updated} document(s) marked as rejected.')
+    mark_rejected.short_description = 'Mark selected documents as rejected'
 
 
 @admin.register(VendorSubmission)
@@ -148,11 +189,29 @@ class VendorSubmissionAdmin(admin.ModelAdmin):
     list_filter = ['is_reviewed', 'is_approved', 'submitted_at', 'frequency']
     search_fields = ['service_name', 'business_name', 'contact_name', 'email', 'description']
     date_hierarchy = 'submitted_at'
-    readonly_fields = ['submitted_at']
+    readonly_fields = ['submitted_at', 'price_list_updated_at', 'price_list_ingested_at']
+    actions = ['ingest_price_lists']
+
+    def ingest_price_lists(self, request, queryset):
+        from .jobs import enqueue
+        queued = 0
+        for vendor_id in queryset.exclude(price_list='').values_list('id', flat=True):
+            queued += enqueue('ingest_price_list', {'vendor_id': vendor_id}, key=f'price_list:{vendor_id}') is not None
+        self.message_user(request, f'{queued} price list(s) queued for loading; see Jobs for the outcome.')
+    ingest_price_lists.short_description = 'Load price lists into the pricing catalog'
+
+
+@admin.register(VendorPriceItem)
+class VendorPriceItemAdmin(admin.ModelAdmin):
+    list_display = ['item', 'category', 'price', 'unit', 'discount_percentage', 'vendor']
+    list_filter = ['category']
+    search_fields = ['item', 'category', 'vendor__service_name']
+    list_select_related = ['vendor']
+    raw_id_fields = ['vendor']
 
 
 @admin.register(Donation)
-class DonationAdmin(admin.ModelAdmin):
+class DonationAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ['donor_name', 'donor_email', 'amount', 'status', 'payment_method', 'donated_at']
     list_filter = ['status', 'payment_method', 'donated_at']
     search_fields = ['donor_name', 'donor_email', 'transaction_id', 'notes']
@@ -171,8 +230,55 @@ class DonationAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(PaymentNotification)
+class PaymentNotificationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'provider', 'received_at', 'processed_at', 'attempts', 'next_attempt_at', 'donation']
+    list_filter = ['provider', 'processed_at']
+    search_fields = ['payload', 'error']
+    list_select_related = ['donation']
+    readonly_fields = ['provider', 'payload', 'received_at', 'processed_at', 'attempts', 'next_attempt_at', 'claimed_by',
+                       'error', 'donation']
+
+
+@admin.register(Job)
+class JobAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'priority', 'attempts', 'run_at', 'locked_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'name']
+    search_fields = ['name', 'key', 'error']
+    readonly_fields = ['name', 'kwargs', 'key', 'status', 'attempts', 'locked_by', 'locked_at', 'error', 'created_at', 'finished_at']
+    actions = ['retry_jobs']
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry_jobs(self, request, queryset):
+        from django.utils import timezone
+        # Keys are cleared: a job with the same key may be queued already
+        retried = queryset.filter(status='FAILED').update(
+            status='QUEUED', key='', attempts=0, run_at=timezone.now(), finished_at=None)
+        self.message_user(request, f'{retried} failed job(s) queued again.')
+    retry_jobs.short_description = 'Retry selected failed jobs'
+
+
+@admin.register(Notification)
+class NotificationAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ['template', 'to_email', 'status', 'attempts', 'created_at', 'sent_at']
+    list_filter = ['status', 'template']
+    search_fields = ['to_email', 'error']
+    readonly_fields = ['template', 'to_email', 'context', 'status', 'attempts', 'claimed_by', 'claimed_at', 'error', 'created_at', 'sent_at']
+    actions = ['resend_notifications']
+
+    def has_add_permission(self, request):
+        return False
+
+    def resend_notifications(self, request, queryset):
+        resent = queryset.filter(status='FAILED').update(status='PENDING', attempts=0)
+        self.message_user(request, f'{resent} failed notification(s) queued to send again.')
+    resend_notifications.short_description = 'Send selected failed notifications again'
+
+
 @admin.register(FundDistribution)
-class FundDistributionAdmin(admin.ModelAdmin):
+class FundDistributionAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ['vendor', 'donation', 'amount', 'status', 'created_by', 'created_at', 'distributed_at']
     list_filter = ['status', 'created_at', 'distributed_at']
     search_fields = ['vendor__service_name', 'vendor__contact_name', 'donation__donor_name', 'purpose', 'notes']
@@ -192,7 +298,7 @@ class FundDistributionAdmin(admin.ModelAdmin):
 
 
 @admin.register(DataVaultItem)
-class DataVaultItemAdmin(admin.ModelAdmin):
+class DataVaultItemAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ['title', 'category', 'participant', 'vendor', 'uploaded_by', 'uploaded_at', 'expires_at', 'access_count']
     list_filter = ['category', 'is_encrypted', 'uploaded_at', 'expires_at']
     search_fields = ['title', 'description', 'tags', 'participant__name', 'vendor__service_name']
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class MainConfig(AppConfig):
     name = 'main'
+
+    def ready(self):
+        from django.core import checks
+
+        from . import caching, signals, tasks  # noqa: F401
+        checks.register(caching.check_shared_cache, checks.Tags.caches)
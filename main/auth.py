@@ -0,0 +1,117 @@
+"""
+Cached users and permissions for logged-in requests.
+
+With database sessions and the stock ModelBackend, every request from a
+logged-in user reads its session row and then its User row, and the first
+permission check reads the user's and groups' permissions, all before the
+view runs. Staff pages pay this on every request.
+
+* SESSION_ENGINE is cached_db (config/settings.py, once REDIS_URL is set):
+  sessions are read from the cache and only fall back to the database on a
+  miss, and are still written to both, so they survive a cache restart;
+* CachedModelBackend serves the User row from the cache (for up to
+  AUTH_CACHE_TIMEOUT seconds), and the permission set too, cached per user
+  under a generation that every group permission change bumps.
+
+Django still checks the session's password hash against the cached user
+on every request, so changing a password logs out other sessions at once.
+Saving or deleting a user, or changing their groups or permissions,
+deletes their entries (main/signals.py); changes that bypass signals, such
+as QuerySet.update(), take up to AUTH_CACHE_TIMEOUT to be seen. CACHES
+must be a backend every process shares, so a deactivated user or a logout
+is seen by all of them: without REDIS_URL the settings use database
+sessions and ModelBackend instead, and the main.E001/E002 system checks
+(main/caching.py) reject the cached ones over LocMemCache.
+
+To compare queries and latency of the staff pages against plain database
+sessions and ModelBackend:
+``python manage.py shell -c "from main.auth import _benchmark; _benchmark()"``
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+CACHE_PREFIX = 'main:auth'
+GENERATION_KEY = f'{CACHE_PREFIX}:generation'
+
+
+def timeout():
+    return getattr(settings, 'AUTH_CACHE_TIMEOUT', 300)
+
+
+def user_key(user_id):
+    return f'{CACHE_PREFIX}:user:{user_id}'
+
+
+def permissions_key(user_id):
+    return f'{CACHE_PREFIX}:permissions:{user_id}'
+
+
+def invalidate(*user_ids):
+    """Forget cached users and permissions; with no ids, every user's permissions (after group changes)"""
+    if user_ids:
+        cache.delete_many([key for user_id in user_ids for key in (user_key(user_id), permissions_key(user_id))])
+    else:
+        cache.set(GENERATION_KEY, time.time_ns(), None)
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend that keeps users and their permission sets in the cache"""
+
+    def get_user(self, user_id):
+        user = cache.get(user_key(user_id))
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(user_key(user_id), user, timeout())
+            return user
+        return user if self.user_can_authenticate(user) else None
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if not hasattr(user_obj, '_perm_cache'):
+            key = permissions_key(user_obj.pk)
+            cached = cache.get_many([GENERATION_KEY, key])
+            generation = cached.get(GENERATION_KEY, 0)
+            if key in cached and cached[key][0] == generation:
+                user_obj._perm_cache = cached[key][1]
+            else:
+                cache.set(key, (generation, super().get_all_permissions(user_obj)), timeout())
+        return user_obj._perm_cache
+
+
+def _benchmark(scale=200, requests=200):
+    from django.db import connection
+    from django.test import override_settings
+    from django.test.utils import setup_test_environment
+
+    from . import benchmarks
+    from .synthetic import STAFF_USERNAME, generate
+
+    pages = ['admin_dashboard', 'fund_distribution_list', 'fund_distribution_new', 'member_document_review',
+             'data_vault_list', 'vendor_catalog', 'financial_report']
+    plain = override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db',
+                              AUTHENTICATION_BACKENDS=['django.contrib.auth.backends.ModelBackend'])
+    cached = override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+                               AUTHENTICATION_BACKENDS=['main.auth.CachedModelBackend'])
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        print(f'Generating data for {scale} participants...')
+        generate(scale)
+        user = benchmarks.benchmark_user(STAFF_USERNAME)
+        benchmarks.run(user, requests=20, warmup=0, only=pages)  # first requests pay one-off costs; don't pin them on either side
+        with plain:
+            before = benchmarks.run(user, requests=requests, warmup=10, only=pages)
+        cache.clear()
+        with cached:
+            after = benchmarks.run(user, requests=requests, warmup=10, only=pages)
+        print(f'{"":<34} {"p50 before":>10} {"after":>9}          queries')
+        for label, old_p50, new_p50, change, old_queries, new_queries, _ in benchmarks.compare(before, after):
+            print(f'{label:<34} {old_p50:7.2f} ms {new_p50:6.2f} ms {change:+7.1%}  {old_queries} -> {new_queries}')
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,228 @@
+"""
+End-to-end benchmark of every page in main/urls.py.
+
+run() requests each URL through the Django test client, so every request
+goes through the full middleware stack and template rendering but no
+network. It records wall time per request, plus the query count, database
+time and template time that PerformanceMiddleware leaves on the request.
+Each request runs inside a transaction that is rolled back afterwards, so
+POSTs (approving a distribution, recording an IPN) leave the data as they
+found it and can be repeated.
+
+CASES says how to request each URL: which row to point it at, what query
+string or POST body to send. run() fails if a URL in main/urls.py has no
+case, so new pages can't drop out of the benchmark unnoticed.
+
+Results are a JSON-serialisable dict. Save one per commit, and use compare()
+to line two up (see the ``benchmark`` management command).
+"""
+import statistics
+import subprocess
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+
+from .enrollment import confirmation_token
+from .exports import EXPORTS
+from .loadtest import percentile
+from .models import Program, Participant, MemberDocument, VendorSubmission, Donation, FundDistribution, DataVaultItem
+from .previews import PREVIEW_DIR, preview_name
+from .synthetic import SAMPLE_DOCUMENT
+
+# Changes smaller than this fraction of the old time are reported as noise
+NOISE = 0.10
+
+
+def first_id(queryset):
+    return queryset.order_by('-id').values_list('id', flat=True).first()
+
+
+def vendor_ids():
+    return ','.join(map(str, VendorSubmission.objects.filter(is_approved=True).order_by('id').values_list('id', flat=True)[:5]))
+
+
+def enrollment_token():
+    return confirmation_token(first_id(Program.objects), first_id(Participant.objects))
+
+
+# URL name -> list of (label, method, lazy URL args, query string / POST body)
+# Callables are evaluated once, just before the URL is benchmarked.
+CASES = {
+    'index': [('index', 'get', None, None)],
+    'about': [('about', 'get', None, None)],
+    'list_programs': [('list_programs', 'get', None, None)],
+    'program_calendar': [('program_calendar', 'get', None, None)],
+    'program_detail': [('program_detail', 'get', lambda: [first_id(Program.objects)], None)],
+    'program_enroll': [
+        ('program_enroll', 'get', lambda: [first_id(Program.objects)], None),
+        ('program_enroll:post', 'post', lambda: [first_id(Program.objects)],
+         lambda: {'email': Participant.objects.order_by('-id').values_list('email', flat=True).first()}),
+    ],
+    'program_enroll_confirm': [
+        ('program_enroll_confirm', 'get', lambda: [enrollment_token()], None),
+        ('program_enroll_confirm:post', 'post', lambda: [enrollment_token()], None),
+    ],
+    'new_program': [('new_program', 'get', None, None)],
+    'list_participants': [('list_participants', 'get', None, None)],
+    'new_participant': [('new_participant', 'get', None, None)],
+    'membership': [('membership', 'get', None, None)],
+    'upload_document': [('upload_document', 'get', None, None)],
+    'donate': [('donate', 'get', None, None)],
+    'paypal_ipn': [('paypal_ipn', 'post', None, {'txn_id': 'BENCHMARK', 'payment_status': 'Completed', 'mc_gross': '25.00',
+                                           'mc_currency': 'USD'})],
+    'vendor': [('vendor', 'get', None, None)],
+    'member_savings': [
+        ('member_savings', 'get', None, None),
+        ('member_savings:bundle', 'get', None, lambda: {'vendors': vendor_ids()}),
+    ],
+    'metrics': [('metrics', 'get', None, None)],
+    'register': [('register', 'get', None, None)],
+    'admin_login': [('admin_login', 'get', None, None)],
+    'admin_dashboard': [('admin_dashboard', 'get', None, None)],
+    'participant_import': [('participant_import', 'get', None, None)],
+    'fund_distribution_list': [('fund_distribution_list', 'get', None, None)],
+    'fund_distribution_new': [('fund_distribution_new', 'get', None, None)],
+    'fund_distribution_donations': [('fund_distribution_donations', 'get', None, {'q': 'ma'})],
+    'fund_distribution_vendors': [('fund_distribution_vendors', 'get', None, {'q': 'tu'})],
+    'fund_distribution_approve': [
+        ('fund_distribution_approve', 'post', lambda: [first_id(FundDistribution.objects.filter(status='PENDING'))], None),
+    ],
+    'fund_distribution_distribute': [
+        ('fund_distribution_distribute', 'post', lambda: [first_id(FundDistribution.objects.filter(status='APPROVED'))], None),
+    ],
+    'member_document_review': [('member_document_review', 'get', None, None)],
+    'vendor_catalog': [('vendor_catalog', 'get', None, {'category': 'tutoring'})],
+    'financial_report': [('financial_report', 'get', None, None)],
+    'export_csv': [(f'export_csv:{name}', 'get', [name], None) for name in EXPORTS],
+    'preview': [('preview', 'get', [preview_name(SAMPLE_DOCUMENT)[len(PREVIEW_DIR) + 1:]], None)],
+    'data_vault_list': [
+        ('data_vault_list', 'get', None, None),
+        ('data_vault_list:search', 'get', None, {'q': 'certificate'}),
+    ],
+    'data_vault_upload': [('data_vault_upload', 'get', None, None)],
+    'data_vault_participants': [('data_vault_participants', 'get', None, {'q': 'parent1'})],
+    'data_vault_vendors': [('data_vault_vendors', 'get', None, {'q': 'tu'})],
+    'data_vault_view': [('data_vault_view', 'get', lambda: [first_id(DataVaultItem.objects)], None)],
+    'data_vault_download': [('data_vault_download', 'get', lambda: [first_id(DataVaultItem.objects)], None)],
+}
+
+
+def uncovered_urls():
+    """URL names in main/urls.py with no benchmark case"""
+    return sorted({pattern.name for pattern in get_resolver('main.urls').url_patterns} - set(CASES))
+
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def measure(client, method, url, data, requests, warmup):
+    timings, queries, db_time, template_time = [], [], [], []
+    status = size = 0
+    for i in range(warmup + requests):
+        with transaction.atomic():
+            started = time.perf_counter()
+            response = getattr(client, method)(url, data or {})
+            size = sum(map(len, response.streaming_content)) if response.streaming else len(response.content)
+            elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        status = response.status_code
+        if i < warmup:
+            continue
+        timings.append(elapsed)
+        metrics = getattr(response.wsgi_request, 'performance_metrics', None)
+        if metrics is not None:
+            queries.append(metrics.queries)
+            db_time.append(metrics.db_time)
+            template_time.append(metrics.template_time)
+    return {
+        'method': method.upper(),
+        'url': url,
+        'status': status,
+        'bytes': size,
+        'requests': requests,
+        'p50_ms': percentile(timings, 50) * 1000,
+        'p95_ms': percentile(timings, 95) * 1000,
+        'p99_ms': percentile(timings, 99) * 1000,
+        'mean_ms': statistics.fmean(timings) * 1000,
+        'queries': max(queries) if queries else None,
+        'db_ms': statistics.fmean(db_time) * 1000 if db_time else None,
+        'template_ms': statistics.fmean(template_time) * 1000 if template_time else None,
+    }
+
+
+def run(user, requests=20, warmup=2, only=None, log=None):
+    """Benchmark every case (or just the URL names in `only`) as `user`; returns the results"""
+    missing = uncovered_urls()
+    if missing:
+        raise ValueError(f'No benchmark case for: {", ".join(missing)}')
+
+    client = Client()
+    client.force_login(user)
+    results = {
+        'commit': commit(),
+        'created': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'rows': {model.__name__: model.objects.count()
+                 for model in (Program, Participant, MemberDocument, VendorSubmission, Donation, FundDistribution, DataVaultItem)},
+        'views': {},
+    }
+    for name, cases in CASES.items():
+        if only and name not in only:
+            continue
+        for label, method, args, data in cases:
+            args = args() if callable(args) else args
+            data = data() if callable(data) else data
+            if args and None in args:
+                if log:
+                    log(f'{label}: skipped, no row to request')
+                continue
+            url = reverse(f'main:{name}', args=args)
+            if method == 'get' and data:
+                url = f'{url}?{urlencode(data)}'
+                data = None
+            results['views'][label] = result = measure(client, method, url, data, requests, warmup)
+            if log:
+                log(f'{label:<34} {result["status"]} p50 {result["p50_ms"]:8.2f} ms  p95 {result["p95_ms"]:8.2f} ms  '
+                    f'p99 {result["p99_ms"]:8.2f} ms  {result["queries"]} queries')
+    return results
+
+
+def compare(old, new):
+    """Rows of (label, old p50, new p50, change, old queries, new queries, verdict) for views in both runs"""
+    rows = []
+    for label, result in new['views'].items():
+        before = old['views'].get(label)
+        if before is None:
+            continue
+        change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] if before['p50_ms'] else 0.0
+        if result['queries'] is not None and before['queries'] is not None and result['queries'] > before['queries']:
+            verdict = 'more queries'
+        elif change > NOISE:
+            verdict = 'slower'
+        elif change < -NOISE:
+            verdict = 'faster'
+        else:
+            verdict = ''
+        rows.append((label, before['p50_ms'], result['p50_ms'], change, before['queries'], result['queries'], verdict))
+    return rows
+
+
+def benchmark_user(username=None):
+    """The staff user to benchmark as: `username`, or any superuser or staff member"""
+    if username:
+        return User.objects.get(username=username)
+    user = User.objects.filter(is_superuser=True).first() or User.objects.filter(is_staff=True).first()
+    if user is None:
+        raise User.DoesNotExist('No staff user to benchmark as')
+    return user
@@ -0,0 +1,46 @@
+"""
+Whether Django's cache can carry state between processes.
+
+The savings table (main/savings.py) and the calendar feed (main/schedule.py)
+are cached and invalidated by bumping version keys in the default cache.
+That only works if every process reads the same cache: with LocMemCache
+(Django's default) each process has its own, so a bump made in one worker
+is never seen by the others, which go on serving what they built before.
+Where is_shared() is false, those callers don't cache at all.
+
+Cached sessions and CachedModelBackend (main/auth.py) can't fall back like
+that, so check_shared_cache(), a system check, refuses them over a
+per-process cache: a logout or a deactivated user would go unseen by every
+other worker.
+"""
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+CACHED_SESSION_ENGINES = {'django.contrib.sessions.backends.cache', 'django.contrib.sessions.backends.cached_db'}
+
+
+def is_shared(alias='default'):
+    """False for a per-process cache (LocMemCache), which can't tell other processes about a change"""
+    return not isinstance(caches[alias], LocMemCache)
+
+
+def check_shared_cache(app_configs=None, **kwargs):
+    """System check: sessions and users are only cached in a cache every process shares"""
+    errors = []
+    if settings.SESSION_ENGINE in CACHED_SESSION_ENGINES and not is_shared(settings.SESSION_CACHE_ALIAS):
+        errors.append(checks.Error(
+            f'SESSION_ENGINE {settings.SESSION_ENGINE!r} keeps sessions in a per-process cache, '
+            f'where a logout is not seen by other processes.',
+            hint="Set REDIS_URL (or CACHES to another shared backend), or use 'django.contrib.sessions.backends.db'.",
+            id='main.E001',
+        ))
+    if 'main.auth.CachedModelBackend' in settings.AUTHENTICATION_BACKENDS and not is_shared():
+        errors.append(checks.Error(
+            'CachedModelBackend caches users in a per-process cache, '
+            'where a deactivated user or changed permission is not seen by other processes.',
+            hint="Set REDIS_URL (or CACHES to another shared backend), or use 'django.contrib.auth.backends.ModelBackend'.",
+            id='main.E002',
+        ))
+    return errors
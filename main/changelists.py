@@ -0,0 +1,272 @@
+"""
+Admin changelists for tables with hundreds of thousands of rows.
+
+A stock ModelAdmin changelist does several things that get slower with every
+row added:
+
+* ``COUNT(*)`` over the filtered queryset for the paginator, plus a second
+  one over the whole table for the "N total" link;
+* for ``date_hierarchy``, a MIN/MAX over the date column and a
+  ``SELECT DISTINCT`` of every year, month or day in the filtered rows;
+* for list_filter on a field without choices, a ``SELECT DISTINCT`` of the
+  whole column;
+* a plain ``select_related()`` for foreign-key columns, which skips nullable
+  foreign keys, so each row shown costs one more query per nullable column;
+* in the change form, a ``<select>`` holding every row of each related table.
+
+LargeTableAdminMixin replaces these with:
+
+* EstimatedCountPaginator: the planner's row estimate for the unfiltered
+  table (the highest id on SQLite). Filtered counts stop at
+  FILTERED_COUNT_LIMIT. Both only apply once the table holds more than
+  ESTIMATE_COUNT_ABOVE rows, so small tables still get exact counts;
+* date hierarchy links (per filter combination) and distinct-value filter
+  choices cached for FILTER_CACHE_SECONDS, so new dates and values can take
+  that long to appear;
+* select_related() naming every foreign key shown in list_display, nullable
+  or not, including ``fk__field`` columns;
+* autocomplete widgets for every foreign key whose admin has search_fields.
+
+Anything set explicitly on the admin class (list_select_related,
+autocomplete_fields, raw_id_fields) wins over the automatic choices.
+
+To time the changelists with and without the mixin:
+``python manage.py shell -c "from main.changelists import _benchmark; _benchmark()"``
+"""
+import hashlib
+
+from django.contrib.admin.filters import AllValuesFieldListFilter
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+from django.contrib.admin.utils import NotRelationField, get_fields_from_path
+from django.contrib.admin.views.main import ChangeList
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db import connections, models
+from django.utils.functional import cached_property
+
+# Tables estimated to hold more rows than this get estimated/limited counts
+ESTIMATE_COUNT_ABOVE = 100_000
+
+# Filtered changelists on large tables count at most this many rows
+FILTERED_COUNT_LIMIT = 10_000
+
+FILTER_CACHE_SECONDS = 300
+
+
+def estimated_row_count(model, using='default'):
+    """Cheap row count estimate for a model's table, or None if there isn't one"""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Kept current by autovacuum/ANALYZE; -1 if never analyzed
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute('SELECT table_rows FROM information_schema.tables '
+                           'WHERE table_schema = DATABASE() AND table_name = %s', [table])
+        elif connection.vendor == 'sqlite' and model._meta.pk.get_internal_type() in ('AutoField', 'BigAutoField'):
+            # An index seek; overestimates by the number of deleted rows
+            cursor.execute(f'SELECT MAX({connection.ops.quote_name(model._meta.pk.column)}) '
+                           f'FROM {connection.ops.quote_name(table)}')
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that avoids counting every row of a large table"""
+
+    # Set once count has been worked out: True if it is not an exact count
+    estimated = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        estimate = estimated_row_count(queryset.model, queryset.db)
+        if estimate is None or estimate <= ESTIMATE_COUNT_ABOVE:
+            return queryset.count()
+        if not queryset.query.where:
+            self.estimated = True
+            return estimate
+        # COUNT over a LIMITed subquery stops scanning once it has enough rows
+        count = queryset.order_by()[:FILTERED_COUNT_LIMIT].count()
+        self.estimated = count == FILTERED_COUNT_LIMIT
+        return count
+
+
+class LargeTableChangeList(ChangeList):
+    @cached_property
+    def date_hierarchy_links(self):
+        """What the date_hierarchy tag would show, cached per model and query string"""
+        params = repr(sorted(self.params.items()))
+        key = 'changelist-dates:%s:%s:%s' % (
+            self.opts.label_lower, self.date_hierarchy, hashlib.md5(params.encode()).hexdigest())
+        links = cache.get(key)
+        if links is None:
+            links = date_hierarchy(self)
+            cache.set(key, links, FILTER_CACHE_SECONDS)
+        return links
+
+
+class CachedAllValuesFieldListFilter(AllValuesFieldListFilter):
+    """AllValuesFieldListFilter with its SELECT DISTINCT cached"""
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        super().__init__(field, request, params, model, model_admin, field_path)
+        key = f'changelist-values:{model._meta.label_lower}:{field_path}'
+        choices = cache.get(key)
+        if choices is None:
+            choices = list(self.lookup_choices)
+            cache.set(key, choices, FILTER_CACHE_SECONDS)
+        self.lookup_choices = choices
+
+
+def related_columns(model, list_display):
+    """select_related() paths for the foreign keys list_display shows"""
+    paths = []
+    for name in list_display:
+        if not isinstance(name, str):
+            continue
+        try:
+            fields = get_fields_from_path(model, name)
+        except (FieldDoesNotExist, NotRelationField):
+            continue  # an admin method or model property
+        path = []
+        for field in fields:
+            if not (field.many_to_one or field.one_to_one) or not field.concrete:
+                break
+            path.append(field.name)
+        if path and name != fields[0].attname:  # 'vendor_id' needs no join
+            paths.append('__'.join(path))
+    return paths
+
+
+class LargeTableAdminMixin:
+    """ModelAdmin mixin for changelists over large tables (see module docstring)"""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/large_table_change_list.html'
+
+    def get_changelist(self, request, **kwargs):
+        return LargeTableChangeList
+
+    def get_list_select_related(self, request):
+        if self.list_select_related is not False:
+            return self.list_select_related
+        return related_columns(self.model, self.get_list_display(request))
+
+    def get_list_filter(self, request):
+        filters = []
+        for item in self.list_filter:
+            if isinstance(item, str):
+                try:
+                    field = get_fields_from_path(self.model, item)[-1]
+                except (FieldDoesNotExist, NotRelationField):
+                    pass
+                else:
+                    # The fields Django would give an AllValuesFieldListFilter
+                    if not (field.is_relation or field.flatchoices or isinstance(field, (models.BooleanField, models.DateField))):
+                        item = (item, CachedAllValuesFieldListFilter)
+            filters.append(item)
+        return filters
+
+    def get_autocomplete_fields(self, request):
+        if self.autocomplete_fields:
+            return self.autocomplete_fields
+        fields = []
+        for field in self.model._meta.get_fields():
+            if not (field.many_to_one or field.many_to_many) or not field.concrete or not field.editable:
+                continue
+            if field.name in self.raw_id_fields or not self.admin_site.is_registered(field.related_model):
+                continue
+            if self.admin_site.get_model_admin(field.related_model).search_fields:
+                fields.append(field.name)
+        return fields
+
+
+def _benchmark(rows=1_000_000, repeat=5):
+    import random
+    import statistics
+    import time
+    from datetime import datetime, timedelta, timezone as dt_timezone
+
+    from django.contrib import admin
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import RequestFactory
+    from django.test.utils import CaptureQueriesContext, setup_test_environment
+
+    from main.models import DataVaultItem, Donation, FundDistribution, MemberDocument, Participant, VendorSubmission
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        staff = User.objects.create_superuser('bench', 'bench@example.com', 'pw')
+        start = datetime(2021, 1, 1, tzinfo=dt_timezone.utc)
+        when = lambda i: start + timedelta(minutes=i * 2)  # noqa: E731 - spreads rows over ~4 years at 1M
+        Participant.objects.bulk_create([Participant(name=f'Parent {i}', email=f'p{i}@example.com', phone='555-0100')
+                                         for i in range(1000)])
+        VendorSubmission.objects.bulk_create([VendorSubmission(service_name=f'Service {i}', contact_name='Contact',
+                                                               email=f'v{i}@example.com', price_list='x.csv')
+                                              for i in range(200)])
+        participants = list(Participant.objects.values_list('id', flat=True))
+        vendors = list(VendorSubmission.objects.values_list('id', flat=True))
+        batch = 20_000
+        print(f'Loading {rows:,} rows into each table...')
+        for first in range(0, rows, batch):
+            ids = range(first, min(first + batch, rows))
+            Donation.objects.bulk_create([Donation(donor_name=f'Donor {i}', donor_email=f'd{i}@example.com', amount=50,
+                                                   status='COMPLETED', transaction_id=f'T{i}') for i in ids])
+            MemberDocument.objects.bulk_create([MemberDocument(participant_id=random.choice(participants), document_type='CPR',
+                                                               file=f'member_documents/{i}.pdf') for i in ids])
+            DataVaultItem.objects.bulk_create([DataVaultItem(title=f'Item {i}', file=f'data_vault/{i}.pdf', uploaded_by=staff,
+                                                             participant_id=random.choice(participants) if i % 2 else None,
+                                                             vendor_id=None if i % 2 else random.choice(vendors)) for i in ids])
+        donations = Donation.objects.values_list('id', flat=True)
+        for first in range(0, rows, batch):
+            FundDistribution.objects.bulk_create([
+                FundDistribution(donation_id=donation_id, vendor_id=random.choice(vendors), amount=25, purpose='Tutoring', created_by=staff)
+                for donation_id in donations[first:first + batch]
+            ])
+        # auto_now_add stamped everything with the load time; spread the dates out
+        for model, field in ((Donation, 'donated_at'), (MemberDocument, 'uploaded_at'),
+                             (DataVaultItem, 'uploaded_at'), (FundDistribution, 'created_at')):
+            with connection.cursor() as cursor:
+                table, column = model._meta.db_table, model._meta.get_field(field).column
+                cursor.execute(f"UPDATE {table} SET {column} = datetime('2021-01-01', '+' || (id * 2) || ' minutes')")
+        connection.cursor().execute('ANALYZE')
+
+        factory = RequestFactory()
+
+        def measure(model_admin, query):
+            def changelist():
+                request = factory.get('/' + query)
+                request.user = staff
+                return model_admin.changelist_view(request).render()
+            changelist()
+            connection.queries_log.clear()  # a full log would hide the queries captured below
+            times = []
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = changelist()
+                    times.append(time.perf_counter() - started)
+                assert response.status_code == 200, (model_admin, query, response.status_code)
+            return statistics.median(times) * 1000, len(queries)
+
+        year = when(rows // 2).year
+        print(f'{"changelist":>32} {"before":>18} {"after":>18}')
+        for model in (DataVaultItem, FundDistribution, MemberDocument, Donation):
+            tuned = admin.site.get_model_admin(model)
+            plain = type(type(tuned).__name__, (admin.ModelAdmin,), {
+                name: value for name, value in vars(type(tuned)).items() if not name.startswith('__') and name != 'media'})(model, admin.site)
+            for label, query in (('', ''), (' middle page', f'?p={rows // 200}'), (f' {year}', f'?{tuned.date_hierarchy}__year={year}')):
+                results = [measure(model_admin, query) for model_admin in (plain, tuned)]
+                print(f'{model.__name__ + label:>32} ' + ' '.join(f'{ms:8.1f} ms {count:3d} q' for ms, count in results))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
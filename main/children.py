@@ -0,0 +1,152 @@
+"""
+Children's ages as rows, for age-band queries.
+
+Participant.children_ages stays the free text parents type ("4, 7",
+"6 and 9", "18 months"). parse_children_ages() turns it into whole-year
+ages, and each child is kept as a ParticipantChild row holding an
+approximate birth year (the year the age was given, less the age), indexed,
+so "families with a child aged 8-12" is an index range scan instead of a
+scan and re-parse of every participant. Storing the birth year rather than
+the age keeps the rows right as the children grow: age bands are turned
+into birth years against the current year when queried. A birth year can
+be a year out (a child of 4 given in 2026 was born in 2021 or 2022).
+
+The rows follow the text: a post_save signal rewrites them when
+children_ages changes, and the bulk paths that skip signals (participant
+import, synthetic data) call add_children()/backfill_children() themselves.
+
+To time age-band queries over 1M participants:
+``python manage.py shell -c "from main.children import _benchmark; _benchmark()"``
+"""
+import re
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Participant, ParticipantChild
+
+# Larger numbers in children_ages are not ages (a birth year, say)
+MAX_CHILD_AGE = 21
+
+# A number, optionally followed by a months unit ("18 months", "9 mos")
+AGE_TOKEN = re.compile(r'(?<!\d)(\d+)\s*(months?|mos?\b|mths?\b)?', re.IGNORECASE)
+
+BATCH_SIZE = 5000
+
+
+def parse_children_ages(text):
+    """Whole-year ages mentioned in free text, in the order given"""
+    ages = []
+    for number, months in AGE_TOKEN.findall(text or ''):
+        age = int(number) // 12 if months else int(number)
+        if age <= MAX_CHILD_AGE:
+            ages.append(age)
+    return ages
+
+
+def child_rows(participants, year=None):
+    """
+    Unsaved ParticipantChild rows for saved participants, with the ages taken
+    as of `year` (default: each participant's registration year)
+    """
+    return [ParticipantChild(participant_id=participant.id,
+                             birth_year=(year or participant.registered_at.year) - age)
+            for participant in participants for age in parse_children_ages(participant.children_ages)]
+
+
+def add_children(participants):
+    """Child rows for participants just made with bulk_create, which skips the signal"""
+    if all(participant.id is not None for participant in participants):
+        ParticipantChild.objects.bulk_create(child_rows(participants))
+    else:  # the database didn't return the new ids (MySQL)
+        backfill_children()
+
+
+def set_children(participant, created=False):
+    """Replace a participant's child rows with the ages in its children_ages, as given today"""
+    with transaction.atomic():
+        if not created:
+            ParticipantChild.objects.filter(participant_id=participant.id).delete()
+        ParticipantChild.objects.bulk_create(child_rows([participant], timezone.now().year))
+
+
+def backfill_children(participants=None, batch_size=BATCH_SIZE):
+    """
+    Create child rows for participants (default: all) that have none, taking
+    the ages as of registration; returns rows created
+    """
+    participants = (participants if participants is not None else Participant.objects.all())
+    pending = (participants.filter(children__isnull=True).order_by('id')
+               .values_list('id', 'children_ages', 'registered_at'))
+    created = 0
+    last_id = 0
+    while batch := list(pending.filter(id__gt=last_id)[:batch_size]):
+        rows = [ParticipantChild(participant_id=participant_id, birth_year=registered_at.year - age)
+                for participant_id, text, registered_at in batch for age in parse_children_ages(text)]
+        ParticipantChild.objects.bulk_create(rows)
+        created += len(rows)
+        last_id = batch[-1][0]
+    return created
+
+
+def age_range(low, high):
+    """Filter for children aged low..high inclusive this year; None leaves that end open"""
+    year = timezone.now().year
+    return {'birth_year__lte': year - (low or 0), **({'birth_year__gte': year - high} if high is not None else {})}
+
+
+def with_children_aged(participants, low, high):
+    """Participants with at least one child aged low..high"""
+    return participants.filter(Exists(
+        ParticipantChild.objects.filter(participant=OuterRef('pk'), **age_range(low, high))
+    ))
+
+
+def count_families(low, high):
+    """Number of participants with a child aged low..high, counted from the age index alone"""
+    return (ParticipantChild.objects.filter(**age_range(low, high))
+            .order_by().values('participant_id').distinct().count())
+
+
+def _benchmark(participants=1_000_000, repeat=5):
+    import random
+    import statistics
+    import time
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        print(f'Loading {participants:,} participants...')
+        for first in range(0, participants, 20_000):
+            Participant.objects.bulk_create([
+                Participant(name=f'Parent {i}', email=f'p{i}@example.com', phone='555-0100',
+                            children_ages=', '.join(str(random.randrange(0, 18)) for _ in range(random.randint(1, 3))))
+                for i in range(first, min(first + 20_000, participants))
+            ])
+        started = time.perf_counter()
+        rows = backfill_children()
+        print(f'Parsed {rows:,} children in {time.perf_counter() - started:.1f}s')
+        connection.cursor().execute('ANALYZE')
+
+        def measure(label, query):
+            times = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                result = query()
+                times.append(time.perf_counter() - started)
+            print(f'{label:<44} {statistics.median(times) * 1000:9.2f} ms  ({result})')
+
+        newest = Participant.objects.order_by('-id')
+        for low, high in ((8, 12), (0, 0), (17, 17)):
+            measure(f'newest 50 with a child aged {low}-{high}',
+                    lambda: len(with_children_aged(newest, low, high)[:50]))
+            measure(f'count with a child aged {low}-{high}', lambda: count_families(low, high))
+            measure(f'count {low}-{high} by scanning the text (before)', lambda: sum(
+                1 for text in Participant.objects.values_list('children_ages', flat=True).iterator(10_000)
+                if any(low <= int(age) <= high for age in re.findall(r'\d+', text))))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,151 @@
+"""
+Program enrollment with capacity limits and a waitlist.
+
+Program.seats_taken counts enrolled participants. It only ever moves through
+conditional UPDATEs:
+
+    UPDATE program SET seats_taken = seats_taken + 1
+    WHERE id = ? AND (capacity IS NULL OR seats_taken < capacity)
+
+The database checks and bumps the counter in one statement, so however many
+requests race for the last seat, exactly one UPDATE matches a row and the
+rest see a full program; nothing is read first and written back later.
+Whoever doesn't get a seat is waitlisted, and the waitlist is served in
+order of arrival: cancelling a seat, or raising a program's capacity, hands
+the free seats to the oldest waitlisted enrollments (promote()). Claiming a
+waitlisted enrollment is another conditional UPDATE (WHERE status =
+'WAITLISTED'), so two processes promoting at once never seat the same
+person twice.
+
+Enrolling is confirmed by email: the enroll page takes only an email
+address, so it sends that address a signed link (confirmation_token())
+and only following the link enrolls anyone. The page answers the same
+whether or not the address is registered, so it tells a visitor nothing
+about who is.
+
+Every transaction here starts with a write. On SQLite that takes the write
+lock straight away, so concurrent enrollments queue on the busy timeout
+instead of failing while upgrading a read lock.
+"""
+import logging
+
+from datetime import timedelta
+
+from django.core import signing
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Program, Enrollment
+
+logger = logging.getLogger(__name__)
+
+# How long an emailed enrollment link works
+CONFIRMATION_MAX_AGE = timedelta(days=3)
+
+CONFIRMATION_SALT = 'main.enrollment.confirm'
+
+
+def take_seat(program_id):
+    """Claim one seat; False if the program is full"""
+    has_room = Q(capacity__isnull=True) | Q(seats_taken__lt=F('capacity'))
+    return Program.objects.filter(has_room, id=program_id).update(seats_taken=F('seats_taken') + 1) == 1
+
+
+def release_seat(program_id):
+    Program.objects.filter(id=program_id, seats_taken__gt=0).update(seats_taken=F('seats_taken') - 1)
+
+
+def waitlist(program_id):
+    """Waitlisted enrollments for a program, first come first served"""
+    return Enrollment.objects.filter(program_id=program_id, status='WAITLISTED').order_by('id')
+
+
+def waitlist_position(enrollment):
+    """1 for the head of the waitlist; None if the enrollment isn't waitlisted"""
+    if enrollment.status != 'WAITLISTED':
+        return None
+    return waitlist(enrollment.program_id).filter(id__lte=enrollment.id).count()
+
+
+def enroll(program_id, participant_id):
+    """
+    Give a participant a seat in a program, or a place in its waitlist if it
+    is full; returns the Enrollment. Enrolling again while enrolled or
+    waitlisted returns the existing enrollment; after a cancellation it
+    starts over at the back of the queue.
+    """
+    with transaction.atomic():
+        seated = take_seat(program_id)
+        enrollment = Enrollment(program_id=program_id, participant_id=participant_id,
+                                status='ENROLLED' if seated else 'WAITLISTED', enrolled_at=timezone.now() if seated else None)
+        for attempt in range(2):  # again after clearing a cancelled enrollment
+            try:
+                with transaction.atomic():
+                    enrollment.save(force_insert=True)
+                return enrollment
+            except IntegrityError:
+                existing = Enrollment.objects.get(program_id=program_id, participant_id=participant_id)
+                if existing.status != 'CANCELLED' or attempt:
+                    break
+                existing.delete()  # a new place in the queue, not the old one
+        # Already enrolled or waitlisted
+        if seated:
+            release_seat(program_id)
+        return existing
+
+
+def cancel(enrollment):
+    """Cancel an enrollment; a seat it frees goes to the waitlist. Returns the ids of enrollments promoted."""
+    with transaction.atomic():
+        # Conditional, so cancelling the same enrollment twice frees one seat
+        if Enrollment.objects.filter(id=enrollment.id, status='ENROLLED').update(status='CANCELLED'):
+            release_seat(enrollment.program_id)
+            promoted = promote(enrollment.program_id)
+        else:
+            Enrollment.objects.filter(id=enrollment.id, status='WAITLISTED').update(status='CANCELLED')
+            promoted = []
+    enrollment.status = 'CANCELLED'
+    return promoted
+
+
+def promote(program_id):
+    """Seat waitlisted enrollments, oldest first, while the program has room; returns the ids promoted"""
+    promoted = []
+    while True:
+        with transaction.atomic():
+            if not take_seat(program_id):
+                return promoted
+            while True:
+                head = waitlist(program_id).values_list('id', flat=True).first()
+                if head is None:
+                    release_seat(program_id)
+                    return promoted
+                # Another process may have promoted or cancelled it since we looked
+                if Enrollment.objects.filter(id=head, status='WAITLISTED').update(status='ENROLLED', enrolled_at=timezone.now()):
+                    promoted.append(head)
+                    logger.info('Enrollment %s promoted from the waitlist of program %s', head, program_id)
+                    break
+
+
+def recount_seats(programs=None):
+    """Set seats_taken (default: every program's) from the enrollments, after rows were written in bulk"""
+    programs = programs if programs is not None else Program.objects.all()
+    enrolled = (Enrollment.objects.filter(program=OuterRef('pk'), status='ENROLLED')
+                .order_by().values('program').annotate(seats=Count('id')).values('seats'))
+    programs.update(seats_taken=Coalesce(Subquery(enrolled), 0))
+
+
+def confirmation_token(program_id, participant_id):
+    """Signed token for the emailed link that enrolls a participant"""
+    return signing.dumps([program_id, participant_id], salt=CONFIRMATION_SALT)
+
+
+def confirmed_enrollment(token):
+    """(program id, participant id) from a confirmation_token(), or None if it is forged or expired"""
+    try:
+        program_id, participant_id = signing.loads(token, salt=CONFIRMATION_SALT, max_age=CONFIRMATION_MAX_AGE)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    return program_id, participant_id
@@ -0,0 +1,144 @@
+"""
+Streaming data exports.
+
+Each export is a flat list of field lookups read with values_list(), so
+related columns (vendor, donor, staff user) come from JOINs in the same query
+and rows never become model instances. Rows are pulled with
+.iterator(chunk_size=...) and written out as they arrive, so memory use does
+not depend on the table size. Under ASGI the CSV goes out through
+aiter_csv(), which reads each block of lines in the sync thread: Django
+would read a plain generator into a list before sending any of it.
+
+Staff open CSV exports in spreadsheets, which run a cell starting with =, +,
+- or @ as a formula, and names, emails and purposes are typed in by the
+public. Such text cells are written with a leading ' so they stay text (a
+phone number like +1 555... shows as typed, the quote hidden). Parquet
+columns are typed and never evaluated, so they are written as stored.
+"""
+import csv
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+from .models import Donation, FundDistribution, Participant, VendorSubmission
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; without it only CSV exports are available
+    pa = pq = None
+
+
+CHUNK_SIZE = 2000
+
+# A text cell starting with one of these is read as a formula by Excel, LibreOffice and Google Sheets
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+EXPORTS = {
+    'donations': (Donation, [
+        'id', 'donor_name', 'donor_email', 'amount', 'payment_method', 'status',
+        'transaction_id', 'donated_at', 'processed_by__username',
+    ]),
+    'distributions': (FundDistribution, [
+        'id', 'amount', 'status', 'purpose', 'created_at', 'distributed_at',
+        'donation_id', 'donation__donor_name', 'donation__donor_email', 'donation__amount',
+        'vendor_id', 'vendor__service_name', 'vendor__business_name', 'vendor__email',
+        'created_by__username', 'approved_by__username',
+    ]),
+    'participants': (Participant, [
+        'id', 'name', 'email', 'phone', 'children_ages', 'registered_at',
+    ]),
+    'vendors': (VendorSubmission, [
+        'id', 'service_name', 'business_name', 'contact_name', 'email', 'phone',
+        'discount_percentage', 'service_price', 'overall_value', 'frequency',
+        'free_service_name', 'free_service_frequency', 'submitted_at', 'is_reviewed', 'is_approved',
+    ]),
+}
+
+
+def iter_rows(name, chunk_size=CHUNK_SIZE):
+    """Yield each row of an export as a tuple, in primary-key order"""
+    model, fields = EXPORTS[name]
+    return model.objects.order_by('pk').values_list(*fields).iterator(chunk_size=chunk_size)
+
+
+class Echo:
+    """File-like object that hands back what is written, for csv.writer in a generator"""
+
+    def write(self, value):
+        return value
+
+
+def spreadsheet_text(value):
+    """A cell value that a spreadsheet won't run as a formula"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_csv(name, chunk_size=CHUNK_SIZE):
+    """Yield an export as CSV text, one line at a time"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORTS[name][1])
+    for row in iter_rows(name, chunk_size):
+        yield writer.writerow(map(spreadsheet_text, row))
+
+
+async def aiter_csv(name, chunk_size=CHUNK_SIZE):
+    """iter_csv() for ASGI responses, chunk_size lines at a time; the queries run in the sync thread, not the event loop"""
+    lines = iter_csv(name, chunk_size)
+    read = sync_to_async(lambda: ''.join(islice(lines, chunk_size)))
+    try:
+        while chunk := await read():
+            yield chunk
+    finally:
+        await sync_to_async(lines.close)()
+
+
+def resolve_field(model, lookup):
+    """Model field at the end of a values_list() lookup such as 'vendor__service_name'"""
+    *relations, attname = lookup.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(attname)  # also accepts attnames such as 'vendor_id'
+
+
+def arrow_type(field):
+    internal = field.get_internal_type()
+    if internal == 'DecimalField':
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if internal == 'DateTimeField':
+        return pa.timestamp('us', tz='UTC')
+    if internal == 'DateField':
+        return pa.date32()
+    if internal == 'BooleanField':
+        return pa.bool_()
+    if internal in ('AutoField', 'BigAutoField', 'IntegerField', 'BigIntegerField', 'PositiveIntegerField', 'ForeignKey'):
+        return pa.int64()
+    return pa.string()
+
+
+def write_parquet(name, path, chunk_size=CHUNK_SIZE):
+    """Write an export to a Parquet file one row group per chunk; returns the row count"""
+    if pq is None:
+        raise RuntimeError('Parquet export requires pyarrow.')
+    model, fields = EXPORTS[name]
+    schema = pa.schema([(lookup, arrow_type(resolve_field(model, lookup))) for lookup in fields])
+
+    def to_table(rows):
+        columns = zip(*rows)
+        return pa.Table.from_arrays([pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema)
+
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = []
+        for row in iter_rows(name, chunk_size):
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                writer.write_table(to_table(batch))
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(to_table(batch))
+            count += len(batch)
+    return count
@@ -1,21 +1,48 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
-from .models import Program, Participant, MemberDocument, VendorSubmission
+from django.utils import timezone
+from .models import Program, Participant, MemberDocument, VendorSubmission, DataVaultItem
 
 
 class ProgramForm(forms.ModelForm):
     class Meta:
         model = Program
-        fields = ['title', 'description', 'date', 'time', 'location']
+        fields = ['title', 'description', 'date', 'time', 'duration_minutes', 'location', 'capacity', 'min_age', 'max_age']
         widgets = {
             'title': forms.TextInput(attrs={'class': 'form-control'}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 4}),
             'date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
             'time': forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'}),
+            'duration_minutes': forms.NumberInput(attrs={'class': 'form-control', 'min': '1', 'max': '720', 'step': '15'}),
             'location': forms.TextInput(attrs={'class': 'form-control'}),
+            'capacity': forms.NumberInput(attrs={'class': 'form-control', 'min': '0'}),
+            'min_age': forms.NumberInput(attrs={'class': 'form-control', 'min': '0', 'max': '21'}),
+            'max_age': forms.NumberInput(attrs={'class': 'form-control', 'min': '0', 'max': '21'}),
         }
 
+    def clean(self):
+        cleaned_data = super().clean()
+        min_age, max_age = cleaned_data.get('min_age'), cleaned_data.get('max_age')
+        if min_age is not None and max_age is not None and min_age > max_age:
+            self.add_error('max_age', 'The oldest age must be at least the youngest age.')
+        self.check_location_is_free(cleaned_data)
+        return cleaned_data
+
+    def check_location_is_free(self, cleaned_data):
+        """Reject a slot that overlaps another program at the same location"""
+        from .schedule import conflicts
+
+        if any(cleaned_data.get(field) is None for field in ('date', 'time', 'duration_minutes', 'location')):
+            return
+        program = Program(pk=self.instance.pk, date=cleaned_data['date'], time=cleaned_data['time'],
+                          duration_minutes=cleaned_data['duration_minutes'], location=cleaned_data['location'])
+        program.set_schedule()
+        clash = conflicts(program).first()
+        if clash is not None:
+            self.add_error(None, f'{clash.location} is already booked for "{clash.title}" on {clash.date:%B %d, %Y} '
+                                 f'from {clash.time:%H:%M} to {timezone.localtime(clash.ends_at):%H:%M}.')
+
 
 class ParticipantForm(forms.ModelForm):
     class Meta:
@@ -29,6 +56,29 @@ class ParticipantForm(forms.ModelForm):
         }
 
 
+class ProgramEnrollmentForm(forms.Form):
+    email = forms.EmailField(
+        help_text='The email you registered with. We will email you a link to confirm.',
+        widget=forms.EmailInput(attrs={'class': 'form-control'}),
+    )
+
+    def clean_email(self):
+        from django.db.models.functions import Lower
+
+        email = self.cleaned_data['email']
+        # None for an unknown address: not an error, so the page doesn't tell who is registered
+        self.participant = (Participant.objects.annotate(email_key=Lower('email'))
+                            .filter(email_key=email.lower()).order_by('id').first())
+        return email
+
+
+class ParticipantImportForm(forms.Form):
+    file = forms.FileField(
+        help_text='CSV or Excel (.xlsx) file with name, email, phone and children ages columns.',
+        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'}),
+    )
+
+
 class UserRegistrationForm(UserCreationForm):
     email = forms.EmailField(
         required=True,
@@ -108,7 +158,7 @@ class VendorSubmissionForm(forms.ModelForm):
             'contact_name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Your full name'}),
             'email': forms.EmailInput(attrs={'class': 'form-control', 'placeholder': 'your.email@example.com'}),
             'phone': forms.TextInput(attrs={'class': 'form-control', 'placeholder': '(555) 123-4567'}),
-            'price_list': forms.FileInput(attrs={'class': 'form-control', 'accept': '.pdf,.doc,.docx,.xls,.xlsx,.jpg,.jpeg,.png'}),
+            'price_list': forms.FileInput(attrs={'class': 'form-control', 'accept': '.pdf,.doc,.docx,.csv,.xls,.xlsx,.jpg,.jpeg,.png'}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 4, 'placeholder': 'Optional: Describe your service and how it benefits P.E.P. members'}),
             'discount_percentage': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'e.g., 10.00 for 10%', 'step': '0.01', 'min': '0', 'max': '100'}),
             'service_price': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'e.g., 99.99', 'step': '0.01', 'min': '0'}),
@@ -118,3 +168,20 @@ class VendorSubmissionForm(forms.ModelForm):
             'free_service_frequency': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., "Once per month", "One-time", "Annually"'}),
         }
 
+
+class DataVaultItemForm(forms.ModelForm):
+    class Meta:
+        model = DataVaultItem
+        fields = ['title', 'category', 'description', 'file', 'participant', 'vendor', 'tags', 'is_encrypted', 'expires_at']
+        widgets = {
+            'title': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., CPR Certificate - Jane Doe'}),
+            'category': forms.Select(attrs={'class': 'form-control'}),
+            'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 3, 'placeholder': 'Optional notes about this item'}),
+            'file': forms.FileInput(attrs={'class': 'form-control', 'accept': '.pdf,.doc,.docx,.jpg,.jpeg,.png'}),
+            # Picked with the search boxes on the upload page, not a <select> of every participant and vendor
+            'participant': forms.HiddenInput,
+            'vendor': forms.HiddenInput,
+            'tags': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., cpr, 2025, renewal'}),
+            'is_encrypted': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            'expires_at': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}),
+        }
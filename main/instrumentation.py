@@ -0,0 +1,284 @@
+"""
+Per-request performance instrumentation.
+
+PerformanceMiddleware times each request and, through a context variable,
+collects the DB query count and time (an execute_wrapper installed on every
+connection) and template render time (the InstrumentedDjangoTemplates
+backend). Results are:
+
+* added as a ``Server-Timing`` header, when PERFORMANCE_SERVER_TIMING is on,
+  so they show up in the browser's network panel;
+* aggregated per view in process memory and served in Prometheus text format
+  by the ``metrics`` view (each worker process reports its own numbers) to
+  staff, and to any scraper address listed in PERFORMANCE_METRICS_IPS;
+* logged as a warning when a view runs more queries than its budget
+  (PERFORMANCE_QUERY_BUDGET, overridable per view in PERFORMANCE_QUERY_BUDGETS);
+* checked for N+1 patterns: queries are grouped by their SQL with literals and
+  IN lists normalised away, and a shape repeated PERFORMANCE_NPLUSONE_THRESHOLD
+  times is logged with the template line or source line that ran it.
+
+The metrics are also left on ``request.performance_metrics`` for tests (see
+QueryBudgetTestCase in main/tests.py).
+
+The context variable follows the request into sync_to_async threads, so async
+views are measured too.
+"""
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template import TemplateDoesNotExist
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the request duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LISTS = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('start', 'queries', 'db_time', 'template_time', 'template_depth',
+                 'nplusone_threshold', 'shapes', 'repeated')
+
+    def __init__(self, nplusone_threshold=0):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.nplusone_threshold = nplusone_threshold
+        self.shapes = {}  # normalised SQL -> times run (only when detecting N+1s)
+        self.repeated = {}  # normalised SQL -> where it was run from, once over the threshold
+
+
+def query_shape(sql):
+    """SQL with literal values and IN lists normalised, so repeats of one query compare equal"""
+    return IN_LISTS.sub('(...)', SQL_LITERALS.sub('?', sql))
+
+
+def query_origin():
+    """Template line and project source line that led to the current query"""
+    project_dir = str(settings.BASE_DIR) + os.sep
+    template_line = source_line = None
+    frame = sys._getframe(1)
+    while frame is not None and not (template_line and source_line):
+        code = frame.f_code
+        if template_line is None and code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            origin, token = getattr(node, 'origin', None), getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                template_line = f'{origin.template_name}:{token.lineno}'
+        elif (source_line is None and code.co_filename.startswith(project_dir)
+              and code.co_filename != __file__ and 'site-packages' not in code.co_filename):
+            source_line = f'{os.path.relpath(code.co_filename, project_dir)}:{frame.f_lineno}'
+        frame = frame.f_back
+    return ' via '.join(line for line in (template_line, source_line) if line) or 'unknown'
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    if metrics.nplusone_threshold:
+        shape = query_shape(sql)
+        count = metrics.shapes[shape] = metrics.shapes.get(shape, 0) + 1
+        if count == metrics.nplusone_threshold:
+            metrics.repeated[shape] = query_origin()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - start
+
+
+def add_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install_query_recorder():
+    """Time queries on every connection, including ones opened later in other threads"""
+    connection_created.connect(add_query_recorder, dispatch_uid='main.instrumentation')
+    for connection in connections.all(initialized_only=True):
+        add_query_recorder(connection)
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = current_metrics.get()
+        if metrics is None:
+            return super().render(context, request)
+        # Only the outermost render counts; render_to_string inside a render would double count
+        metrics.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_time += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Django template backend that reports render time to PerformanceMiddleware"""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return InstrumentedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class ViewStats:
+    __slots__ = ('count', 'duration', 'buckets', 'queries', 'db_time', 'template_time', 'bytes', 'over_budget')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = self.db_time = self.template_time = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.queries = self.bytes = self.over_budget = 0
+
+
+class Registry:
+    """Per-view totals for the Prometheus endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.views = {}
+
+    def observe(self, view, method, status, duration, metrics, size, over_budget):
+        key = (view, method, status // 100 * 100)
+        with self._lock:
+            stats = self.views.get(key)
+            if stats is None:
+                stats = self.views[key] = ViewStats()
+            stats.count += 1
+            stats.duration += duration
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    stats.buckets[i] += 1
+                    break
+            stats.queries += metrics.queries
+            stats.db_time += metrics.db_time
+            stats.template_time += metrics.template_time
+            stats.bytes += size
+            stats.over_budget += over_budget
+
+    def render(self):
+        """Prometheus text exposition format"""
+        with self._lock:
+            views = sorted((key, stats) for key, stats in self.views.items())
+            lines = [
+                '# HELP pep_request_duration_seconds Time spent handling requests.',
+                '# TYPE pep_request_duration_seconds histogram',
+            ]
+            for (view, method, status), stats in views:
+                labels = f'view="{view}",method="{method}",status="{status // 100}xx"'
+                cumulative = 0
+                for bound, count in zip(DURATION_BUCKETS, stats.buckets):
+                    cumulative += count
+                    lines.append(f'pep_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'pep_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.count}')
+                lines.append(f'pep_request_duration_seconds_sum{{{labels}}} {stats.duration:.6f}')
+                lines.append(f'pep_request_duration_seconds_count{{{labels}}} {stats.count}')
+            for name, kind, help_text, attr in (
+                ('pep_db_queries_total', 'counter', 'Database queries run.', 'queries'),
+                ('pep_db_seconds_total', 'counter', 'Time spent in database queries.', 'db_time'),
+                ('pep_template_seconds_total', 'counter', 'Time spent rendering templates.', 'template_time'),
+                ('pep_response_bytes_total', 'counter', 'Response body bytes.', 'bytes'),
+                ('pep_query_budget_exceeded_total', 'counter', 'Requests that ran more queries than their budget.', 'over_budget'),
+            ):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for (view, method, status), stats in views:
+                    value = getattr(stats, attr)
+                    value = f'{value:.6f}' if isinstance(value, float) else value
+                    lines.append(f'{name}{{view="{view}",method="{method}",status="{status // 100}xx"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def query_budget(view):
+    budgets = getattr(settings, 'PERFORMANCE_QUERY_BUDGETS', {})
+    return budgets.get(view, getattr(settings, 'PERFORMANCE_QUERY_BUDGET', 50))
+
+
+class PerformanceMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        self.server_timing = getattr(settings, 'PERFORMANCE_SERVER_TIMING', settings.DEBUG)
+        install_query_recorder()
+
+    def start(self, request):
+        metrics = request.performance_metrics = RequestMetrics(getattr(settings, 'PERFORMANCE_NPLUSONE_THRESHOLD', 0))
+        return metrics
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = self.start(request)
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = self.start(request)
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        # Streaming responses are timed up to the point their headers are ready
+        duration = time.perf_counter() - metrics.start
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        size = int(response.get('Content-Length') or 0) if response.streaming else len(response.content)
+
+        budget = query_budget(view)
+        over_budget = metrics.queries > budget
+        if over_budget:
+            logger.warning('%s %s ran %d queries (budget %d, %.1f ms in the database)',
+                           request.method, request.path, metrics.queries, budget, metrics.db_time * 1000)
+        for shape, origin in metrics.repeated.items():
+            logger.warning('Possible N+1 in %s: %d similar queries from %s: %s',
+                           view, metrics.shapes[shape], origin, shape[:300])
+        registry.observe(view, request.method, response.status_code, duration, metrics, size, over_budget)
+
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries", '
+                f'tpl;dur={metrics.template_time * 1000:.1f};desc="Templates", '
+                f'total;dur={duration * 1000:.1f};desc="{view}"'
+            )
+        return response
@@ -0,0 +1,289 @@
+"""
+Background jobs, with the site's own database as the broker.
+
+A function becomes a task with @task, and enqueue() adds a Job row for it:
+
+    @task(priority=5)
+    def process_payment_notifications(batch_size=100): ...
+
+    enqueue('process_payment_notifications', key='payments')
+
+The row is written in the caller's transaction, so workers only ever see a
+job if the change that asked for it committed, and never lose one that did.
+``manage.py run_jobs --workers 4`` forks worker processes that claim due
+jobs, highest priority first, BATCH_SIZE at a time:
+
+* where the database has SELECT ... FOR UPDATE SKIP LOCKED (Postgres), a
+  worker locks a batch of queued rows, passing over rows other workers have
+  locked, and marks them RUNNING in the same transaction;
+* on SQLite, one statement claims the batch:
+  ``UPDATE ... SET status = 'RUNNING', locked_by = <claim>
+  WHERE status = 'QUEUED' AND id IN (SELECT id ... LIMIT n)``.
+  SQLite applies writes one at a time, so two workers can never claim the
+  same row.
+
+A job that raises is queued again after RETRY_DELAY * 2 ** (attempts - 1)
+(plus up to 10% jitter, at most RETRY_MAX_DELAY) until it has had
+max_attempts, then stays FAILED with its traceback; raising PermanentError
+fails it at once. Successes are marked DONE a whole batch at a time, so a
+job is only DONE once its batch has run; a job still RUNNING LEASE later
+(its worker died) is queued again. So a job can run more than once: tasks
+must be safe to repeat.
+
+enqueue(key=...) adds nothing if a job with that key is already queued, for
+work that needs doing once however often it's asked for. Tasks with
+``every`` queue their own next run when they finish.
+
+To time throughput with 1-8 worker processes:
+``python manage.py shell -c "from main.jobs import _benchmark; _benchmark()"``
+"""
+import logging
+import os
+import random
+import socket
+import time
+import traceback
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Jobs claimed per round trip
+BATCH_SIZE = 20
+
+# Seconds a worker sleeps when nothing is due
+POLL_INTERVAL = 1.0
+
+# First retry delay, doubling with each attempt, and the cap
+RETRY_DELAY = timedelta(seconds=10)
+RETRY_MAX_DELAY = timedelta(hours=1)
+
+# A RUNNING job whose claim is older than this is assumed lost with its worker
+LEASE = timedelta(minutes=30)
+
+# Seconds between a worker's checks for lost jobs and unscheduled periodic tasks
+MAINTENANCE_INTERVAL = 60
+
+# Finished jobs are deleted after this long
+KEEP_FINISHED = timedelta(days=7)
+
+
+class PermanentError(Exception):
+    """Raise from a task to fail its job without further retries"""
+
+
+@dataclass
+class Task:
+    name: str
+    func: object
+    priority: int = 0
+    max_attempts: int = 5
+    every: timedelta = None
+
+
+TASKS = {}
+
+
+def task(func=None, *, name=None, priority=0, max_attempts=5, every=None):
+    """Register a function as a task (by default under its own name); the function itself is unchanged"""
+    def register(func):
+        task_name = name or func.__name__
+        TASKS[task_name] = Task(task_name, func, priority, max_attempts, every)
+        return func
+    return register(func) if func is not None else register
+
+
+def enqueue(name, kwargs=None, *, priority=None, delay=None, key=''):
+    """Queue task `name` to run with kwargs (JSON-serialisable); returns the Job, or None if `key` is already queued"""
+    if name not in TASKS:
+        raise LookupError(f'No task named {name!r}')
+    registered = TASKS[name]
+    job = Job(name=name, kwargs=kwargs or {}, key=key, max_attempts=registered.max_attempts,
+              priority=registered.priority if priority is None else priority,
+              run_at=timezone.now() + (delay or timedelta()))
+    if not key:
+        job.save()
+        return job
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:  # main_job_queued_key_unique
+        return None
+    return job
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker, limit=BATCH_SIZE):
+    """Mark up to `limit` due jobs RUNNING for this worker and return them, in the order to run them"""
+    now = timezone.now()
+    due = Job.objects.filter(status='QUEUED', run_at__lte=now).order_by('-priority', 'run_at', 'id')
+    claim_id = f'{worker}:{uuid.uuid4().hex[:8]}'
+    changes = {'status': 'RUNNING', 'locked_by': claim_id, 'locked_at': now, 'attempts': F('attempts') + 1}
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(due.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+            claimed = Job.objects.filter(id__in=ids).update(**changes)
+    else:
+        claimed = Job.objects.filter(status='QUEUED', id__in=due.values('id')[:limit]).update(**changes)
+    if not claimed:
+        return []
+    return list(Job.objects.filter(status='RUNNING', locked_by=claim_id).order_by('-priority', 'run_at', 'id'))
+
+
+def backoff(attempts):
+    """Delay before retry number `attempts`"""
+    delay = min(RETRY_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+    return delay + delay * random.uniform(0, 0.1)
+
+
+def finish(job, **changes):
+    """Record a job's outcome, unless its claim was lost (LEASE passed and another worker took it)"""
+    mine = Job.objects.filter(id=job.id, status='RUNNING', locked_by=job.locked_by)
+    try:
+        with transaction.atomic():
+            return mine.update(**changes)
+    except IntegrityError:  # requeued while another job with its key is queued: that one will do
+        return mine.update(**{**changes, 'key': ''})
+
+
+def run(job):
+    """Run a claimed job; a failure is recorded here, a success is left for complete(). Returns True on success."""
+    registered = TASKS.get(job.name)
+    try:
+        if registered is None:
+            raise PermanentError(f'No task named {job.name!r}')
+        registered.func(**job.kwargs)
+    except Exception as e:
+        now = timezone.now()
+        error = traceback.format_exc()
+        if isinstance(e, PermanentError) or job.attempts >= job.max_attempts:
+            logger.error('Job %s (%s) failed for good after %d attempt(s): %s', job.id, job.name, job.attempts, e)
+            finish(job, status='FAILED', error=error, finished_at=now)
+            schedule_next(registered)
+        else:
+            delay = backoff(job.attempts)
+            logger.warning('Job %s (%s) failed, retrying in %ds: %s', job.id, job.name, delay.total_seconds(), e)
+            finish(job, status='QUEUED', error=error, run_at=now + delay)
+        return False
+    return True
+
+
+def complete(done):
+    """Mark jobs of one claim that ran successfully DONE, in one UPDATE (one commit per batch, not per job)"""
+    if not done:
+        return
+    Job.objects.filter(id__in=[job.id for job in done], status='RUNNING', locked_by=done[0].locked_by).update(
+        status='DONE', error='', finished_at=timezone.now())
+    for name in {job.name for job in done}:
+        schedule_next(TASKS.get(name))
+
+
+def schedule_next(registered):
+    if registered is not None and registered.every:
+        enqueue(registered.name, delay=registered.every, key=f'every:{registered.name}')
+
+
+def schedule_periodic():
+    """Make sure every periodic task has a run queued (a no-op for those that do)"""
+    for registered in TASKS.values():
+        if registered.every:
+            enqueue(registered.name, key=f'every:{registered.name}')
+
+
+def requeue_lost():
+    """Queue again the jobs whose worker died mid-run; returns how many"""
+    lost = Job.objects.filter(status='RUNNING', locked_at__lt=timezone.now() - LEASE)
+    failed = lost.filter(attempts__gte=F('max_attempts')).update(
+        status='FAILED', error='Worker lost while running the job', finished_at=timezone.now())
+    # Cleared keys can't collide with a job queued since; the jobs still run
+    return failed + lost.update(status='QUEUED', key='', locked_at=None)
+
+
+def release(jobs):
+    """Give back claimed jobs a stopping worker won't run"""
+    for job in jobs:
+        finish(job, status='QUEUED', attempts=F('attempts') - 1, locked_at=None)
+
+
+def purge(older_than=KEEP_FINISHED):
+    """Delete jobs that finished more than `older_than` ago; returns how many"""
+    cutoff = timezone.now() - older_than
+    return Job.objects.filter(status__in=['DONE', 'FAILED'], finished_at__lt=cutoff).delete()[0]
+
+
+def work(worker=None, batch_size=BATCH_SIZE, interval=POLL_INTERVAL, stop=lambda: False, until_empty=False):
+    """Claim and run jobs until stop() is true (or, with until_empty, nothing is due); returns how many ran"""
+    worker = worker or worker_name()
+    ran = 0
+    maintained = 0.0
+    while not stop():
+        close_old_connections()
+        if time.monotonic() - maintained > MAINTENANCE_INTERVAL:
+            requeue_lost()
+            schedule_periodic()
+            maintained = time.monotonic()
+        batch = claim(worker, batch_size)
+        done = []
+        for i, job in enumerate(batch):
+            if stop():
+                release(batch[i:])
+                break
+            if run(job):
+                done.append(job)
+            ran += 1
+        complete(done)
+        if not batch:
+            if until_empty:
+                break
+            time.sleep(interval)
+    return ran
+
+
+def _benchmark(jobs=20_000, workers=(1, 2, 4, 8), batch_size=BATCH_SIZE):
+    import multiprocessing
+
+    from django.db import connections
+    from django.test.utils import setup_test_environment
+
+    from .utils import batched
+
+    @task(name='benchmark_noop')
+    def noop(n):
+        pass
+
+    setup_test_environment()
+    if connection.vendor == 'sqlite' and connection.creation.is_in_memory_db(
+            connection.settings_dict['TEST'].get('NAME') or ':memory:'):
+        raise RuntimeError('Worker processes need a file or server test database (set DATABASES TEST NAME)')
+    old_name = connection.creation.create_test_db(verbosity=0)
+    context = multiprocessing.get_context('fork')
+    try:
+        print(f'{connection.vendor}, {jobs:,} no-op jobs, batches of {batch_size}')
+        for count in workers:
+            for chunk in batched(range(jobs), 10_000):
+                Job.objects.bulk_create([Job(name='benchmark_noop', kwargs={'n': n}, priority=n % 3) for n in chunk])
+            connections.close_all()  # forked workers must open their own
+            started = time.perf_counter()
+            processes = [context.Process(target=work, kwargs={'batch_size': batch_size, 'until_empty': True})
+                         for _ in range(count)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            elapsed = time.perf_counter() - started
+            done = Job.objects.filter(name='benchmark_noop', status='DONE').count()
+            print(f'{count} worker(s): {done:,} jobs in {elapsed:.2f}s = {done / elapsed:8,.0f} jobs/s')
+            Job.objects.all().delete()
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        TASKS.pop('benchmark_noop', None)
@@ -0,0 +1,253 @@
+"""
+Small asyncio HTTP load generator.
+
+Opens many connections at once from a single thread, so one client machine
+can hold far more in-flight requests than the server has workers. Clients can
+read response bodies at a capped rate to act like slow mobile connections,
+which is where a thread-per-request WSGI worker runs out of threads long
+before an ASGI worker does.
+
+ramp() drives a whole-site load test instead of a single URL: a closed loop
+of N clients, each making one request after another, for each N in a list of
+concurrency stages. Which request comes next is picked either at random from
+a weighted traffic mix of Scenarios, or in order from the lines of an access
+log (replay() / parse_access_log()). Scenarios with a ``form`` GET the form
+first and POST back its CSRF token and cookie, the way a browser would.
+Each stage's Stats give one point on the throughput, latency and error-rate
+curves (see summarize()).
+"""
+import asyncio
+import itertools
+import json
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+from urllib.parse import urlencode, urlsplit
+
+READ_SIZE = 64 * 1024
+
+# "GET /programs/?page=2 HTTP/1.1" 200 in common/combined log format lines (nginx, Apache, gunicorn)
+ACCESS_LOG_REQUEST = re.compile(r'"(?P<method>[A-Z]+) (?P<path>/\S*) HTTP/[\d.]+" (?P<status>\d{3})')
+
+CSRF_INPUT = re.compile(rb'name="csrfmiddlewaretoken" value="([^"]+)"')
+SET_COOKIE = re.compile(rb'^set-cookie:\s*([^=;\s]+)=([^;\r\n]*)', re.IGNORECASE | re.MULTILINE)
+
+
+@dataclass
+class Result:
+    status: int = 0
+    ttfb: float = 0.0
+    duration: float = 0.0
+    size: int = 0
+    error: str = ''
+    name: str = ''
+    head: bytes = b''
+    body: bytes = b''
+
+
+@dataclass
+class Stats:
+    results: list = field(default_factory=list)
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    elapsed: float = 0.0
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def fetch(url, stats, method='GET', headers=None, body=b'', read_rate=None, timeout=60, name='', keep_body=False):
+    """Make one HTTP/1.1 request and record its timings in stats"""
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80)
+    path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+    lines = [f'{method} {path} HTTP/1.1', f'Host: {parts.netloc}', 'Connection: close', f'Content-Length: {len(body)}']
+    lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+    request = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+    result = Result(name=name)
+    start = time.perf_counter()
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=parts.scheme == 'https' or None), timeout)
+        writer.write(request)
+        await writer.drain()
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout)
+        result.ttfb = time.perf_counter() - start
+        result.status = int(head.split(b' ', 2)[1])
+        if keep_body:
+            result.head = head
+
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        try:
+            while chunk := await asyncio.wait_for(reader.read(READ_SIZE), timeout):
+                result.size += len(chunk)
+                if keep_body:
+                    result.body += chunk
+                if read_rate:
+                    await asyncio.sleep(len(chunk) / read_rate)
+        finally:
+            stats.in_flight -= 1
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+        result.error = type(e).__name__
+    finally:
+        if writer is not None:
+            writer.close()
+    result.duration = time.perf_counter() - start
+    stats.results.append(result)
+    return result
+
+
+async def run(url, requests, concurrency, **kwargs):
+    """Make `requests` requests with at most `concurrency` open at once"""
+    stats = Stats()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await fetch(url, stats, **kwargs)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+@dataclass
+class Scenario:
+    """One kind of request in a traffic mix"""
+    name: str
+    path: object  # a path, or a list of paths to pick from at random
+    method: str = 'GET'
+    weight: float = 1.0
+    staff: bool = False  # send the staff session cookie
+    form: str = ''  # page to GET first for a CSRF token and cookie
+    data: dict = field(default_factory=dict)  # form fields; '{n}' is replaced with a unique value per request
+    files: dict = field(default_factory=dict)  # file field -> [filename, size in bytes]
+
+
+def load_mix(path):
+    """Scenarios from a JSON file holding a list of Scenario fields"""
+    with open(path) as f:
+        return [Scenario(**entry) for entry in json.load(f)]
+
+
+def parse_access_log(lines):
+    """GET and HEAD requests from access log lines, in order, as Scenarios named by path shape"""
+    scenarios = []
+    for line in lines:
+        match = ACCESS_LOG_REQUEST.search(line)
+        if match and match['method'] in ('GET', 'HEAD'):
+            path = match['path']
+            name = re.sub(r'\d+', 'N', path.split('?')[0])
+            scenarios.append(Scenario(name=name, path=path, method=match['method'], staff=path.startswith('/admin/')))
+    return scenarios
+
+
+def mixed(scenarios, seed=None):
+    """Endless Scenarios picked at random in proportion to their weights"""
+    picker = random.Random(seed)
+    weights = list(itertools.accumulate(scenario.weight for scenario in scenarios))
+    while True:
+        yield picker.choices(scenarios, cum_weights=weights)[0]
+
+
+def replay(scenarios):
+    """Endless Scenarios in their recorded order, starting over at the end"""
+    return itertools.cycle(scenarios)
+
+
+def multipart(data, files):
+    """multipart/form-data body and Content-Type for form fields and generated files"""
+    boundary = uuid.uuid4().hex
+    parts = [f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+             for name, value in data.items()]
+    for name, (filename, size) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: application/octet-stream\r\n\r\n'.encode() + (b'%PDF-1.4\n' + b'0' * size)[:size] + b'\r\n')
+    return b''.join(parts) + f'--{boundary}--\r\n'.encode(), f'multipart/form-data; boundary={boundary}'
+
+
+async def play(base_url, scenario, stats, unique, picker, staff_headers=None, timeout=60):
+    """Make the request(s) for one Scenario"""
+    headers = dict(staff_headers or {}) if scenario.staff else {}
+    path = picker.choice(scenario.path) if isinstance(scenario.path, list) else scenario.path
+    if not scenario.form:
+        return await fetch(base_url + path, stats, scenario.method, headers, timeout=timeout, name=scenario.name)
+
+    page = await fetch(base_url + scenario.form, stats, headers=headers, timeout=timeout,
+                       name=f'{scenario.name} (form)', keep_body=True)
+    token = CSRF_INPUT.search(page.body)
+    cookies = dict(SET_COOKIE.findall(page.head))
+    if page.error or token is None or b'csrftoken' not in cookies:
+        return page
+    n = next(unique)
+    data = {name: str(value).replace('{n}', n) for name, value in scenario.data.items()}
+    data['csrfmiddlewaretoken'] = token[1].decode()
+    cookie = '; '.join(filter(None, [headers.get('Cookie'), f'csrftoken={cookies[b"csrftoken"].decode()}']))
+    headers['Cookie'] = cookie
+    if scenario.files:
+        body, headers['Content-Type'] = multipart(data, scenario.files)
+    else:
+        body, headers['Content-Type'] = urlencode(data).encode(), 'application/x-www-form-urlencoded'
+    return await fetch(base_url + path, stats, scenario.method, headers, body, timeout=timeout, name=scenario.name)
+
+
+async def ramp(base_url, scenarios, stages, stage_seconds, staff_headers=None, timeout=60, seed=None, log=None):
+    """Run `scenarios` (an endless iterator) with each concurrency in `stages` for stage_seconds; returns Stats per stage"""
+    picker = random.Random(seed)
+    run_id = uuid.uuid4().hex[:8]
+    unique = (f'{run_id}-{i}' for i in itertools.count())
+    curves = []
+    for concurrency in stages:
+        stats = Stats()
+        deadline = time.perf_counter() + stage_seconds
+
+        async def client():
+            while time.perf_counter() < deadline:
+                await play(base_url, next(scenarios), stats, unique, picker, staff_headers, timeout)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        stats.elapsed = time.perf_counter() - start
+        curves.append((concurrency, stats))
+        if log:
+            log(concurrency, summarize(stats))
+    return curves
+
+
+def summarize(stats, name=None):
+    """Totals for a run, or for the requests of one scenario in it"""
+    results = [r for r in stats.results if name is None or r.name == name]
+    ok = [r for r in results if not r.error and r.status < 400]
+    errors = [r for r in results if r.error or r.status >= 500]
+    statuses = {}
+    for r in results:
+        key = r.error or r.status
+        statuses[key] = statuses.get(key, 0) + 1
+    ttfb = [r.ttfb for r in ok]
+    duration = [r.duration for r in ok]
+    return {
+        'requests': len(results),
+        'ok': len(ok),
+        'errors': len(errors),
+        'error_rate': len(errors) / len(results) if results else 0.0,
+        'statuses': statuses,
+        'elapsed': stats.elapsed,
+        'requests_per_second': len(ok) / stats.elapsed if stats.elapsed else 0.0,
+        'peak_in_flight': stats.peak_in_flight,
+        'ttfb_p50': percentile(ttfb, 50),
+        'ttfb_p95': percentile(ttfb, 95),
+        'duration_p50': percentile(duration, 50),
+        'duration_p95': percentile(duration, 95),
+        'duration_p99': percentile(duration, 99),
+        'bytes': sum(r.size for r in ok),
+    }
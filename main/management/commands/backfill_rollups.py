@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.rollups import rebuild_distribution_rollups, rebuild_donation_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the monthly donation and distribution rollups from raw rows'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        donation_rows = rebuild_donation_rollups()
+        distribution_rows = rebuild_distribution_rollups()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {donation_rows} donation and {distribution_rows} distribution rollup rows '
+            f'in {time.perf_counter() - started:.2f}s'
+        ))
@@ -0,0 +1,67 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from main import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Time every page in main/urls.py through the full middleware stack and report latency percentiles, '
+        'queries, database and template time. Save results with --output and line two runs up with --compare.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20, help='Timed requests per page')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per page first')
+        parser.add_argument('--only', nargs='+', metavar='URL_NAME', help='Just these URL names')
+        parser.add_argument('--user', help='Staff username to request pages as (default: any superuser or staff member)')
+        parser.add_argument('--scale', type=int,
+                            help='Benchmark a throwaway test database filled by generate_data --scale N instead of this one')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for --scale')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--compare', help='JSON file from an earlier run to compare against')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+
+        # The test client's 'testserver' host, and outgoing email kept in memory
+        setup_test_environment()
+        try:
+            if options['scale']:
+                from main.synthetic import STAFF_USERNAME, generate
+
+                old_name = connection.creation.create_test_db(verbosity=0)
+                try:
+                    self.stdout.write(f'Generating data for {options["scale"]} participants...')
+                    generate(options['scale'], seed=options['seed'])
+                    results = self.run(options, options['user'] or STAFF_USERNAME)
+                finally:
+                    connection.creation.destroy_test_db(old_name, verbosity=0)
+            else:
+                results = self.run(options, options['user'])
+        finally:
+            teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
+        if baseline:
+            self.stdout.write(f'\nAgainst {baseline["commit"] or "baseline"} ({baseline["created"]}), p50:')
+            for label, before, after, change, old_queries, new_queries, verdict in benchmarks.compare(baseline, results):
+                style = self.style.ERROR if verdict in ('slower', 'more queries') else self.style.SUCCESS if verdict else str
+                self.stdout.write(style(f'{label:<34} {before:8.2f} -> {after:8.2f} ms {change:+7.1%}  '
+                                        f'{old_queries} -> {new_queries} queries  {verdict}'))
+
+    def run(self, options, username):
+        try:
+            user = benchmarks.benchmark_user(username)
+            return benchmarks.run(user, options['requests'], options['warmup'], options['only'], log=self.stdout.write)
+        except (ValueError, benchmarks.User.DoesNotExist) as exc:
+            raise CommandError(exc)
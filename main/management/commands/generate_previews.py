@@ -0,0 +1,42 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+
+from django.core.management.base import BaseCommand
+
+from main.models import MemberDocument, VendorSubmission, DataVaultItem
+from main.previews import generate_previews, can_preview, init_worker
+
+
+class Command(BaseCommand):
+    help = 'Generate thumbnails and first-page previews for uploaded files (safe to re-run)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+        parser.add_argument('--force', action='store_true', help='Regenerate previews that already exist')
+        parser.add_argument('--chunk-size', type=int, default=16, help='Files handed to a worker at a time')
+
+    def handle(self, *args, **options):
+        names = chain(
+            MemberDocument.objects.values_list('file', flat=True).iterator(),
+            DataVaultItem.objects.values_list('file', flat=True).iterator(),
+            VendorSubmission.objects.values_list('price_list', flat=True).iterator(),
+        )
+        names = [name for name in names if name and can_preview(name)]
+
+        counts = {'generated': 0, 'skipped': 0, 'unsupported': 0, 'failed': 0}
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker) as executor:
+            results = executor.map(
+                generate_previews, names, [options['force']] * len(names),
+                chunksize=options['chunk_size'],
+            )
+            for result in results:
+                counts[result] += 1
+        elapsed = time.perf_counter() - started
+
+        rate = len(names) / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {len(names)} files in {elapsed:.2f}s ({rate:.1f} files/sec): "
+            f"{counts['generated']} generated, {counts['skipped']} skipped, {counts['failed']} failed"
+        ))
@@ -0,0 +1,61 @@
+import csv
+import time
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from main.participant_import import BATCH_SIZE, ParticipantImportError, import_participants
+
+# Row errors printed to stderr when there is no --errors file
+MAX_PRINTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = 'Add participants from a CSV or XLSX file, validated like the registration form; existing emails are skipped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or .xlsx file with name, email, phone and children ages columns')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows validated and inserted at a time')
+        parser.add_argument('--errors', help='Write every skipped row to this CSV file (row, field, message)')
+
+    def handle(self, *args, **options):
+        skipped = batches = 0
+        writer = None
+        errors_file = open(options['errors'], 'w', newline='') if options['errors'] else None
+        if errors_file:
+            writer = csv.writer(errors_file)
+            writer.writerow(['row', 'field', 'message'])
+
+        def on_error(row_number, row_errors):
+            nonlocal skipped
+            skipped += 1
+            for field, messages in row_errors.items():
+                for message in messages:
+                    if writer:
+                        writer.writerow([row_number, field, message])
+                    elif skipped <= MAX_PRINTED_ERRORS:
+                        self.stderr.write(f'Row {row_number}: {field}: {message}')
+
+        def progress(result):
+            nonlocal batches
+            batches += 1
+            if batches % 50 == 0:
+                self.stdout.write(f'{result.rows} rows read, {result.imported} imported')
+
+        started = time.perf_counter()
+        try:
+            with open(options['path'], 'rb') as f:
+                result = import_participants(File(f, name=options['path']), options['batch_size'], on_error, progress)
+        except (ParticipantImportError, OSError) as e:
+            raise CommandError(e)
+        finally:
+            if errors_file:
+                errors_file.close()
+        elapsed = time.perf_counter() - started
+
+        if not writer and skipped > MAX_PRINTED_ERRORS:
+            self.stderr.write(f'...and {skipped - MAX_PRINTED_ERRORS} more rows skipped (use --errors to list them all)')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.imported} of {result.rows} rows in {elapsed:.2f}s '
+            f'({result.duplicates} already registered, {result.invalid} invalid)'
+        ))
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from main.models import VendorSubmission
+from main.pricelists import PriceListError, can_ingest, ingest_price_list
+
+
+class Command(BaseCommand):
+    help = 'Load uploaded vendor price lists (CSV/XLSX) into the pricing catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendor', type=int, action='append', help='Only ingest this vendor id (repeatable)')
+        parser.add_argument('--all', action='store_true', help='Re-ingest price lists that were already loaded')
+
+    def handle(self, *args, **options):
+        vendors = VendorSubmission.objects.exclude(price_list='')
+        if options['vendor']:
+            vendors = vendors.filter(id__in=options['vendor'])
+        elif not options['all']:
+            # Only price lists never ingested, or replaced since the last run
+            vendors = vendors.filter(Q(price_list_ingested_at__isnull=True) |
+                                     Q(price_list_ingested_at__lt=F('price_list_updated_at')))
+
+        total = 0
+        started = time.perf_counter()
+        for vendor in vendors.iterator():
+            if not can_ingest(vendor.price_list.name):
+                self.stdout.write(f'Skipping {vendor}: unsupported format ({vendor.price_list.name})')
+                continue
+            try:
+                imported, skipped = ingest_price_list(vendor)
+            except (PriceListError, OSError) as e:
+                self.stderr.write(f'Failed {vendor}: {e}')
+                continue
+            total += imported
+            self.stdout.write(f'{vendor}: {imported} items imported, {skipped} rows skipped')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Imported {total} catalog items in {elapsed:.2f}s'))
@@ -0,0 +1,57 @@
+import asyncio
+
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.loadtest import run, summarize
+
+
+def session_cookie(username):
+    """Create a logged-in session for username directly in the session store"""
+    User = get_user_model()
+    try:
+        user = User.objects.get(username=username)
+    except User.DoesNotExist:
+        raise CommandError(f'No user named {username!r}')
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+    return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Fire concurrent requests at a running server and report how many it serves at once. '
+        'Compare one ASGI worker (uvicorn config.asgi:application) with one WSGI worker '
+        '(gunicorn config.wsgi --threads N) on the same URL.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Full URL to request, e.g. http://127.0.0.1:8000/admin/data-vault/1/download/')
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=100, help='Connections open at once')
+        parser.add_argument('--read-rate', type=int, default=0, help='Bytes/sec each client reads the body at (0 = as fast as possible)')
+        parser.add_argument('--login-as', help='Username to send a session cookie for (for staff-only URLs)')
+        parser.add_argument('--timeout', type=float, default=120)
+
+    def handle(self, *args, **options):
+        headers = {}
+        if options['login_as']:
+            headers['Cookie'] = session_cookie(options['login_as'])
+
+        stats = asyncio.run(run(
+            options['url'], options['requests'], options['concurrency'],
+            headers=headers, read_rate=options['read_rate'] or None, timeout=options['timeout'],
+        ))
+        summary = summarize(stats)
+
+        self.stdout.write(f"{summary['ok']}/{summary['requests']} ok in {summary['elapsed']:.2f}s "
+                          f"({summary['requests_per_second']:.1f} req/s, {summary['bytes'] / 1e6:.1f} MB)")
+        self.stdout.write(f"Statuses: {summary['statuses']}")
+        self.stdout.write(f"Peak responses in progress at once: {summary['peak_in_flight']}")
+        self.stdout.write(f"Time to first byte p50/p95: {summary['ttfb_p50'] * 1000:.0f}/{summary['ttfb_p95'] * 1000:.0f} ms")
+        self.stdout.write(f"Full response p50/p95: {summary['duration_p50'] * 1000:.0f}/{summary['duration_p95'] * 1000:.0f} ms")
@@ -0,0 +1,182 @@
+import asyncio
+import csv
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from main.loadtest import Scenario, load_mix, mixed, parse_access_log, ramp, replay, summarize
+from main.management.commands.load_test import session_cookie
+from main.models import Program
+
+# Server command lines for --server, run from the project directory
+SERVERS = {
+    'wsgi': [sys.executable, '-m', 'gunicorn', 'config.wsgi:application', '--bind', '127.0.0.1:{port}',
+             '--workers', '{workers}', '--threads', '{threads}'],
+    'asgi': [sys.executable, '-m', 'uvicorn', 'config.asgi:application', '--host', '127.0.0.1', '--port', '{port}',
+             '--workers', '{workers}', '--no-access-log'],
+}
+
+# Seconds to wait for a launched server to accept connections
+SERVER_START_TIMEOUT = 30
+
+
+def default_mix():
+    """Public browsing, registrations, uploads and staff pages, weighted roughly like a normal day"""
+    programs = [reverse('main:program_detail', args=[program_id])
+                for program_id in Program.objects.order_by('-id').values_list('id', flat=True)[:100]]
+    new_participant, upload_document = reverse('main:new_participant'), reverse('main:upload_document')
+    mix = [
+        Scenario('index', reverse('main:index'), weight=20),
+        Scenario('about', reverse('main:about'), weight=5),
+        Scenario('list_programs', reverse('main:list_programs'), weight=15),
+        Scenario('program_calendar', reverse('main:program_calendar'), weight=3),
+        Scenario('membership', reverse('main:membership'), weight=5),
+        Scenario('donate', reverse('main:donate'), weight=5),
+        Scenario('vendor', reverse('main:vendor'), weight=5),
+        Scenario('member_savings', reverse('main:member_savings'), weight=5),
+        Scenario('new_participant', new_participant, 'POST', weight=4, form=new_participant, data={
+            'name': 'Load Test {n}', 'email': 'load-{n}@example.com', 'phone': '555-0100', 'children_ages': '6, 9',
+        }),
+        Scenario('upload_document', upload_document, 'POST', weight=2, form=upload_document, data={
+            'document_type': 'CPR', 'participant_email': 'load-{n}@example.com', 'participant_name': 'Load Test {n}',
+        }, files={'file': ['certificate.pdf', 100_000]}),
+        Scenario('admin_dashboard', reverse('main:admin_dashboard'), weight=4, staff=True),
+        Scenario('fund_distribution_list', reverse('main:fund_distribution_list'), weight=2, staff=True),
+        Scenario('member_document_review', reverse('main:member_document_review'), weight=2, staff=True),
+        Scenario('data_vault_list', reverse('main:data_vault_list'), weight=2, staff=True),
+    ]
+    if programs:
+        mix.append(Scenario('program_detail', programs, weight=15))
+    return mix
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test the whole site: launch a WSGI (gunicorn) or ASGI (uvicorn) server for the config project, '
+        'replay a traffic mix or a recorded access log against it at rising concurrency, and report '
+        'throughput, latency and error rate at each step. Registrations and uploads in the mix create real '
+        'rows, so point it at a scratch database (e.g. one filled by generate_data).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', choices=sorted(SERVERS), default='wsgi', help='Server to launch')
+        parser.add_argument('--url', help='Test a server that is already running at this base URL instead of launching one')
+        parser.add_argument('--workers', type=int, default=2, help='Server worker processes')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per WSGI worker')
+        source = parser.add_mutually_exclusive_group()
+        source.add_argument('--mix', help='JSON file of scenarios (Scenario fields) to pick from by weight; '
+                                          'default: a built-in mix of public, registration, upload and staff pages')
+        source.add_argument('--replay', help='Access log (common/combined format) whose GET requests to replay in order')
+        parser.add_argument('--stages', default='1,2,5,10,20,50', help='Comma-separated concurrency levels to step through')
+        parser.add_argument('--stage-seconds', type=float, default=10, help='How long each concurrency level runs')
+        parser.add_argument('--login-as', help='Staff username for staff pages (default: any superuser or staff member)')
+        parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds')
+        parser.add_argument('--seed', type=int, help='Random seed for picking from the mix')
+        parser.add_argument('--output', help='Write the curves to this CSV file, one row per stage and scenario')
+
+    def handle(self, *args, **options):
+        try:
+            stages = [int(stage) for stage in options['stages'].split(',')]
+        except ValueError:
+            raise CommandError(f'--stages must be comma-separated numbers, not {options["stages"]!r}')
+
+        if options['replay']:
+            with open(options['replay'], errors='replace') as f:
+                scenarios = parse_access_log(f)
+            if not scenarios:
+                raise CommandError(f'No GET requests found in {options["replay"]}')
+            self.stdout.write(f'Replaying {len(scenarios)} requests from {options["replay"]}')
+            traffic = replay(scenarios)
+        else:
+            scenarios = load_mix(options['mix']) if options['mix'] else default_mix()
+            traffic = mixed(scenarios, options['seed'])
+
+        staff_headers = None
+        if any(scenario.staff for scenario in scenarios):
+            username = options['login_as'] or self.staff_username()
+            if username is None:
+                raise CommandError('The traffic includes staff pages; create a staff user or pass --login-as')
+            staff_headers = {'Cookie': session_cookie(username)}
+
+        server = None
+        base_url = (options['url'] or '').rstrip('/')
+        if not base_url:
+            port = free_port()
+            server = self.launch(options['server'], port, options['workers'], options['threads'])
+            base_url = f'http://127.0.0.1:{port}'
+        try:
+            self.stdout.write(f'{"clients":>7} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"errors":>7} {"requests":>9}')
+            curves = asyncio.run(ramp(base_url, traffic, stages, options['stage_seconds'], staff_headers,
+                                      options['timeout'], options['seed'], log=self.report))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(10)
+
+        if options['output']:
+            self.write_csv(options['output'], curves)
+            self.stdout.write(f'Curves written to {options["output"]}')
+        for concurrency, stats in curves[-1:]:
+            self.stdout.write(f'\nAt {concurrency} clients, slowest scenarios (p95):')
+            names = {result.name for result in stats.results}
+            rows = sorted(((name, summarize(stats, name)) for name in names), key=lambda row: -row[1]['duration_p95'])
+            for name, summary in rows[:10]:
+                self.stdout.write(f'  {name:<34} {summary["duration_p95"] * 1000:8.1f} ms  '
+                                  f'{summary["requests"]:6d} requests  {summary["errors"]} errors')
+
+    def staff_username(self):
+        User = get_user_model()
+        user = User.objects.filter(is_superuser=True).first() or User.objects.filter(is_staff=True).first()
+        return user.get_username() if user else None
+
+    def launch(self, kind, port, workers, threads):
+        """Start a server for the config project and wait until it accepts connections"""
+        command = [part.format(port=port, workers=workers, threads=threads) for part in SERVERS[kind]]
+        self.stdout.write(f'Starting {" ".join(command[2:])}')
+        server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=os.environ.copy(),
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'{command[2]} exited with {server.returncode}:\n{server.stderr.read().decode()[-2000:]}')
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            except OSError:
+                time.sleep(0.2)
+            else:
+                server.stderr.close()  # stop it filling the pipe; errors now show up as 5xx responses
+                return server
+        server.kill()
+        raise CommandError(f'{command[2]} did not start listening within {SERVER_START_TIMEOUT}s')
+
+    def report(self, concurrency, summary):
+        style = self.style.ERROR if summary['errors'] else str
+        self.stdout.write(style(
+            f'{concurrency:7d} {summary["requests_per_second"]:8.1f} {summary["duration_p50"] * 1000:8.1f} '
+            f'{summary["duration_p95"] * 1000:8.1f} {summary["duration_p99"] * 1000:8.1f} '
+            f'{summary["error_rate"]:7.1%} {summary["requests"]:9d}'
+        ))
+
+    def write_csv(self, path, curves):
+        fields = ['concurrency', 'scenario', 'requests', 'ok', 'errors', 'error_rate', 'requests_per_second',
+                  'ttfb_p50', 'ttfb_p95', 'duration_p50', 'duration_p95', 'duration_p99', 'bytes']
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fields, extrasaction='ignore')
+            writer.writeheader()
+            for concurrency, stats in curves:
+                writer.writerow({'concurrency': concurrency, 'scenario': 'all', **summarize(stats)})
+                for name in sorted({result.name for result in stats.results}):
+                    writer.writerow({'concurrency': concurrency, 'scenario': name, **summarize(stats, name)})
@@ -0,0 +1,94 @@
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+
+
+class VerifyHandler(BaseHTTPRequestHandler):
+    """Answers IPN verification postbacks the way PayPal does"""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b'VERIFIED')
+
+    def log_message(self, format, *args):
+        pass
+
+
+def build_notifications(count, failure_rate):
+    """Pending then final notifications per transaction, plus duplicate deliveries"""
+    notifications = []
+    for _ in range(count):
+        fields = {
+            'txn_id': uuid.uuid4().hex[:17].upper(),
+            'mc_gross': f'{random.choice([10, 25, 50, 100, 250])}.00',
+            'mc_currency': 'USD',
+            'first_name': random.choice(['Ana', 'Ben', 'Chloe', 'Dev', 'Eli']),
+            'last_name': random.choice(['Lee', 'Diaz', 'Khan', 'Ross']),
+            'payer_email': f'donor{random.randint(1, 99999)}@example.com',
+            'charset': 'UTF-8',
+        }
+        final = 'Failed' if random.random() < failure_rate else 'Completed'
+        notifications.append(urlencode(dict(fields, payment_status='Pending')))
+        notifications.append(urlencode(dict(fields, payment_status=final)))
+        if random.random() < 0.1:
+            notifications.append(urlencode(dict(fields, payment_status=final)))  # PayPal retries
+    return notifications
+
+
+class Command(BaseCommand):
+    help = 'Local stand-in for PayPal: fires IPN notifications at the site and answers verification postbacks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', default='http://127.0.0.1:8000/donate/ipn/', help='IPN endpoint to notify')
+        parser.add_argument('--count', type=int, default=1000, help='Number of donations to simulate')
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--failure-rate', type=float, default=0.05)
+        parser.add_argument('--port', type=int, default=8765, help='Port for the verification responder')
+        parser.add_argument('--no-wait', action='store_true', help='Exit after sending instead of serving verification')
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer(('127.0.0.1', options['port']), VerifyHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.stdout.write(f"Verification responder on http://127.0.0.1:{options['port']}/ "
+                          f"(point PAYPAL_IPN_VERIFY_URL here)")
+
+        notifications = build_notifications(options['count'], options['failure_rate'])
+        errors = 0
+
+        def send(body):
+            request = Request(options['target'], data=body.encode('ascii'),
+                              headers={'Content-Type': 'application/x-www-form-urlencoded'})
+            with urlopen(request, timeout=30) as response:
+                return response.status
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            for future in [executor.submit(send, body) for body in notifications]:
+                try:
+                    if future.result() != 200:
+                        errors += 1
+                except OSError:
+                    errors += 1
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Sent {len(notifications)} notifications in {elapsed:.2f}s '
+            f'({len(notifications) / elapsed:.0f}/sec), {errors} errors'
+        ))
+        if not options['no_wait']:
+            self.stdout.write('Serving verification until interrupted (Ctrl-C)...')
+            try:
+                while True:
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                pass
+        server.shutdown()
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.payments import process_pending
+
+
+class Command(BaseCommand):
+    help = 'Apply queued PayPal notifications to donations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new notifications')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+
+    def handle(self, *args, **options):
+        total_processed = total_failed = 0
+        while True:
+            processed, failed = process_pending(options['batch_size'])
+            total_processed += processed
+            total_failed += failed
+            if processed or failed:
+                self.stdout.write(f'{processed} processed, {failed} failed')
+            elif not options['loop']:
+                break
+            else:
+                time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Done: {total_processed} processed, {total_failed} failed'))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from main.reconciliation import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Reconcile donations against a PayPal or Stripe CSV export'
+
+    def add_arguments(self, parser):
+        parser.add_argument('export', help='Path to the processor export (CSV)')
+        parser.add_argument('--apply', action='store_true', help='Update donation statuses to match the export')
+        parser.add_argument('--fix-amounts', action='store_true', help='With --apply, also correct mismatched amounts')
+        parser.add_argument('--report', help='Write every discrepancy to this CSV file')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        report = open(options['report'], 'w', newline='') if options['report'] else None
+        try:
+            with open(options['export'], newline='', encoding='utf-8-sig') as export, transaction.atomic():
+                counts, corrected = reconcile(
+                    export, apply=options['apply'], fix_amounts=options['fix_amounts'], report=report,
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        finally:
+            if report:
+                report.close()
+        elapsed = time.perf_counter() - started
+
+        for outcome, count in counts.items():
+            self.stdout.write(f'{outcome:>16}: {count}')
+        if options['apply']:
+            self.stdout.write(f'{"corrected":>16}: {corrected}')
+        self.stdout.write(self.style.SUCCESS(f'Reconciled in {elapsed:.2f}s'))
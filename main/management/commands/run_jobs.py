@@ -0,0 +1,47 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from main import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (see main/jobs.py); stops cleanly on SIGTERM or Ctrl+C'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes')
+        parser.add_argument('--batch-size', type=int, default=jobs.BATCH_SIZE, help='Jobs claimed at a time')
+        parser.add_argument('--interval', type=float, default=jobs.POLL_INTERVAL,
+                            help='Seconds to sleep when no job is due')
+        parser.add_argument('--once', action='store_true', help='Exit when no job is due instead of polling')
+
+    def handle(self, *args, **options):
+        # Forked rather than spawned: children start with Django set up. The
+        # event lives in shared memory, so one signal stops every worker.
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        kwargs = {'batch_size': options['batch_size'], 'interval': options['interval'], 'until_empty': options['once']}
+        connections.close_all()  # each process opens its own
+        processes = [context.Process(target=run_worker, args=(stop,), kwargs=kwargs)
+                     for _ in range(options['workers'])]
+        previous = {signum: signal.signal(signum, lambda *_: stop.set()) for signum in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            for process in processes:
+                process.start()
+            self.stdout.write(f"{options['workers']} worker(s) running")
+            for process in processes:
+                process.join()
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        self.stdout.write(self.style.SUCCESS('Workers stopped'))
+
+
+def run_worker(stop, **kwargs):
+    # Terminal Ctrl+C reaches every process in the group; the parent sets the event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    ran = jobs.work(stop=stop.is_set, **kwargs)
+    print(f'{jobs.worker_name()}: {ran} job(s) run', flush=True)
@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Recipients at this domain are refused, to exercise permanent failures
+REFUSED_DOMAIN = 'refused.invalid'
+
+
+class StandinHandler:
+    """aiosmtpd handler that accepts every message, counting SMTP sessions and messages received"""
+
+    def __init__(self, keep=0):
+        self.keep = keep
+        self.reset()
+
+    def reset(self):
+        self.sessions = 0
+        self.received = 0
+        self.messages = []
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.lower().endswith(f'@{REFUSED_DOMAIN}'):
+            return '550 5.1.1 No such user here'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        if len(self.messages) < self.keep:
+            self.messages.append(envelope)
+        return '250 Message accepted for delivery'
+
+
+class Command(BaseCommand):
+    help = 'Local stand-in SMTP server that accepts and counts email (needs aiosmtpd)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=1025, help='Point EMAIL_HOST/EMAIL_PORT here')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between rate reports')
+
+    def handle(self, *args, **options):
+        try:
+            from aiosmtpd.controller import Controller
+        except ImportError:
+            raise CommandError('smtp_standin needs aiosmtpd: pip install aiosmtpd')
+
+        handler = StandinHandler()
+        controller = Controller(handler, hostname=options['host'], port=options['port'])
+        controller.start()
+        self.stdout.write(f"SMTP stand-in on {options['host']}:{options['port']} "
+                          f"(recipients @{REFUSED_DOMAIN} are refused); Ctrl+C to stop")
+        try:
+            received = sessions = 0
+            while True:
+                time.sleep(options['interval'])
+                if handler.received != received:
+                    self.stdout.write(f"{(handler.received - received) / options['interval']:,.0f} messages/s over "
+                                      f'{handler.sessions - sessions} session(s); {handler.received:,} in total')
+                received, sessions = handler.received, handler.sessions
+        except KeyboardInterrupt:
+            pass
+        finally:
+            controller.stop()
+        self.stdout.write(self.style.SUCCESS(f'{handler.received:,} messages over {handler.sessions:,} sessions'))
@@ -0,0 +1,60 @@
+# Generated by Django 6.0 on 2026-10-19 16:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_donation_funddistribution'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certification',
+            name='alison_course_id',
+            field=models.CharField(blank=True, help_text='Alison course ID or reference', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='certification',
+            name='alison_course_url',
+            field=models.URLField(blank=True, help_text='Link to related Alison course'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='google_notes_url',
+            field=models.URLField(blank=True, help_text='Link to Google Notes/Docs for this course'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='google_notes_url',
+            field=models.URLField(blank=True, help_text='Link to Google Notes/Docs for this document'),
+        ),
+        migrations.CreateModel(
+            name='DataVaultItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(help_text='Name or title of the item', max_length=200)),
+                ('category', models.CharField(choices=[('CERTIFICATE', 'Certificate'), ('DOCUMENT', 'Document'), ('CONTRACT', 'Contract'), ('LICENSE', 'License'), ('INSURANCE', 'Insurance'), ('TAX', 'Tax Document'), ('LEGAL', 'Legal Document'), ('OTHER', 'Other')], default='DOCUMENT', max_length=20)),
+                ('description', models.TextField(blank=True, help_text='Description or notes about this item')),
+                ('file', models.FileField(help_text='Upload the certificate or document', upload_to='data_vault/%Y/%m/%d/')),
+                ('tags', models.CharField(blank=True, help_text='Comma-separated tags for easy searching', max_length=500)),
+                ('is_encrypted', models.BooleanField(default=False, help_text='Mark if this item contains sensitive data')),
+                ('uploaded_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(blank=True, help_text='Expiration date (if applicable)', null=True)),
+                ('last_accessed', models.DateTimeField(blank=True, help_text='Last time this item was accessed', null=True)),
+                ('access_count', models.IntegerField(default=0, help_text='Number of times this item has been accessed')),
+                ('participant', models.ForeignKey(blank=True, help_text='Associated participant (if applicable)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='vault_items', to='main.participant')),
+                ('uploaded_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='uploaded_vault_items', to=settings.AUTH_USER_MODEL)),
+                ('vendor', models.ForeignKey(blank=True, help_text='Associated vendor (if applicable)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='vault_items', to='main.vendorsubmission')),
+            ],
+            options={
+                'verbose_name': 'Data Vault Item',
+                'verbose_name_plural': 'Data Vault Items',
+                'ordering': ['-uploaded_at'],
+            },
+        ),
+    ]
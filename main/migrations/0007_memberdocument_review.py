@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-19 16:34
+
+from django.db import migrations, models
+
+
+def mark_verified_as_reviewed(apps, schema_editor):
+    MemberDocument = apps.get_model('main', 'MemberDocument')
+    MemberDocument.objects.filter(is_verified=True).update(is_reviewed=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_datavaultitem_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='memberdocument',
+            name='is_reviewed',
+            field=models.BooleanField(default=False, help_text='Admin review status (verified or rejected)'),
+        ),
+        migrations.AddField(
+            model_name='memberdocument',
+            name='reviewed_at',
+            field=models.DateTimeField(blank=True, help_text='When the document was verified or rejected', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='memberdocument',
+            index=models.Index(fields=['is_reviewed', '-id'], name='main_memberdoc_review_idx'),
+        ),
+        migrations.RunPython(mark_verified_as_reviewed, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-19 16:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_memberdocument_review'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vendorsubmission',
+            name='price_list_ingested_at',
+            field=models.DateTimeField(blank=True, help_text='When the price list was last loaded into the pricing catalog', null=True),
+        ),
+        migrations.CreateModel(
+            name='VendorPriceItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item', models.CharField(max_length=200)),
+                ('category', models.CharField(blank=True, help_text='Lower-cased category, e.g. "tutoring"', max_length=100)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('unit', models.CharField(blank=True, help_text='Pricing unit, e.g. "hour" or "session"', max_length=50)),
+                ('discount_percentage', models.DecimalField(blank=True, decimal_places=2, help_text='Member discount for this item (falls back to the vendor discount)', max_digits=5, null=True)),
+                ('row_number', models.PositiveIntegerField(help_text='Row in the uploaded price list')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_items', to='main.vendorsubmission')),
+            ],
+            options={
+                'ordering': ['price'],
+                'indexes': [models.Index(fields=['category', 'price'], name='main_priceitem_cat_price_idx'), models.Index(fields=['price'], name='main_priceitem_price_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 6.0 on 2026-10-19 16:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def suffix_duplicate_transaction_ids(apps, schema_editor):
+    # transaction_id was typed by hand, with nothing stopping two donations sharing one:
+    # the oldest keeps it, and the others get "-duplicate-<their id>" so the constraint can go on
+    Donation = apps.get_model('main', 'Donation')
+    duplicated = (Donation.objects.exclude(transaction_id='').values('transaction_id')
+                  .annotate(count=Count('id')).filter(count__gt=1).values_list('transaction_id', flat=True))
+    for transaction_id in list(duplicated):
+        ids = Donation.objects.filter(transaction_id=transaction_id).order_by('id').values_list('id', flat=True)
+        for donation_id in list(ids)[1:]:
+            suffix = f'-duplicate-{donation_id}'
+            Donation.objects.filter(id=donation_id).update(transaction_id=transaction_id[:200 - len(suffix)] + suffix)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_vendorpriceitem'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(choices=[('PAYPAL', 'PayPal')], default='PAYPAL', max_length=20)),
+                ('payload', models.TextField(help_text='Raw notification body as received')),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, help_text='When the notification was applied to a donation', null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, help_text='Last processing error, if any')),
+            ],
+            options={
+                'ordering': ['received_at'],
+            },
+        ),
+        migrations.RunPython(suffix_duplicate_transaction_ids, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='donation',
+            constraint=models.UniqueConstraint(condition=models.Q(('transaction_id', ''), _negated=True), fields=('transaction_id',), name='main_donation_unique_transaction_id'),
+        ),
+        migrations.AddField(
+            model_name='paymentnotification',
+            name='donation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payment_notifications', to='main.donation'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentnotification',
+            index=models.Index(fields=['processed_at', 'id'], name='main_paynotify_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 6.0 on 2026-10-19 16:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_rollups(apps, schema_editor):
+    Donation = apps.get_model('main', 'Donation')
+    FundDistribution = apps.get_model('main', 'FundDistribution')
+    DonationRollup = apps.get_model('main', 'DonationRollup')
+    DistributionRollup = apps.get_model('main', 'DistributionRollup')
+
+    donations = (
+        Donation.objects.order_by()
+        .annotate(month=TruncMonth('donated_at', output_field=DateField()))
+        .values('month', 'status', 'payment_method')
+        .annotate(count=Count('id'), total=Sum('amount'))
+    )
+    DonationRollup.objects.bulk_create([DonationRollup(**row) for row in donations])
+
+    totals = {}
+    distributions = (
+        FundDistribution.objects.order_by()
+        .annotate(
+            month=TruncMonth('distributed_at', output_field=DateField()),
+            created_month=TruncMonth('created_at', output_field=DateField()),
+        )
+        .values('month', 'created_month', 'vendor_id', 'status')
+        .annotate(count=Count('id'), total=Sum('amount'))
+    )
+    for row in distributions:
+        key = (row['month'] or row['created_month'], row['vendor_id'], row['status'])
+        count, total = totals.get(key, (0, 0))
+        totals[key] = (count + row['count'], total + row['total'])
+    DistributionRollup.objects.bulk_create([
+        DistributionRollup(month=month, vendor_id=vendor_id, status=status, count=count, total=total)
+        for (month, vendor_id, status), (count, total) in totals.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_paymentnotification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DonationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed'), ('CANCELLED', 'Cancelled')], max_length=20)),
+                ('payment_method', models.CharField(max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'ordering': ['-month', 'status', 'payment_method'],
+                'constraints': [models.UniqueConstraint(fields=('month', 'status', 'payment_method'), name='main_donationrollup_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DistributionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month (distributed, or created if not yet distributed)')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending Approval'), ('APPROVED', 'Approved'), ('DISTRIBUTED', 'Distributed'), ('CANCELLED', 'Cancelled')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='distribution_rollups', to='main.vendorsubmission')),
+            ],
+            options={
+                'ordering': ['-month', 'vendor', 'status'],
+                'constraints': [models.UniqueConstraint(fields=('month', 'vendor', 'status'), name='main_distributionrollup_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-19 17:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='datavaultitem',
+            index=models.Index(fields=['-uploaded_at', '-id'], name='main_vault_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['-donated_at', '-id'], name='main_donation_donated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='funddistribution',
+            index=models.Index(fields=['-created_at', '-id'], name='main_funddist_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='memberdocument',
+            index=models.Index(fields=['-uploaded_at', '-id'], name='main_memberdoc_uploaded_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-19 18:40
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_changelist_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(django.db.models.functions.text.Lower('donor_name'), name='main_donation_name_srch_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(django.db.models.functions.text.Lower('donor_email'), name='main_donation_email_srch_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendorsubmission',
+            index=models.Index(django.db.models.functions.text.Lower('service_name'), name='main_vendor_service_srch_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendorsubmission',
+            index=models.Index(django.db.models.functions.text.Lower('business_name'), name='main_vendor_business_srch_idx'),
+        ),
+    ]
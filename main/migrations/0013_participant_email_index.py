@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 19:05
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_prefix_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='participant',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='main_participant_email_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 6.0 on 2026-10-19 19:30
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# As in main/children.py at the time of this migration
+AGE_TOKEN = re.compile(r'(?<!\d)(\d+)\s*(months?|mos?\b|mths?\b)?', re.IGNORECASE)
+MAX_CHILD_AGE = 21
+
+
+def parse_children_ages(apps, schema_editor):
+    Participant = apps.get_model('main', 'Participant')
+    ParticipantChild = apps.get_model('main', 'ParticipantChild')
+
+    participants = Participant.objects.order_by('id').values_list('id', 'children_ages')
+    last_id = 0
+    while batch := list(participants.filter(id__gt=last_id)[:5000]):
+        rows = []
+        for participant_id, text in batch:
+            for number, months in AGE_TOKEN.findall(text or ''):
+                age = int(number) // 12 if months else int(number)
+                if age <= MAX_CHILD_AGE:
+                    rows.append(ParticipantChild(participant_id=participant_id, age=age))
+        ParticipantChild.objects.bulk_create(rows)
+        last_id = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_participant_email_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='program',
+            name='max_age',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Oldest child age the program is for', null=True),
+        ),
+        migrations.AddField(
+            model_name='program',
+            name='min_age',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Youngest child age the program is for', null=True),
+        ),
+        migrations.CreateModel(
+            name='ParticipantChild',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('age', models.PositiveSmallIntegerField()),
+                ('participant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='children', to='main.participant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['age', 'participant'], name='main_child_age_idx')],
+            },
+        ),
+        migrations.RunPython(parse_children_ages, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 6.0 on 2026-10-19 19:55
+
+from datetime import datetime, timedelta
+
+import django.core.validators
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def set_schedule(apps, schema_editor):
+    # As Program.set_schedule() at the time of this migration
+    Program = apps.get_model('main', 'Program')
+
+    last_id = 0
+    while batch := list(Program.objects.filter(id__gt=last_id).order_by('id')[:2000]):
+        for program in batch:
+            starts_at = datetime.combine(program.date, program.time)
+            if settings.USE_TZ:
+                starts_at = timezone.make_aware(starts_at)
+            program.starts_at = starts_at
+            program.ends_at = starts_at + timedelta(minutes=program.duration_minutes)
+        Program.objects.bulk_update(batch, ['starts_at', 'ends_at'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0014_participant_children'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='program',
+            name='duration_minutes',
+            field=models.PositiveSmallIntegerField(default=60, help_text='Length in minutes (up to 12 hours)', validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(720)]),
+        ),
+        migrations.AddField(
+            model_name='program',
+            name='ends_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='program',
+            name='starts_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(set_schedule, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='program',
+            name='ends_at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='program',
+            name='starts_at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='program',
+            index=models.Index(fields=['location', 'starts_at'], name='main_program_loc_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='program',
+            index=models.Index(fields=['starts_at'], name='main_program_start_idx'),
+        ),
+    ]
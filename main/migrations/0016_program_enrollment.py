@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-19 20:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_program_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='program',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, help_text='Seats available; blank for no limit', null=True),
+        ),
+        migrations.AddField(
+            model_name='program',
+            name='seats_taken',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='Enrollment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('ENROLLED', 'Enrolled'), ('WAITLISTED', 'Waitlisted'), ('CANCELLED', 'Cancelled')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('enrolled_at', models.DateTimeField(blank=True, help_text='When the participant got a seat', null=True)),
+                ('participant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enrollments', to='main.participant')),
+                ('program', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enrollments', to='main.program')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['program', 'status', 'id'], name='main_enrollment_queue_idx')],
+                'constraints': [models.UniqueConstraint(fields=('program', 'participant'), name='main_enrollment_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-19 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0018_notifications'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('key', ''), _negated=True), fields=['key'], name='main_job_key_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-19 21:55
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def stamp_existing_price_lists(apps, schema_editor):
+    VendorSubmission = apps.get_model('main', 'VendorSubmission')
+    VendorSubmission.objects.exclude(price_list='').update(price_list_updated_at=F('submitted_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0019_job_key_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vendorsubmission',
+            name='price_list_updated_at',
+            field=models.DateTimeField(blank=True, help_text='When the current price list was uploaded', null=True),
+        ),
+        migrations.RunPython(stamp_existing_price_lists, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-19 22:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0020_vendorsubmission_price_list_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentnotification',
+            name='claimed_by',
+            field=models.CharField(blank=True, help_text='Worker claim that is processing it', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='paymentnotification',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Not tried again before this time'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 6.0 on 2026-10-19 23:10
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def ages_to_birth_years(apps, schema_editor):
+    # Ages were as entered at registration
+    Participant = apps.get_model('main', 'Participant')
+    ParticipantChild = apps.get_model('main', 'ParticipantChild')
+    for registered in Participant.objects.dates('registered_at', 'year'):
+        (ParticipantChild.objects.filter(participant__registered_at__year=registered.year)
+         .update(birth_year=registered.year - F('age')))
+
+
+def birth_years_to_ages(apps, schema_editor):
+    Participant = apps.get_model('main', 'Participant')
+    ParticipantChild = apps.get_model('main', 'ParticipantChild')
+    for registered in Participant.objects.dates('registered_at', 'year'):
+        (ParticipantChild.objects.filter(participant__registered_at__year=registered.year)
+         .update(age=registered.year - F('birth_year')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0021_paymentnotification_retries'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='participantchild',
+            name='main_child_age_idx',
+        ),
+        migrations.AddField(
+            model_name='participantchild',
+            name='birth_year',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='participantchild',
+            name='age',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.RunPython(ages_to_birth_years, birth_years_to_ages),
+        migrations.RemoveField(
+            model_name='participantchild',
+            name='age',
+        ),
+        migrations.AlterField(
+            model_name='participantchild',
+            name='birth_year',
+            field=models.PositiveSmallIntegerField(),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='participantchild',
+            index=models.Index(fields=['birth_year', 'participant'], name='main_child_birth_year_idx'),
+        ),
+    ]
@@ -1,4 +1,10 @@
-from django.db import models
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models, router, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 
@@ -8,13 +14,66 @@ class Program(models.Model):
     date = models.DateField()
     time = models.TimeField()
     location = models.CharField(max_length=200)
+    duration_minutes = models.PositiveSmallIntegerField(
+        default=60, validators=[MinValueValidator(1), MaxValueValidator(12 * 60)], help_text="Length in minutes (up to 12 hours)"
+    )
+    min_age = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Youngest child age the program is for")
+    max_age = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Oldest child age the program is for")
+    capacity = models.PositiveIntegerField(null=True, blank=True, help_text="Seats available; blank for no limit")
+    # Enrolled participants; changed only by main/enrollment.py's conditional UPDATEs
+    seats_taken = models.PositiveIntegerField(default=0, editable=False)
+    # date + time + duration as instants, for calendar and conflict queries; set on save
+    starts_at = models.DateTimeField(editable=False)
+    ends_at = models.DateTimeField(editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return self.title
 
+    def set_schedule(self):
+        """Fill starts_at/ends_at from date, time (local to TIME_ZONE) and duration_minutes"""
+        # Strings too ('2026-11-01', '10:00'), as from a form or the Flask app, the way save() takes them
+        self.date = self._meta.get_field('date').to_python(self.date)
+        self.time = self._meta.get_field('time').to_python(self.time)
+        starts_at = datetime.combine(self.date, self.time)
+        if settings.USE_TZ:
+            starts_at = timezone.make_aware(starts_at)
+        self.starts_at = starts_at
+        self.ends_at = starts_at + timedelta(minutes=self.duration_minutes)
+
+    @property
+    def seats_left(self):
+        """Open seats, or None if the program has no capacity limit"""
+        return None if self.capacity is None else max(self.capacity - self.seats_taken, 0)
+
+    def save(self, *args, **kwargs):
+        self.set_schedule()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding:
+            # Never write back seats_taken as loaded: enrollments may have moved it since
+            update_fields = [field.name for field in self._meta.concrete_fields
+                             if not field.primary_key and field.name != 'seats_taken']
+        if update_fields is not None and {'date', 'time', 'duration_minutes'} & set(update_fields):
+            update_fields = {*update_fields, 'starts_at', 'ends_at'}
+        if update_fields is not None:
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
+    @property
+    def age_band(self):
+        """(youngest, oldest) child age the program targets, either end None if open; None for all ages"""
+        if self.min_age is None and self.max_age is None:
+            return None
+        return (self.min_age, self.max_age)
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Conflict checks: programs at one location starting in a time window
+            models.Index(fields=['location', 'starts_at'], name='main_program_loc_start_idx'),
+            # Calendar pages and the iCalendar feed: programs in a date range
+            models.Index(fields=['starts_at'], name='main_program_start_idx'),
+        ]
 
 
 class Participant(models.Model):
@@ -29,6 +88,54 @@ class Participant(models.Model):
 
     class Meta:
         ordering = ['-registered_at']
+        indexes = [
+            # Duplicate checks in bulk imports: WHERE LOWER(email) IN (...)
+            models.Index(Lower('email'), name='main_participant_email_idx'),
+        ]
+
+
+class Enrollment(models.Model):
+    """A participant's seat, or place in the waitlist, for a program (see main/enrollment.py)"""
+    STATUS_CHOICES = [
+        ('ENROLLED', 'Enrolled'),
+        ('WAITLISTED', 'Waitlisted'),
+        ('CANCELLED', 'Cancelled'),
+    ]
+
+    program = models.ForeignKey(Program, on_delete=models.CASCADE, related_name='enrollments')
+    participant = models.ForeignKey(Participant, on_delete=models.CASCADE, related_name='enrollments')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+    enrolled_at = models.DateTimeField(null=True, blank=True, help_text='When the participant got a seat')
+
+    def __str__(self):
+        return f"{self.participant.name} - {self.program.title} ({self.get_status_display()})"
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['program', 'participant'], name='main_enrollment_unique'),
+        ]
+        indexes = [
+            # Waitlist head and position: WHERE program_id = ? AND status = 'WAITLISTED' ORDER BY id
+            models.Index(fields=['program', 'status', 'id'], name='main_enrollment_queue_idx'),
+        ]
+
+
+class ParticipantChild(models.Model):
+    """One child, parsed from Participant.children_ages (see main/children.py)"""
+    participant = models.ForeignKey(Participant, on_delete=models.CASCADE, related_name='children')
+    # Approximate: the year the age was given in, less the age
+    birth_year = models.PositiveSmallIntegerField()
+
+    def __str__(self):
+        return f"{self.participant.name} - born about {self.birth_year}"
+
+    class Meta:
+        indexes = [
+            # Age bands: WHERE birth_year BETWEEN ? AND ?, covering the participant id
+            models.Index(fields=['birth_year', 'participant'], name='main_child_birth_year_idx'),
+        ]
 
 
 class Document(models.Model):
@@ -187,12 +294,20 @@ class MemberDocument(models.Model):
     uploaded_at = models.DateTimeField(auto_now_add=True)
     notes = models.TextField(blank=True, help_text='Optional notes about this document')
     is_verified = models.BooleanField(default=False, help_text='Admin verification status')
+    is_reviewed = models.BooleanField(default=False, help_text='Admin review status (verified or rejected)')
+    reviewed_at = models.DateTimeField(null=True, blank=True, help_text='When the document was verified or rejected')
 
     def __str__(self):
         return f"{self.participant.name} - {self.get_document_type_display()}"
 
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            # Keyset pagination of the review queue: WHERE is_reviewed = false AND id < ? ORDER BY id DESC
+            models.Index(fields=['is_reviewed', '-id'], name='main_memberdoc_review_idx'),
+            # Admin changelist order (ORDER BY uploaded_at DESC, id DESC LIMIT n) without sorting the table
+            models.Index(fields=['-uploaded_at', '-id'], name='main_memberdoc_uploaded_idx'),
+        ]
 
 
 class VendorSubmission(models.Model):
@@ -226,12 +341,40 @@ class VendorSubmission(models.Model):
     submitted_at = models.DateTimeField(auto_now_add=True)
     is_reviewed = models.BooleanField(default=False, help_text='Admin review status')
     is_approved = models.BooleanField(default=False, help_text='Admin approval status')
+    price_list_updated_at = models.DateTimeField(null=True, blank=True, help_text='When the current price list was uploaded')
+    price_list_ingested_at = models.DateTimeField(null=True, blank=True, help_text='When the price list was last loaded into the pricing catalog')
 
     def __str__(self):
         return f"{self.service_name} - {self.contact_name}"
 
     class Meta:
         ordering = ['-submitted_at']
+        indexes = [
+            # Case-insensitive prefix search in the fund distribution form
+            models.Index(Lower('service_name'), name='main_vendor_service_srch_idx'),
+            models.Index(Lower('business_name'), name='main_vendor_business_srch_idx'),
+        ]
+
+
+class VendorPriceItem(models.Model):
+    vendor = models.ForeignKey(VendorSubmission, on_delete=models.CASCADE, related_name='price_items')
+    item = models.CharField(max_length=200)
+    category = models.CharField(max_length=100, blank=True, help_text='Lower-cased category, e.g. "tutoring"')
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    unit = models.CharField(max_length=50, blank=True, help_text='Pricing unit, e.g. "hour" or "session"')
+    discount_percentage = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True, help_text='Member discount for this item (falls back to the vendor discount)')
+    row_number = models.PositiveIntegerField(help_text='Row in the uploaded price list')
+
+    def __str__(self):
+        return f"{self.item} - ${self.price}"
+
+    class Meta:
+        ordering = ['price']
+        indexes = [
+            # "cheapest <category> under $X": WHERE category = ? AND price < ? ORDER BY price
+            models.Index(fields=['category', 'price'], name='main_priceitem_cat_price_idx'),
+            models.Index(fields=['price'], name='main_priceitem_price_idx'),
+        ]
 
 
 class Donation(models.Model):
@@ -255,8 +398,120 @@ class Donation(models.Model):
     def __str__(self):
         return f"{self.donor_name} - ${self.amount} - {self.get_status_display()}"
 
+    def save(self, *args, **kwargs):
+        # The rollup delta (main/signals.py) commits or rolls back with the row
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(type(self), instance=self)):
+            super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['-donated_at']
+        indexes = [
+            # Admin changelist order and date hierarchy ranges
+            models.Index(fields=['-donated_at', '-id'], name='main_donation_donated_idx'),
+            # Case-insensitive prefix search in the fund distribution form
+            models.Index(Lower('donor_name'), name='main_donation_name_srch_idx'),
+            models.Index(Lower('donor_email'), name='main_donation_email_srch_idx'),
+        ]
+        constraints = [
+            # Manually entered donations may have no transaction ID; processor ones must be unique
+            models.UniqueConstraint(fields=['transaction_id'], condition=~models.Q(transaction_id=''), name='main_donation_unique_transaction_id'),
+        ]
+
+
+class PaymentNotification(models.Model):
+    PROVIDER_CHOICES = [
+        ('PAYPAL', 'PayPal'),
+    ]
+
+    provider = models.CharField(max_length=20, choices=PROVIDER_CHOICES, default='PAYPAL')
+    payload = models.TextField(help_text='Raw notification body as received')
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True, help_text='When the notification was applied to a donation')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now, help_text='Not tried again before this time')
+    claimed_by = models.CharField(max_length=100, blank=True, help_text='Worker claim that is processing it')
+    error = models.TextField(blank=True, help_text='Last processing error, if any')
+    donation = models.ForeignKey(Donation, on_delete=models.SET_NULL, null=True, blank=True, related_name='payment_notifications')
+
+    def __str__(self):
+        return f"{self.get_provider_display()} notification #{self.id}"
+
+    class Meta:
+        ordering = ['received_at']
+        indexes = [
+            # Worker queue scan: WHERE processed_at IS NULL ORDER BY id
+            models.Index(fields=['processed_at', 'id'], name='main_paynotify_queue_idx'),
+        ]
+
+
+class Job(models.Model):
+    """A background task for the run_jobs workers (see main/jobs.py)"""
+    STATUS_CHOICES = [
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100, help_text='Registered task name')
+    kwargs = models.JSONField(default=dict, blank=True, help_text='Keyword arguments for the task')
+    key = models.CharField(max_length=200, blank=True, help_text='At most one queued job per key (blank: no limit)')
+    priority = models.SmallIntegerField(default=0, help_text='Higher runs first')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='QUEUED')
+    run_at = models.DateTimeField(default=timezone.now, help_text='Not run before this time')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    locked_by = models.CharField(max_length=100, blank=True, help_text='Worker claim that ran the job last')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, help_text='Traceback of the last failure')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.get_status_display()})"
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['key'], condition=models.Q(status='QUEUED') & ~models.Q(key=''),
+                                    name='main_job_queued_key_unique'),
+        ]
+        indexes = [
+            # Claims: WHERE status = 'QUEUED' AND run_at <= now ORDER BY priority DESC, run_at, id
+            models.Index(fields=['status', '-priority', 'run_at', 'id'], name='main_job_queue_idx'),
+            # Has this been asked for already: WHERE key = ? (any status)
+            models.Index(fields=['key'], condition=~models.Q(key=''), name='main_job_key_idx'),
+        ]
+
+
+class Notification(models.Model):
+    """An outgoing email, sent in batches by the send_notifications task (see main/notifications.py)"""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENDING', 'Sending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    ]
+
+    template = models.CharField(max_length=100, help_text='Name under templates/emails/')
+    to_email = models.EmailField()
+    context = models.JSONField(default=dict, blank=True, help_text='Template context')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    claimed_by = models.CharField(max_length=100, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.template} to {self.to_email} ({self.get_status_display()})"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='main_notification_queue_idx'),
+        ]
 
 
 class FundDistribution(models.Model):
@@ -281,8 +536,17 @@ class FundDistribution(models.Model):
     def __str__(self):
         return f"${self.amount} to {self.vendor.service_name} from {self.donation.donor_name}"
 
+    def save(self, *args, **kwargs):
+        # The rollup delta (main/signals.py) commits or rolls back with the row
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(type(self), instance=self)):
+            super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Admin changelist order and date hierarchy ranges
+            models.Index(fields=['-created_at', '-id'], name='main_funddist_created_idx'),
+        ]
 
 
 class DataVaultItem(models.Model):
@@ -316,5 +580,45 @@ class DataVaultItem(models.Model):
 
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            # Admin changelist order and date hierarchy ranges
+            models.Index(fields=['-uploaded_at', '-id'], name='main_vault_uploaded_idx'),
+        ]
         verbose_name = 'Data Vault Item'
         verbose_name_plural = 'Data Vault Items'
+
+
+# Pre-aggregated report tables, kept current by main.rollups
+class DonationRollup(models.Model):
+    month = models.DateField(help_text='First day of the month')
+    status = models.CharField(max_length=20, choices=Donation.STATUS_CHOICES)
+    payment_method = models.CharField(max_length=50)
+    count = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.status} {self.payment_method}: ${self.total}"
+
+    class Meta:
+        ordering = ['-month', 'status', 'payment_method']
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'status', 'payment_method'], name='main_donationrollup_unique'),
+        ]
+
+
+class DistributionRollup(models.Model):
+    month = models.DateField(help_text='First day of the month (distributed, or created if not yet distributed)')
+    vendor = models.ForeignKey(VendorSubmission, on_delete=models.CASCADE, related_name='distribution_rollups')
+    status = models.CharField(max_length=20, choices=FundDistribution.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.vendor_id} {self.status}: ${self.total}"
+
+    class Meta:
+        ordering = ['-month', 'vendor', 'status']
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'vendor', 'status'], name='main_distributionrollup_unique'),
+        ]
+
@@ -0,0 +1,267 @@
+"""
+Notification emails, queued in the database and sent in batches.
+
+notify() only inserts a Notification row (in the caller's transaction), so
+a request never waits on the mail server. The send_notifications task (see
+main/tasks.py) runs every SEND_INTERVAL and drains the queue:
+
+* BATCH_SIZE notifications at a time are claimed with one conditional
+  UPDATE (PENDING -> SENDING), which two senders can never both win;
+* each batch is rendered with every template it uses loaded once (Django's
+  cached loader compiles each template once per process);
+* messages go out over one SMTP connection, opened once and reused for up
+  to MESSAGES_PER_CONNECTION messages, instead of a connect, EHLO,
+  (STARTTLS, AUTH) and QUIT per message;
+* the outcome is written back with one UPDATE for everything sent.
+
+An address the server refuses, or a template that doesn't render, fails
+that notification for good. Any other SMTP or network error leaves the
+rest of the queue for the next run, and a notification that has had
+MAX_ATTEMPTS fails. Emails are templates/emails/<name>_subject.txt,
+<name>.txt and optionally <name>.html, rendered with the stored context.
+
+For a local SMTP server, run ``python manage.py smtp_standin`` (needs
+aiosmtpd). To time sending with and without batching against it:
+``python manage.py shell -c "from main.notifications import _benchmark; _benchmark()"``
+"""
+import logging
+import smtplib
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import F
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+# Notifications claimed and sent per round trip
+BATCH_SIZE = 100
+
+# Most messages sent over one SMTP connection (many servers cap this) before reconnecting
+MESSAGES_PER_CONNECTION = 100
+
+# Sends of one notification before it is given up on
+MAX_ATTEMPTS = 5
+
+# How often the send_notifications task drains the queue
+SEND_INTERVAL = timedelta(seconds=30)
+
+# A claim older than this is assumed lost with its worker
+LEASE = timedelta(minutes=10)
+
+
+def notify(template, to_email, context=None):
+    """Queue an email to to_email from templates/emails/<template>*; context must be JSON-serialisable"""
+    if not to_email:
+        return None
+    return Notification.objects.create(template=template, to_email=to_email, context=context or {})
+
+
+def email_templates(name):
+    """(subject, text, html or None) templates of an email"""
+    try:
+        html = get_template(f'emails/{name}.html')
+    except TemplateDoesNotExist:
+        html = None
+    return get_template(f'emails/{name}_subject.txt'), get_template(f'emails/{name}.txt'), html
+
+
+def build(notifications, connection):
+    """EmailMultiAlternatives per notification, or the exception rendering it raised"""
+    templates = {}
+    messages = []
+    for notification in notifications:
+        try:
+            if notification.template not in templates:
+                templates[notification.template] = email_templates(notification.template)
+            subject, text, html = templates[notification.template]
+            context = notification.context
+            message = EmailMultiAlternatives(' '.join(subject.render(context).split()), text.render(context),
+                                             settings.DEFAULT_FROM_EMAIL, [notification.to_email], connection=connection)
+            if html is not None:
+                message.attach_alternative(html.render(context), 'text/html')
+        except Exception as e:
+            message = e
+        messages.append(message)
+    return messages
+
+
+def claim(limit=BATCH_SIZE):
+    """Mark up to `limit` pending notifications SENDING for this sender and return them"""
+    claim_id = uuid.uuid4().hex
+    # The WHERE status = 'PENDING' is rechecked on each row as it is updated, so
+    # a row claimed by someone else in the meantime is skipped, on any database
+    due = Notification.objects.filter(status='PENDING').order_by('id').values('id')[:limit]
+    claimed = Notification.objects.filter(status='PENDING', id__in=due).update(
+        status='SENDING', claimed_by=claim_id, claimed_at=timezone.now(), attempts=F('attempts') + 1)
+    if not claimed:
+        return []
+    return list(Notification.objects.filter(status='SENDING', claimed_by=claim_id).order_by('id'))
+
+
+def is_permanent(error):
+    """True for failures that retrying won't fix: a refused address, a 5xx reply, a broken template"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return not isinstance(error, (smtplib.SMTPException, OSError))
+
+
+def send_batch(notifications, connection, state):
+    """
+    Send claimed notifications over `connection` and record the outcome;
+    returns (sent, failed, retry) where retry is True if the server had
+    trouble and the rest of the queue should wait.
+    """
+    sent, failed, retry = [], [], None
+    for notification, message in zip(notifications, build(notifications, connection)):
+        if isinstance(message, Exception):
+            failed.append((notification, message))
+            continue
+        if state['on_connection'] >= MESSAGES_PER_CONNECTION:
+            connection.close()
+            state['on_connection'] = 0
+        try:
+            connection.open()  # a no-op while open; send_messages() would close a connection it opened itself
+            connection.send_messages([message])
+        except Exception as e:
+            if is_permanent(e) or notification.attempts >= MAX_ATTEMPTS:
+                failed.append((notification, e))
+                continue
+            logger.warning('Sending notification %s failed, will retry: %s', notification.id, e)
+            connection.close()
+            state['on_connection'] = 0
+            retry = (notification, e)
+            break
+        state['on_connection'] += 1
+        sent.append(notification)
+
+    Notification.objects.filter(id__in=[n.id for n in sent]).update(status='SENT', sent_at=timezone.now(), error='')
+    for notification, error in failed:
+        logger.error('Notification %s to %s failed: %s', notification.id, notification.to_email, error)
+        Notification.objects.filter(id=notification.id).update(status='FAILED', error=str(error) or repr(error))
+    done = {n.id for n in sent} | {n.id for n, _ in failed}
+    if retry is not None:
+        notification, error = retry
+        Notification.objects.filter(id=notification.id).update(status='PENDING', error=str(error) or repr(error))
+        done.add(notification.id)
+    # Not tried at all: this claim doesn't count as an attempt
+    untried = [n.id for n in notifications if n.id not in done]
+    if untried:
+        Notification.objects.filter(id__in=untried, status='SENDING').update(status='PENDING', attempts=F('attempts') - 1)
+    return len(sent), len(failed), retry is not None
+
+
+def requeue_lost():
+    """Put back notifications claimed by a sender that died mid-batch"""
+    return Notification.objects.filter(status='SENDING', claimed_at__lt=timezone.now() - LEASE).update(status='PENDING')
+
+
+def send_pending(batch_size=BATCH_SIZE, connection=None):
+    """Send queued notifications until none are left or the server has trouble; returns (sent, failed)"""
+    requeue_lost()
+    connection = connection or get_connection()
+    state = {'on_connection': 0}
+    total_sent = total_failed = 0
+    try:
+        while batch := claim(batch_size):
+            sent, failed, retry = send_batch(batch, connection, state)
+            total_sent += sent
+            total_failed += failed
+            if retry:
+                break
+    finally:
+        connection.close()
+    return total_sent, total_failed
+
+
+def _benchmark(messages=2000, repeat=3, port=8025):
+    import multiprocessing
+    import statistics
+    import time
+
+    from django.db import connection as db_connection
+    from django.template import Context, engines
+    from django.template.engine import Engine
+    from django.test.utils import setup_test_environment
+
+    from .management.commands.smtp_standin import StandinHandler
+
+    def serve(commands):
+        # In its own process, so the server doesn't compete with the sender for the GIL
+        from aiosmtpd.controller import Controller
+        handler = StandinHandler()
+        controller = Controller(handler, hostname='127.0.0.1', port=port)
+        controller.start()
+        commands.send('ready')
+        while commands.recv() != 'stop':
+            commands.send((handler.sessions, handler.received))
+            handler.reset()
+        controller.stop()
+
+    setup_test_environment()  # switches EMAIL_BACKEND to locmem: SMTP connections are made explicitly below
+
+    def smtp():
+        return get_connection('django.core.mail.backends.smtp.EmailBackend', host='127.0.0.1', port=port)
+
+    def queue():
+        Notification.objects.all().delete()
+        Notification.objects.bulk_create([
+            Notification(template='welcome', to_email=f'parent{i}@example.com', context={'name': f'Parent {i}'})
+            for i in range(messages)
+        ])
+
+    cached = engines.all()[0].engine
+    uncached = Engine(dirs=cached.dirs, loaders=['django.template.loaders.filesystem.Loader',
+                                                 'django.template.loaders.app_directories.Loader'])
+
+    def one_connection_per_message(engine):
+        # The same messages, each with its own templates lookup and SMTP connection
+        def send():
+            for notification in Notification.objects.filter(status='PENDING').iterator():
+                context = Context(notification.context)
+                message = EmailMultiAlternatives(
+                    engine.get_template('emails/welcome_subject.txt').render(context).strip(),
+                    engine.get_template('emails/welcome.txt').render(context),
+                    settings.DEFAULT_FROM_EMAIL, [notification.to_email], connection=smtp())
+                message.attach_alternative(engine.get_template('emails/welcome.html').render(context), 'text/html')
+                message.send()
+                Notification.objects.filter(id=notification.id).update(status='SENT', sent_at=timezone.now())
+        return send
+
+    commands, server_end = multiprocessing.Pipe()
+    server = multiprocessing.get_context('fork').Process(target=serve, args=(server_end,))
+    server.start()
+    commands.recv()
+    old_name = db_connection.creation.create_test_db(verbosity=0)
+    try:
+        print(f'{messages:,} welcome emails (text and HTML) to a local aiosmtpd server')
+        for label, send in [
+            ('connection per message, templates reparsed (before)', one_connection_per_message(uncached)),
+            ('connection per message, cached templates', one_connection_per_message(cached)),
+            (f'batches of {BATCH_SIZE}, one reused connection (after)', lambda: send_pending(connection=smtp())),
+        ]:
+            times = []
+            for _ in range(repeat):
+                queue()
+                commands.send('reset')
+                commands.recv()
+                started = time.perf_counter()
+                send()
+                times.append(time.perf_counter() - started)
+            commands.send('stats')
+            sessions, received = commands.recv()
+            elapsed = statistics.median(times)
+            print(f'{label:<56} {messages / elapsed:8,.0f} messages/s  '
+                  f'({sessions:,} SMTP sessions, {received:,} received)')
+    finally:
+        commands.send('stop')
+        server.join()
+        db_connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,32 @@
+"""
+Reading values out of uploaded spreadsheets and processor exports.
+
+Shared by the vendor price lists (main/pricelists.py), participant imports
+(main/participant_import.py) and donation reconciliation
+(main/reconciliation.py), whose files come with loosely spelled headers and
+amounts written for people rather than machines.
+"""
+from decimal import Decimal, InvalidOperation
+
+
+def normalize_header(value):
+    """A header cell lower-cased without spaces, underscores or dashes, for matching column aliases"""
+    return ''.join(str(value or '').lower().split()).replace('_', '').replace('-', '')
+
+
+def parse_decimal(value):
+    """Parse "$1,234.50" / "10%" / 12.5 into a Decimal, or None (also for NaN and infinities)"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float, Decimal)):
+        number = Decimal(str(value))
+    else:
+        text = str(value).strip().replace('$', '').replace(',', '').rstrip('%').strip()
+        if not text:
+            return None
+        try:
+            number = Decimal(text)
+        except InvalidOperation:
+            return None
+    # Decimal() reads "NaN" and "Infinity", which no price or amount can be (and NaN < 0 raises)
+    return number if number.is_finite() else None
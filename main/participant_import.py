@@ -0,0 +1,198 @@
+"""
+Bulk participant import.
+
+import_participants() streams a CSV/XLSX file (read the same way as vendor
+price lists, so XLSX needs openpyxl) and adds a Participant for each valid
+row:
+
+* every row is cleaned with ParticipantForm's own fields, so the required,
+  length and email rules are exactly those of the new_participant page,
+  without building a bound form and model instance per row;
+* rows are handled BATCH_SIZE at a time. Emails that are already registered,
+  or appear earlier in the file, are found with one ``LOWER(email) IN (...)``
+  query per batch (served by the participant email index) and skipped;
+* each batch goes in with a single bulk_create (plus one for the parsed
+  children's ages) in its own transaction, so an interrupted import keeps
+  the batches it finished and can simply be re-run.
+
+Only the current batch is held in memory; per-row errors are passed to a
+callback as they are found rather than collected.
+
+Uploads from the admin page are not imported in the request: queue_import()
+saves the file to UPLOAD_DIR and queues the import_participants job (see
+main/tasks.py), which emails the results to the staff member who uploaded
+it and then deletes the file.
+"""
+import os
+from dataclasses import dataclass
+
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from .children import add_children
+from .forms import ParticipantForm
+from .models import Participant
+from .parsing import normalize_header
+from .pricelists import can_ingest, iter_rows
+from .utils import batched
+
+BATCH_SIZE = 2000
+
+# The results email lists at most this many row errors
+MAX_REPORTED_ERRORS = 100
+
+# Admin uploads wait here for their import job
+UPLOAD_DIR = 'participant_imports'
+
+# Accepted spellings for each participant column, compared after normalize_header()
+COLUMN_ALIASES = {
+    'name': ['name', 'fullname', 'parentname', 'participant', 'participantname'],
+    'email': ['email', 'emailaddress', 'parentemail'],
+    'phone': ['phone', 'phonenumber', 'mobile', 'cell', 'telephone'],
+    'children_ages': ['childrenages', "children'sages", 'childrensages', 'ages', 'kidsages'],
+}
+
+
+class ParticipantImportError(Exception):
+    """Raised when an import file cannot be read at all"""
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    imported: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+
+
+def map_columns(header):
+    """Map participant fields to column positions in the header row"""
+    positions = {normalize_header(value): index for index, value in enumerate(header)}
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in positions:
+                columns[field] = positions[alias]
+                break
+    missing = [ParticipantForm.base_fields[field].label for field in COLUMN_ALIASES if field not in columns]
+    if missing:
+        raise ParticipantImportError(f'Missing column(s): {", ".join(missing)}.')
+    return columns
+
+
+def cell_text(value):
+    """Spreadsheet cell as form input: XLSX numbers like 5550100.0 lose the '.0'"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def clean_row(columns, row):
+    """(cleaned data, errors) for one row, using ParticipantForm's field rules"""
+    data, errors = {}, {}
+    for name, field in ParticipantForm.base_fields.items():
+        index = columns[name]
+        try:
+            data[name] = field.clean(cell_text(row[index]) if index < len(row) else '')
+        except ValidationError as e:
+            errors[name] = e.messages
+    return data, errors
+
+
+def insert_batch(valid, result, on_error):
+    """Skip already-registered emails, then bulk_create the rest of a batch"""
+    keys = {data['email'].lower() for row_number, data in valid}
+    seen = set(Participant.objects.annotate(email_key=Lower('email'))
+               .filter(email_key__in=keys).order_by().values_list('email_key', flat=True))
+    participants = []
+    for row_number, data in valid:
+        key = data['email'].lower()
+        if key in seen:
+            result.duplicates += 1
+            if on_error:
+                on_error(row_number, {'email': ['A participant with this email is already registered.']})
+            continue
+        seen.add(key)
+        participants.append(Participant(**data))
+    with transaction.atomic():
+        Participant.objects.bulk_create(participants)
+        add_children(participants)
+    result.imported += len(participants)
+
+
+def import_participants(file, batch_size=BATCH_SIZE, on_error=None, progress=None):
+    """
+    Add the participants in a CSV/XLSX file (an upload or a django File);
+    returns an ImportResult. on_error(row_number, {field: [messages]}) is
+    called for each row skipped, progress(result) after each batch.
+    """
+    if not can_ingest(file.name):
+        raise ParticipantImportError(f'Unsupported file format: {file.name} (use .csv or .xlsx)')
+
+    rows = iter_rows(file)
+    try:
+        columns = map_columns(next(rows))
+    except StopIteration:
+        raise ParticipantImportError('The file is empty.')
+
+    result = ImportResult()
+    for batch in batched(enumerate(rows, start=2), batch_size):
+        valid = []
+        for row_number, row in batch:
+            if not any(cell_text(value) for value in row):
+                continue  # blank line
+            result.rows += 1
+            data, errors = clean_row(columns, row)
+            if errors:
+                result.invalid += 1
+                if on_error:
+                    on_error(row_number, errors)
+            else:
+                valid.append((row_number, data))
+        if valid:
+            insert_batch(valid, result, on_error)
+        if progress:
+            progress(result)
+    return result
+
+
+def queue_import(upload, email=''):
+    """Save an admin upload and queue its import; the results are emailed to `email`. Returns the Job."""
+    from .jobs import enqueue
+
+    if not can_ingest(upload.name):
+        raise ParticipantImportError(f'Unsupported file format: {upload.name} (use .csv or .xlsx)')
+    name = default_storage.save(f'{UPLOAD_DIR}/{os.path.basename(upload.name)}', upload)
+    return enqueue('import_participants', {'name': name, 'email': email})
+
+
+def import_upload(name, email=''):
+    """Import a file saved by queue_import(), email the outcome, then delete the file; returns the ImportResult"""
+    from .notifications import notify
+
+    if not default_storage.exists(name):
+        return None  # imported already, by an earlier run of the job
+    errors = []
+
+    def on_error(row_number, row_errors):
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append([row_number, row_errors])
+
+    context = {'file': os.path.basename(name)}
+    try:
+        with default_storage.open(name, 'rb') as file:
+            result = import_participants(file, on_error=on_error)
+    except ParticipantImportError as e:
+        notify('participant_import_finished', email, {**context, 'error': str(e)})
+        default_storage.delete(name)
+        raise
+    notify('participant_import_finished', email, {
+        **context, 'rows': result.rows, 'imported': result.imported, 'duplicates': result.duplicates,
+        'invalid': result.invalid, 'errors': errors, 'more_errors': result.invalid + result.duplicates - len(errors),
+    })
+    default_storage.delete(name)
+    return result
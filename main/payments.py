@@ -0,0 +1,207 @@
+"""
+PayPal IPN (Instant Payment Notification) ingestion.
+
+The web endpoint only stores the raw notification as a PaymentNotification
+row and returns immediately, so a burst of notifications never ties up web
+workers. The ``process_payment_notifications`` worker verifies each one with
+PayPal and upserts the matching Donation, keyed on its unique transaction_id.
+
+Workers claim a batch in one short UPDATE, then verify each notification
+with no transaction open (holding one across PayPal round trips would block
+the web endpoint's inserts on SQLite) and apply it in a transaction of its
+own. A notification that fails for any reason is tried again after
+RETRY_DELAY, doubling each time, until it has had MAX_ATTEMPTS. One that can
+never apply (InvalidNotification: an amount that isn't a usable number, the
+wrong currency or receiver) fails for good on its first attempt instead.
+"""
+import logging
+import uuid
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from urllib.parse import parse_qsl
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Donation, PaymentNotification
+
+logger = logging.getLogger(__name__)
+
+# Give up on a notification after this many failed attempts
+MAX_ATTEMPTS = 5
+
+# Wait before retrying a failed notification, doubling with each attempt, and the cap
+RETRY_DELAY = timedelta(minutes=5)
+RETRY_MAX_DELAY = timedelta(hours=2)
+
+# A claim older than this is assumed lost with its worker
+LEASE = timedelta(minutes=10)
+
+PAYPAL_STATUS_MAP = {
+    'Pending': 'PENDING',
+    'Completed': 'COMPLETED',
+    'Processed': 'COMPLETED',
+    'Failed': 'FAILED',
+    'Denied': 'FAILED',
+    'Expired': 'FAILED',
+    'Voided': 'FAILED',
+    'Refunded': 'CANCELLED',
+    'Reversed': 'CANCELLED',
+}
+
+# Statuses only move forward, so a late or replayed "Pending" never undoes "Completed"
+STATUS_RANK = {
+    'PENDING': 0,
+    'COMPLETED': 1,
+    'FAILED': 1,
+    'CANCELLED': 2,
+}
+
+
+class NotificationError(Exception):
+    """Raised when a notification cannot be applied"""
+
+
+class InvalidNotification(NotificationError):
+    """Raised when a notification will never apply, however often it is tried"""
+
+
+def parse_ipn(payload):
+    """Decode a urlencoded IPN body into a dict"""
+    fields = dict(parse_qsl(payload, keep_blank_values=True))
+    charset = fields.get('charset')
+    if charset and charset.lower() not in ('utf-8', 'utf8'):
+        try:
+            fields = dict(parse_qsl(payload, keep_blank_values=True, encoding=charset))
+        except LookupError:
+            pass
+    return fields
+
+
+def verify_ipn(payload):
+    """Ask PayPal whether it really sent this notification"""
+    verify_url = getattr(settings, 'PAYPAL_IPN_VERIFY_URL', '')
+    if not verify_url:
+        return True  # verification disabled (local development only)
+    body = ('cmd=_notify-validate&' + payload).encode('ascii', 'replace')
+    request = Request(verify_url, data=body, headers={'Content-Type': 'application/x-www-form-urlencoded'})
+    with urlopen(request, timeout=getattr(settings, 'PAYPAL_IPN_VERIFY_TIMEOUT', 10)) as response:
+        return response.read().strip() == b'VERIFIED'
+
+
+def upsert_donation(fields):
+    """Create or advance the Donation for an IPN, idempotently"""
+    status = PAYPAL_STATUS_MAP.get(fields.get('payment_status'))
+    if status is None:
+        raise NotificationError(f"Unhandled payment_status {fields.get('payment_status')!r}")
+
+    receiver = getattr(settings, 'PAYPAL_RECEIVER_EMAIL', '')
+    if receiver and fields.get('receiver_email', '').lower() != receiver.lower():
+        raise InvalidNotification(f"Unexpected receiver_email {fields.get('receiver_email')!r}")
+
+    currency = getattr(settings, 'PAYPAL_CURRENCY', '')
+    if currency and fields.get('mc_currency', '').upper() != currency.upper():
+        raise InvalidNotification(f"Unexpected mc_currency {fields.get('mc_currency')!r}")
+
+    # Refunds and reversals arrive under a new txn_id that points at the original
+    transaction_id = fields.get('parent_txn_id') if status == 'CANCELLED' else None
+    transaction_id = transaction_id or fields.get('txn_id')
+    if not transaction_id:
+        raise NotificationError('Notification has no txn_id')
+
+    with transaction.atomic():
+        donation = Donation.objects.select_for_update().filter(transaction_id=transaction_id).first()
+        if donation is None:
+            if status == 'CANCELLED':
+                raise NotificationError(f'Refund for unknown transaction {transaction_id}')
+            amount = parse_amount(fields.get('mc_gross', ''))
+            name = f"{fields.get('first_name', '')} {fields.get('last_name', '')}".strip()
+            try:
+                with transaction.atomic():
+                    return Donation.objects.create(
+                        donor_name=name or fields.get('payer_email', 'PayPal donor'),
+                        donor_email=fields.get('payer_email', ''),
+                        amount=amount,
+                        payment_method='PayPal',
+                        status=status,
+                        transaction_id=transaction_id,
+                    )
+            except IntegrityError:
+                # Another worker inserted the same transaction first; fall through to update it
+                donation = Donation.objects.select_for_update().get(transaction_id=transaction_id)
+
+        if STATUS_RANK[status] > STATUS_RANK[donation.status]:
+            donation.status = status
+            donation.save(update_fields=['status'])
+    return donation
+
+
+def parse_amount(value):
+    """mc_gross as a Decimal that Donation.amount can hold"""
+    field = Donation._meta.get_field('amount')
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        amount = None
+    # Decimal() also reads "NaN" and "Infinity"
+    if amount is None or not amount.is_finite() or amount <= 0 or amount >= 10 ** (field.max_digits - field.decimal_places):
+        raise InvalidNotification(f'Invalid mc_gross {value!r}')
+    return amount
+
+
+def claim(limit=100):
+    """Mark up to `limit` due notifications as claimed by this worker and return them"""
+    claim_id = uuid.uuid4().hex
+    now = timezone.now()
+    due = (PaymentNotification.objects.filter(processed_at__isnull=True, attempts__lt=MAX_ATTEMPTS, next_attempt_at__lte=now)
+           .order_by('id'))
+    # Conditions are rechecked on each row as it is updated, so two workers never claim the same one.
+    # Pushing next_attempt_at past the LEASE hides the rows until then, or until they are released.
+    claimed = PaymentNotification.objects.filter(id__in=due.values('id')[:limit], next_attempt_at__lte=now).update(
+        claimed_by=claim_id, next_attempt_at=now + LEASE, attempts=F('attempts') + 1)
+    if not claimed:
+        return []
+    return list(PaymentNotification.objects.filter(claimed_by=claim_id, processed_at__isnull=True).order_by('id'))
+
+
+def retry_delay(attempts):
+    """Wait after a notification's failed attempt number `attempts`"""
+    return min(RETRY_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+
+def process(notification):
+    """Verify and apply one claimed notification, recording the outcome; returns True if it was applied"""
+    mine = PaymentNotification.objects.filter(id=notification.id, claimed_by=notification.claimed_by)
+    try:
+        # Outside any transaction: the HTTP round trip to PayPal mustn't hold database locks
+        if not verify_ipn(notification.payload):
+            raise NotificationError('PayPal did not verify this notification')
+        with transaction.atomic():
+            donation = upsert_donation(parse_ipn(notification.payload))
+            mine.update(processed_at=timezone.now(), donation=donation, error='', claimed_by='')
+    except InvalidNotification as e:
+        logger.error('Payment notification %s failed for good: %s', notification.id, e)
+        mine.update(error=str(e), claimed_by='', attempts=MAX_ATTEMPTS)  # never claimed again
+        return False
+    except Exception as e:
+        # Anything, so one bad payload can't stall the queue: it is retried later, at most MAX_ATTEMPTS times
+        logger.warning('Payment notification %s failed (attempt %d): %s', notification.id, notification.attempts, e,
+                       exc_info=not isinstance(e, (NotificationError, OSError)))
+        mine.update(error=str(e) or repr(e), claimed_by='',
+                    next_attempt_at=timezone.now() + retry_delay(notification.attempts))
+        return False
+    return True
+
+
+def process_pending(batch_size=100):
+    """Apply up to batch_size due notifications; returns (processed, failed)"""
+    processed = failed = 0
+    for notification in claim(batch_size):
+        if process(notification):
+            processed += 1
+        else:
+            failed += 1
+    return processed, failed
@@ -0,0 +1,139 @@
+"""
+Thumbnail and first-page previews for uploaded files.
+
+Previews live in MEDIA_ROOT under ``previews/``, mirroring the path of the
+original upload, so each one is generated once and afterwards served from
+disk. Uploads queue a generate_previews job for the run_jobs workers, and
+so does a page that finds a preview missing (e.g. for a file uploaded
+before previews existed): one job per file, whichever asks first. A file
+that fails to render keeps its FAILED job, and isn't tried again from page
+views until the job is purged (jobs.KEEP_FINISHED). The
+``generate_previews`` management command re-runs it over existing media.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; without it no previews are generated
+    Image = None
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # pypdfium2 is optional; without it PDFs get no preview
+    pdfium = None
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_DIR = 'previews'
+# Longest edge in pixels: 'thumb' for lists and queues, 'page' for a readable first page
+PREVIEW_SIZES = {
+    'thumb': (240, 240),
+    'page': (1024, 1024),
+}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+PDF_EXTENSIONS = {'.pdf'}
+
+
+def preview_name(name, size='thumb'):
+    """Storage name of a preview for an uploaded file"""
+    base, _ = os.path.splitext(name)
+    return f'{PREVIEW_DIR}/{base}.{size}.jpg'
+
+
+def can_preview(name):
+    """Whether previews can be generated for this file"""
+    if Image is None:
+        return False
+    ext = os.path.splitext(name)[1].lower()
+    return ext in IMAGE_EXTENSIONS or (ext in PDF_EXTENSIONS and pdfium is not None)
+
+
+def _open_first_page(name):
+    """Load an uploaded image, or the first page of a PDF, as a PIL image"""
+    with default_storage.open(name, 'rb') as source:
+        if os.path.splitext(name)[1].lower() in PDF_EXTENSIONS:
+            pdf = pdfium.PdfDocument(source.read())
+            try:
+                page = pdf[0]
+                # Render at just enough resolution for the largest preview size
+                width, height = page.get_size()
+                scale = max(PREVIEW_SIZES['page']) / max(width, height)
+                return page.render(scale=scale).to_pil().convert('RGB')
+            finally:
+                pdf.close()
+        image = Image.open(source)
+        image.draft('RGB', PREVIEW_SIZES['page'])  # lets JPEG decode at reduced scale
+        return image.convert('RGB')
+
+
+def generate_previews(name, force=False):
+    """Write every preview size for an uploaded file; returns 'generated', 'skipped', 'unsupported' or 'failed'"""
+    if not can_preview(name):
+        return 'unsupported'
+    targets = {size: preview_name(name, size) for size in PREVIEW_SIZES}
+    if not force:
+        targets = {size: target for size, target in targets.items() if not default_storage.exists(target)}
+    if not targets:
+        return 'skipped'
+
+    try:
+        page = _open_first_page(name)
+        # Largest size first so each thumbnail() call shrinks the previous result
+        for size in sorted(targets, key=lambda s: PREVIEW_SIZES[s], reverse=True):
+            page.thumbnail(PREVIEW_SIZES[size])
+            buffer = BytesIO()
+            page.save(buffer, 'JPEG', quality=80, optimize=True)
+            if default_storage.exists(targets[size]):
+                default_storage.delete(targets[size])
+            default_storage.save(targets[size], ContentFile(buffer.getvalue()))
+    except Exception:
+        logger.exception('Preview generation failed for %s', name)
+        return 'failed'
+    return 'generated'
+
+
+def init_worker():
+    """Process pool initializer; spawned (non-forked) workers start without a configured Django"""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def schedule_previews(name):
+    """Queue preview generation for an uploaded file, in the current transaction, unless it was already asked for"""
+    from .jobs import enqueue
+    from .models import Job
+    if not name or not can_preview(name):
+        return None
+    # The thumbnail is written last, so its presence means the file is done
+    if default_storage.exists(preview_name(name, 'thumb')) or not default_storage.exists(name):
+        return None
+    key = f'previews:{name}'
+    # Queued or running, or tried and failed: asking again wouldn't help
+    if Job.objects.filter(key=key).exclude(status='DONE').exists():
+        return None
+    return enqueue('generate_previews', {'name': name}, key=key)
+
+
+def preview_url(field_file, size='thumb'):
+    """URL of a cached preview for a FileField value, or None if it is not ready yet"""
+    if not field_file or not can_preview(field_file.name):
+        return None
+    target = preview_name(field_file.name, size)
+    if default_storage.exists(target):
+        return reverse('main:preview', args=[target[len(PREVIEW_DIR) + 1:]])
+    # Not generated yet (e.g. uploaded before previews existed); leave it to a worker
+    schedule_previews(field_file.name)
+    return None
+
+
+def thumbnail_url(field_file):
+    """URL of the cached thumbnail for a FileField value"""
+    return preview_url(field_file, 'thumb')
@@ -0,0 +1,170 @@
+"""
+Vendor price-list ingestion.
+
+Uploaded CSV/XLSX price lists are streamed row by row into VendorPriceItem so
+the pricing catalog can be queried with indexed lookups. Rows are inserted in
+fixed-size batches, so memory stays flat however large the spreadsheet is.
+Rows whose price or discount the catalog can't hold (negative, too many
+digits for the column, a discount outside 0-100) are skipped and counted,
+rather than failing the whole file.
+"""
+import csv
+import io
+import os
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import VendorPriceItem
+from .parsing import normalize_header, parse_decimal
+
+try:
+    import openpyxl
+except ImportError:  # openpyxl is optional; without it only CSV price lists are read
+    openpyxl = None
+
+
+BATCH_SIZE = 1000
+
+# Accepted spellings for each catalog column, compared after normalize_header()
+COLUMN_ALIASES = {
+    'item': ['item', 'name', 'service', 'product', 'description'],
+    'price': ['price', 'cost', 'amount', 'rate'],
+    'unit': ['unit', 'per', 'uom'],
+    'discount': ['discount', 'discountpercentage', 'memberdiscount', 'discount%'],
+    'category': ['category', 'type'],
+}
+
+
+class PriceListError(Exception):
+    """Raised when a price list cannot be read at all"""
+
+
+def can_ingest(name):
+    ext = os.path.splitext(name)[1].lower()
+    return ext == '.csv' or (ext == '.xlsx' and openpyxl is not None)
+
+
+def iter_rows(field_file):
+    """Yield each row of an uploaded CSV/XLSX file as a tuple, header first"""
+    ext = os.path.splitext(field_file.name)[1].lower()
+    field_file.open('rb')
+    try:
+        if ext == '.csv':
+            text = io.TextIOWrapper(field_file.file, encoding='utf-8-sig', errors='replace', newline='')
+            yield from csv.reader(text)
+        elif ext == '.xlsx' and openpyxl is not None:
+            # read_only mode streams rows instead of loading the whole workbook
+            workbook = openpyxl.load_workbook(field_file.file, read_only=True, data_only=True)
+            try:
+                yield from workbook.active.iter_rows(values_only=True)
+            finally:
+                workbook.close()
+        else:
+            raise PriceListError(f'Unsupported price list format: {field_file.name}')
+    finally:
+        field_file.close()
+
+
+def map_columns(header):
+    """Map catalog fields to column positions in the header row"""
+    positions = {normalize_header(value): index for index, value in enumerate(header)}
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in positions:
+                columns[field] = positions[alias]
+                break
+    if 'item' not in columns or 'price' not in columns:
+        raise PriceListError('Price list needs at least an item and a price column.')
+    return columns
+
+
+def ingest_price_list(vendor):
+    """Replace a vendor's catalog rows with the contents of its price list; returns (imported, skipped)"""
+    if not vendor.price_list or not can_ingest(vendor.price_list.name):
+        raise PriceListError(f'Unsupported price list format: {vendor.price_list.name}')
+
+    rows = iter_rows(vendor.price_list)
+    try:
+        try:
+            columns = map_columns(next(rows))
+        except StopIteration:
+            raise PriceListError('Price list is empty.')
+        return insert_rows(vendor, columns, rows)
+    finally:
+        rows.close()  # releases the file if reading stopped early
+
+
+def fit_decimal(value, field_name):
+    """value rounded to a VendorPriceItem DecimalField's places, or None if it has too many digits for the column"""
+    field = VendorPriceItem._meta.get_field(field_name)
+    limit = Decimal(10) ** (field.max_digits - field.decimal_places)
+    if abs(value) >= limit:
+        return None
+    value = value.quantize(Decimal(1).scaleb(-field.decimal_places))
+    return value if abs(value) < limit else None  # 99999999.999 rounds up past the limit
+
+
+def insert_rows(vendor, columns, rows):
+    """Replace the vendor's catalog rows with the data rows of its price list; returns (imported, skipped)"""
+    def cell(row, field):
+        index = columns.get(field)
+        if index is None or index >= len(row):
+            return None
+        return row[index]
+
+    imported = skipped = 0
+    batch = []
+    with transaction.atomic():
+        VendorPriceItem.objects.filter(vendor=vendor).delete()
+        for row_number, row in enumerate(rows, start=2):
+            item = str(cell(row, 'item') or '').strip()
+            price = parse_decimal(cell(row, 'price'))
+            if price is not None and price >= 0:
+                price = fit_decimal(price, 'price')
+            else:
+                price = None
+            discount = parse_decimal(cell(row, 'discount'))
+            if discount is not None:
+                discount = fit_decimal(discount, 'discount_percentage') if 0 <= discount <= 100 else None
+                bad_discount = discount is None
+            else:
+                discount, bad_discount = vendor.discount_percentage, False
+            # A value the column can't hold would abort the whole insert; skip just its row
+            if not item or price is None or bad_discount:
+                skipped += 1
+                continue
+            batch.append(VendorPriceItem(
+                vendor=vendor,
+                item=item[:200],
+                category=str(cell(row, 'category') or '').strip().lower()[:100],
+                price=price,
+                unit=str(cell(row, 'unit') or '').strip()[:50],
+                discount_percentage=discount,
+                row_number=row_number,
+            ))
+            if len(batch) >= BATCH_SIZE:
+                VendorPriceItem.objects.bulk_create(batch)
+                imported += len(batch)
+                batch = []
+        if batch:
+            VendorPriceItem.objects.bulk_create(batch)
+            imported += len(batch)
+
+        vendor.price_list_ingested_at = timezone.now()
+        vendor.save(update_fields=['price_list_ingested_at'])
+    return imported, skipped
+
+
+def search_catalog(category=None, max_price=None, min_discount=None, limit=50):
+    """Cheapest catalog items from approved vendors matching the given filters"""
+    items = VendorPriceItem.objects.filter(vendor__is_approved=True).select_related('vendor')
+    if category:
+        items = items.filter(category=category.strip().lower())
+    if max_price is not None:
+        items = items.filter(price__lte=max_price)
+    if min_discount is not None:
+        items = items.filter(discount_percentage__gte=min_discount)
+    return items.order_by('price')[:limit]
@@ -0,0 +1,150 @@
+"""
+Donation reconciliation against payment-processor exports.
+
+Donations are loaded once into a dict keyed by transaction_id; the export is
+then streamed row by row and each row is classified with a dict lookup.
+Corrections are written with bulk_update in fixed-size batches, so memory is
+bounded by the number of donations, not the size of the export.
+"""
+import csv
+
+from .models import Donation
+from .rollups import rebuild_donation_rollups
+from .payments import PAYPAL_STATUS_MAP
+from .parsing import normalize_header, parse_decimal
+
+
+BATCH_SIZE = 1000
+
+# Export status values (lower-cased) for PayPal activity and Stripe payments exports
+EXPORT_STATUS_MAP = {status.lower(): value for status, value in PAYPAL_STATUS_MAP.items()}
+EXPORT_STATUS_MAP.update({
+    'paid': 'COMPLETED',
+    'succeeded': 'COMPLETED',
+    'canceled': 'CANCELLED',
+    'cancelled': 'CANCELLED',
+    'refunded': 'CANCELLED',
+    'partially refunded': 'COMPLETED',
+})
+
+COLUMN_ALIASES = {
+    'transaction_id': ['transactionid', 'id', 'chargeid', 'paymentintentid'],
+    'amount': ['gross', 'amount', 'convertedamount'],
+    'status': ['status'],
+}
+
+OUTCOMES = ['matched', 'amount_mismatch', 'status_mismatch', 'missing', 'duplicate', 'not_in_export', 'unreadable']
+
+
+def map_columns(header):
+    positions = {normalize_header(value): index for index, value in enumerate(header)}
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in positions:
+                columns[field] = positions[alias]
+                break
+    missing = [field for field in COLUMN_ALIASES if field not in columns]
+    if missing:
+        raise ValueError(f"Export is missing column(s): {', '.join(missing)}")
+    return columns
+
+
+def build_index():
+    """transaction_id -> (pk, amount, status) for every donation with a processor ID"""
+    rows = (
+        Donation.objects.exclude(transaction_id='')
+        .values_list('transaction_id', 'pk', 'amount', 'status')
+        .iterator(chunk_size=10000)
+    )
+    return {transaction_id: (pk, amount, status) for transaction_id, pk, amount, status in rows}
+
+
+class Reconciler:
+    """Streams one export file against the donation index"""
+
+    def __init__(self, apply=False, fix_amounts=False, report=None):
+        self.apply = apply
+        self.fix_amounts = fix_amounts
+        self.report = csv.writer(report) if report else None
+        self.counts = dict.fromkeys(OUTCOMES, 0)
+        self.corrected = 0
+        self._pending = []
+        self._months = set()
+        if self.report:
+            self.report.writerow(['outcome', 'transaction_id', 'donation_id', 'our_amount', 'export_amount', 'our_status', 'export_status'])
+
+    def record(self, outcome, transaction_id, donation_id='', ours=('', ''), theirs=('', '')):
+        self.counts[outcome] += 1
+        if self.report and outcome != 'matched':
+            self.report.writerow([outcome, transaction_id, donation_id, ours[0], theirs[0], ours[1], theirs[1]])
+
+    def correct(self, pk, amount, status):
+        fields = {'status': status}
+        if self.fix_amounts:
+            fields['amount'] = amount
+        self._pending.append(Donation(pk=pk, **fields))
+        if len(self._pending) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            fields = ['status', 'amount'] if self.fix_amounts else ['status']
+            Donation.objects.bulk_update(self._pending, fields)
+            # bulk_update skips signals, so note which report months need rebuilding
+            pks = [donation.pk for donation in self._pending]
+            self._months.update(Donation.objects.filter(pk__in=pks).dates('donated_at', 'month'))
+            self.corrected += len(self._pending)
+            self._pending = []
+
+    def run(self, export):
+        index = build_index()
+        reader = csv.reader(export)
+        columns = map_columns(next(reader))
+        txn_col, amount_col, status_col = columns['transaction_id'], columns['amount'], columns['status']
+        seen = set()
+
+        for row in reader:
+            try:
+                transaction_id = row[txn_col].strip()
+                amount = parse_decimal(row[amount_col])
+                status = EXPORT_STATUS_MAP.get(row[status_col].strip().lower())
+            except IndexError:
+                self.counts['unreadable'] += 1
+                continue
+            if not transaction_id or amount is None or status is None:
+                self.counts['unreadable'] += 1
+                continue
+
+            # pop() as we go: whatever is left at the end never appeared in the export
+            entry = index.pop(transaction_id, None)
+            if entry is None:
+                self.record('duplicate' if transaction_id in seen else 'missing', transaction_id, theirs=(amount, status))
+                continue
+            seen.add(transaction_id)
+
+            pk, our_amount, our_status = entry
+            amount = abs(amount)
+            if our_amount != amount:
+                self.record('amount_mismatch', transaction_id, pk, (our_amount, our_status), (amount, status))
+            elif our_status != status:
+                self.record('status_mismatch', transaction_id, pk, (our_amount, our_status), (amount, status))
+            else:
+                self.record('matched', transaction_id, pk)
+                continue
+            if self.apply and (our_status != status or self.fix_amounts):
+                self.correct(pk, amount, status)
+
+        for transaction_id, (pk, our_amount, our_status) in index.items():
+            self.record('not_in_export', transaction_id, pk, (our_amount, our_status))
+        if self.apply:
+            self.flush()
+            rebuild_donation_rollups(self._months)
+        return self.counts
+
+
+def reconcile(export, apply=False, fix_amounts=False, report=None):
+    """Reconcile an open export file; returns (counts, corrected)"""
+    reconciler = Reconciler(apply=apply, fix_amounts=fix_amounts, report=report)
+    counts = reconciler.run(export)
+    return counts, reconciler.corrected
@@ -0,0 +1,154 @@
+"""
+Monthly financial rollups.
+
+DonationRollup and DistributionRollup hold one row per month and grouping key
+with a count and a total, so reports read a few hundred rows however long the
+donation history grows. Saves and deletes apply +/- deltas to the affected
+rows (see main.signals), in the same transaction as the save or delete,
+starting from the key re-read (and locked) in that transaction rather than
+the one loaded with the instance, which a concurrent save may have changed;
+bulk writes that bypass signals rebuild just the months they touched, and
+``backfill_rollups`` rebuilds everything.
+"""
+from datetime import date, datetime, time
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Donation, FundDistribution, DonationRollup, DistributionRollup
+
+
+def month_of(value):
+    """First day of the (local) month for a datetime"""
+    return timezone.localtime(value).date().replace(day=1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def month_start(month):
+    """Aware datetime at the start of a month, for filtering DateTimeFields"""
+    return timezone.make_aware(datetime.combine(month, time.min))
+
+
+# Fields each key reads (by attname)
+DONATION_KEY_FIELDS = {'id', 'donated_at', 'status', 'payment_method', 'amount'}
+DISTRIBUTION_KEY_FIELDS = {'id', 'created_at', 'distributed_at', 'vendor_id', 'status', 'amount'}
+
+# Stands in for the key of a save whose update_fields leave the key alone
+UNCHANGED = object()
+
+
+def stored_key(instance, key, fields, update_fields=None):
+    """
+    key() of an instance's row as it is in the database (None if it isn't
+    there yet), for a pre_save/pre_delete receiver. The row is locked for the
+    rest of the save's transaction: a concurrent save of the same row waits,
+    then reads the key this one leaves, so both deltas start from the truth.
+    """
+    if update_fields is not None:
+        model = type(instance)
+        if not {model._meta.get_field(name).attname for name in update_fields} & fields:
+            return UNCHANGED
+    if instance._state.adding or instance.pk is None:
+        return None
+    stored = type(instance).objects.select_for_update().filter(pk=instance.pk).first()
+    return key(stored) if stored is not None else None
+
+
+def donation_key(donation):
+    """Rollup row and amount a donation counts towards, or None if not saved yet"""
+    if donation.pk is None or donation.donated_at is None:
+        return None
+    key = {'month': month_of(donation.donated_at), 'status': donation.status, 'payment_method': donation.payment_method}
+    return key, donation.amount
+
+
+def distribution_key(distribution):
+    if distribution.pk is None or distribution.created_at is None:
+        return None
+    key = {
+        'month': month_of(distribution.distributed_at or distribution.created_at),
+        'vendor_id': distribution.vendor_id,
+        'status': distribution.status,
+    }
+    return key, distribution.amount
+
+
+def add(model, key, count, amount):
+    """Add count/amount to one rollup row, creating it if needed"""
+    updated = model.objects.filter(**key).update(count=F('count') + count, total=F('total') + amount)
+    if not updated:
+        try:
+            with transaction.atomic():
+                model.objects.create(count=count, total=amount, **key)
+        except IntegrityError:
+            # Created concurrently; apply the delta to the row that won
+            model.objects.filter(**key).update(count=F('count') + count, total=F('total') + amount)
+
+
+def apply_change(model, old, new):
+    """Move a row's contribution from its old rollup key to its new one"""
+    if old is UNCHANGED or old == new:
+        return
+    if old is not None:
+        add(model, old[0], -1, -old[1])
+    if new is not None:
+        add(model, new[0], 1, new[1])
+
+
+def rebuild_donation_rollups(months=None):
+    """Recompute donation rollups from raw rows, for the given months or all of them"""
+    donations = Donation.objects.all()
+    rollups = DonationRollup.objects.all()
+    if months is not None:
+        months = sorted(set(months))
+        if not months:
+            return 0
+        donations = donations.filter(donated_at__gte=month_start(months[0]), donated_at__lt=month_start(next_month(months[-1])))
+        rollups = rollups.filter(month__in=months)
+
+    rows = (
+        donations.order_by()
+        .annotate(month=TruncMonth('donated_at', output_field=DateField()))
+        .values('month', 'status', 'payment_method')
+        .annotate(count=Count('id'), total=Sum('amount'))
+    )
+    with transaction.atomic():
+        rollups.delete()
+        created = DonationRollup.objects.bulk_create([
+            DonationRollup(month=row['month'], status=row['status'], payment_method=row['payment_method'],
+                           count=row['count'], total=row['total'])
+            for row in rows
+            if months is None or row['month'] in months
+        ])
+    return len(created)
+
+
+def rebuild_distribution_rollups():
+    """Recompute all distribution rollups from raw rows"""
+    rows = (
+        FundDistribution.objects.order_by()
+        .annotate(
+            month=TruncMonth('distributed_at', output_field=DateField()),
+            created_month=TruncMonth('created_at', output_field=DateField()),
+        )
+        .values('month', 'created_month', 'vendor_id', 'status')
+        .annotate(count=Count('id'), total=Sum('amount'))
+    )
+    totals = {}
+    for row in rows:
+        key = (row['month'] or row['created_month'], row['vendor_id'], row['status'])
+        count, total = totals.get(key, (0, 0))
+        totals[key] = (count + row['count'], total + row['total'])
+
+    with transaction.atomic():
+        DistributionRollup.objects.all().delete()
+        created = DistributionRollup.objects.bulk_create([
+            DistributionRollup(month=month, vendor_id=vendor_id, status=status, count=count, total=total)
+            for (month, vendor_id, status), (count, total) in totals.items()
+        ])
+    return len(created)
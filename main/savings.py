@@ -0,0 +1,191 @@
+"""
+Member savings calculator.
+
+Annualized savings for every approved vendor are computed once into an
+in-process table and reused for every request; bundle queries are plain
+integer arithmetic over that table. Saving or deleting a VendorSubmission
+bumps a version number in Django's cache, which makes each process rebuild
+its table on the next lookup. That needs a cache every process shares
+(main/caching.py); without one, the table is rebuilt, in one query, for
+every lookup.
+
+To time /api/savings/ with and without the cached table:
+``python manage.py shell -c "from main.savings import _benchmark; _benchmark()"``
+"""
+import time
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.core.cache import cache
+
+from . import caching
+from .models import VendorSubmission
+
+
+VERSION_KEY = 'main:vendor_savings_version'
+# Upper bound on staleness if an invalidation is missed (seconds)
+TABLE_MAX_AGE = 300
+
+# VendorSubmission.FREQUENCY_CHOICES as occurrences per year
+OCCURRENCES_PER_YEAR = {
+    'ONE_TIME': 1,
+    'MONTHLY': 12,
+    'WEEKLY': 52,
+    'QUARTERLY': 4,
+    'YEARLY': 1,
+    'AS_NEEDED': 1,  # no schedule; count a single use
+    '': 1,
+}
+
+# Keywords in the free-text free_service_frequency, checked in order
+FREE_FREQUENCY_KEYWORDS = [
+    ('week', 52),
+    ('month', 12),
+    ('quarter', 4),
+    ('annual', 1),
+    ('year', 1),
+    ('one-time', 1),
+    ('one time', 1),
+    ('once', 1),
+]
+
+_table = {}
+_table_version = None
+_table_built_at = 0.0
+
+
+def free_occurrences_per_year(text):
+    """Interpret free_service_frequency ("Once per month", "Annually", ...) as occurrences per year"""
+    text = (text or '').lower()
+    for keyword, occurrences in FREE_FREQUENCY_KEYWORDS:
+        if keyword in text:
+            return occurrences
+    return 1 if text.strip() else 0
+
+
+def to_cents(value):
+    return int((value * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def annual_savings(vendor):
+    """Annualized member savings for one vendor, as a dict of integer cents"""
+    price = vendor['service_price'] or Decimal('0')
+    discount = vendor['discount_percentage'] or Decimal('0')
+    occurrences = OCCURRENCES_PER_YEAR.get(vendor['frequency'], 1)
+    discount_savings = price * discount / 100 * occurrences
+
+    free_savings = Decimal('0')
+    if vendor['free_service_name']:
+        free_value = vendor['overall_value'] or price
+        free_savings = free_value * free_occurrences_per_year(vendor['free_service_frequency'])
+
+    return {
+        'discount_cents': to_cents(discount_savings),
+        'free_service_cents': to_cents(free_savings),
+        'total_cents': to_cents(discount_savings) + to_cents(free_savings),
+    }
+
+
+def build_table():
+    """Compute savings for all approved vendors in a single query"""
+    vendors = VendorSubmission.objects.filter(is_approved=True).values(
+        'id', 'service_name', 'business_name', 'service_price', 'discount_percentage',
+        'overall_value', 'frequency', 'free_service_name', 'free_service_frequency',
+    )
+    table = {}
+    for vendor in vendors.iterator():
+        row = annual_savings(vendor)
+        row['id'] = vendor['id']
+        row['service_name'] = vendor['service_name']
+        row['business_name'] = vendor['business_name']
+        table[vendor['id']] = row
+    return table
+
+
+def invalidate():
+    """Mark every process's savings table as stale"""
+    cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def get_table():
+    """The current savings table, rebuilt only when a vendor changed"""
+    global _table, _table_version, _table_built_at
+    if not caching.is_shared():
+        return build_table()  # another process's bump would never reach this one's table
+    version = cache.get(VERSION_KEY)
+    now = time.monotonic()
+    if version is None or version != _table_version or now - _table_built_at > TABLE_MAX_AGE:
+        if version is None:
+            version = time.time_ns()
+            cache.add(VERSION_KEY, version, None)
+            version = cache.get(VERSION_KEY, version)
+        _table = build_table()
+        _table_version = version
+        _table_built_at = now
+    return _table
+
+
+def bundle_savings(vendor_ids=None):
+    """Per-vendor and combined annual savings for a set of vendors (default: every vendor in the table)"""
+    table = get_table()  # once: without a shared cache, each call builds the table again
+    if vendor_ids is None:
+        rows = list(table.values())
+    else:
+        rows = [table[vendor_id] for vendor_id in dict.fromkeys(vendor_ids) if vendor_id in table]
+    return {
+        'vendors': rows,
+        'total_cents': sum(row['total_cents'] for row in rows),
+    }
+
+
+def _benchmark(vendors=2000, requests=2000, bundle=5):
+    import shutil
+    import tempfile
+
+    from django.db import connection
+    from django.test import Client, override_settings
+    from django.test.utils import setup_test_environment
+    from django.urls import reverse
+
+    from .utils import batched
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    location = tempfile.mkdtemp()
+    try:
+        for chunk in batched(range(vendors), 1000):
+            VendorSubmission.objects.bulk_create([
+                VendorSubmission(service_name=f'Service {i}', contact_name='Vendor', email=f'v{i}@example.com',
+                                 is_reviewed=True, is_approved=True, service_price=Decimal('40'),
+                                 discount_percentage=Decimal('10'), frequency='MONTHLY',
+                                 free_service_name='Trial' if i % 3 == 0 else '', free_service_frequency='Once per year')
+                for i in chunk
+            ])
+        ids = ','.join(map(str, VendorSubmission.objects.values_list('id', flat=True)[:bundle]))
+        client = Client()
+        url = reverse('main:member_savings')
+
+        vendor_ids = [int(i) for i in ids.split(',')]
+
+        def measure(label):
+            for _ in range(50):
+                client.get(url, {'vendors': ids})
+            started = time.perf_counter()
+            for _ in range(requests):
+                client.get(url, {'vendors': ids})
+            elapsed = time.perf_counter() - started
+            started = time.perf_counter()
+            for _ in range(requests):
+                bundle_savings(vendor_ids)
+            lookup = (time.perf_counter() - started) / requests
+            print(f'{label:<46} {requests / elapsed:8,.0f} req/s  {elapsed / requests * 1000:6.2f} ms'
+                  f'  (bundle_savings() alone {lookup * 1000:.3f} ms)')
+
+        print(f'GET {url}?vendors=<{bundle} ids> over {vendors:,} approved vendors, {requests:,} requests')
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            measure('per-process cache: table rebuilt per request')
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                                   'LOCATION': location}}):
+            measure('shared cache (file-based): table built once')
+    finally:
+        shutil.rmtree(location)
+        connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,263 @@
+"""
+Program calendar: double-booking checks and the iCalendar feed.
+
+Every program stores its slot as starts_at/ends_at (Program.set_schedule()),
+with an index on (location, starts_at). Programs are at most MAX_DURATION
+long, so any program overlapping a new slot must start within MAX_DURATION
+before the slot's end: conflicts() is an index range scan over that window
+at one location, whatever the size of the table.
+
+feed() writes the programs of the next FEED_DAYS days as an iCalendar file,
+one segment per calendar month. Each segment is cached under a key carrying
+its month's version number; saving or deleting a program bumps the version
+of the month(s) it was and is in, so after a change only those months are
+read and rendered again, in one query, and the rest come from the cache.
+The keys of the whole window (segments()) also make the feed's ETag, so a
+subscriber re-polling an unchanged calendar gets a 304 without touching the
+database. A segment is never served for more than SEGMENT_TIMEOUT after it
+was built.
+
+The bumps only reach other workers through a shared cache backend (see
+main/caching.py). Without one, feed() builds every segment from the
+database and the view tags the feed with content_etag() of the bytes
+instead, so a change made through any worker shows up at once.
+
+To time the feed over 100k programs:
+``python manage.py shell -c "from main.schedule import _benchmark; _benchmark()"``
+"""
+import hashlib
+import time
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from itertools import groupby
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from . import caching
+from .models import Program
+
+# Longest program allowed (Program.duration_minutes' limit)
+MAX_DURATION = timedelta(hours=12)
+
+# Locations that can host any number of programs at once, compared case-insensitively
+SHARED_LOCATIONS = {'online', 'virtual', 'zoom'}
+
+# How far ahead the iCalendar feed reaches
+FEED_DAYS = 365
+
+# Upper bound on staleness of a feed segment if an invalidation is missed (seconds)
+SEGMENT_TIMEOUT = 24 * 60 * 60
+
+CACHE_PREFIX = 'main:program_calendar'
+GENERATION_KEY = f'{CACHE_PREFIX}:generation'
+UID_DOMAIN = 'parent-enrichment-program'
+
+FEED_HEADER = (
+    b'BEGIN:VCALENDAR\r\n'
+    b'VERSION:2.0\r\n'
+    b'PRODID:-//Parent Enrichment Program//Programs//EN\r\n'
+    b'CALSCALE:GREGORIAN\r\n'
+    b'METHOD:PUBLISH\r\n'
+    b'X-WR-CALNAME:Parent Enrichment Programs\r\n'
+)
+FEED_FOOTER = b'END:VCALENDAR\r\n'
+
+
+def conflicts(program):
+    """Other programs at program's location whose time overlaps it (starts_at/ends_at must be set)"""
+    if program.location.strip().lower() in SHARED_LOCATIONS:
+        return Program.objects.none()
+    overlapping = Program.objects.filter(
+        location=program.location,
+        starts_at__gt=program.starts_at - MAX_DURATION,  # bounds the index range; ends_at alone can't
+        starts_at__lt=program.ends_at,
+        ends_at__gt=program.starts_at,
+    ).order_by('starts_at')
+    return overlapping.exclude(pk=program.pk) if program.pk else overlapping
+
+
+# Months
+
+def next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def month_key(day):
+    return f'{CACHE_PREFIX}:month:{day:%Y-%m}'
+
+
+def local_midnight(day):
+    midnight = datetime.combine(day, datetime.min.time())
+    return timezone.make_aware(midnight) if settings.USE_TZ else midnight
+
+
+def invalidate(*days):
+    """Mark the feed months holding these dates as changed; with no dates, every month (after bulk changes)"""
+    version = time.time_ns()
+    if days:
+        cache.set_many({month_key(day): version for day in days if day is not None}, None)
+    else:
+        cache.set(GENERATION_KEY, version, None)
+
+
+def segments(today=None):
+    """(first day, day after last, cache key) of each month of the feed window, starting today"""
+    today = today or timezone.localdate()
+    end = today + timedelta(days=FEED_DAYS)
+    bounds = []
+    start = today
+    while start < end:
+        bounds.append((start, min(next_month(start), end)))
+        start = bounds[-1][1]
+    versions = cache.get_many([GENERATION_KEY, *(month_key(start) for start, _ in bounds)]) if caching.is_shared() else {}
+    generation = versions.get(GENERATION_KEY, 0)
+    return [(start, stop, f'{CACHE_PREFIX}:segment:{start}:{stop}:{generation}:{versions.get(month_key(start), 0)}')
+            for start, stop in bounds]
+
+
+def etag(plan):
+    """ETag of the feed for a segments() plan"""
+    return content_etag(''.join(key for _, _, key in plan).encode())
+
+
+def content_etag(content):
+    """ETag of the feed from its bytes, where there's no shared cache to version it by"""
+    return f'"{hashlib.md5(content, usedforsecurity=False).hexdigest()}"'
+
+
+# iCalendar (RFC 5545)
+
+def escape(text):
+    return (text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n'))
+
+
+def fold(line):
+    """A content line as bytes, split into 75-octet pieces joined by CRLF + space"""
+    data = line.encode()
+    pieces = []
+    start = 0
+    while len(data) - start > 75:
+        end = start + (75 if not pieces else 74)  # continuation lines lose one octet to the leading space
+        while data[end] & 0xC0 == 0x80:  # don't split a UTF-8 sequence
+            end -= 1
+        pieces.append(data[start:end])
+        start = end
+    pieces.append(data[start:])
+    return b'\r\n '.join(pieces) + b'\r\n'
+
+
+def utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def vevent(row):
+    """One program (a values() row) as a VEVENT"""
+    return b''.join(map(fold, [
+        'BEGIN:VEVENT',
+        f'UID:program-{row["id"]}@{UID_DOMAIN}',
+        f'DTSTAMP:{utc(row["created_at"])}',
+        f'DTSTART:{utc(row["starts_at"])}',
+        f'DTEND:{utc(row["ends_at"])}',
+        f'SUMMARY:{escape(row["title"])}',
+        f'LOCATION:{escape(row["location"])}',
+        f'DESCRIPTION:{escape(row["description"])}',
+        'END:VEVENT',
+    ]))
+
+
+def program_rows(ranges):
+    """Programs starting on the dates in any of the (first day, day after last) ranges, in start order"""
+    window = Q()
+    for start, stop in ranges:
+        window |= Q(starts_at__gte=local_midnight(start), starts_at__lt=local_midnight(stop))
+    return (Program.objects.filter(window).order_by('starts_at', 'id')
+            .values('id', 'title', 'description', 'location', 'date', 'starts_at', 'ends_at', 'created_at')
+            .iterator(chunk_size=2000))
+
+
+def feed(plan=None):
+    """
+    The iCalendar feed for a segments() plan, as chunks of bytes; segments not
+    in the cache are built and cached (with a shared cache; otherwise all are built)
+    """
+    plan = plan if plan is not None else segments()
+    shared = caching.is_shared()
+    yield FEED_HEADER
+    cached = cache.get_many([key for _, _, key in plan]) if shared else {}
+    missing = [(start, stop) for start, stop, key in plan if key not in cached]
+    months = groupby(program_rows(missing), key=lambda row: row['date'].replace(day=1)) if missing else iter(())
+    month, rows = next(months, (None, ()))
+    for start, stop, key in plan:
+        segment = cached.get(key)
+        if segment is None:
+            while month is not None and month < start.replace(day=1):  # rows whose date disagrees with starts_at
+                month, rows = next(months, (None, ()))
+            if month == start.replace(day=1):
+                segment = b''.join(map(vevent, rows))
+                month, rows = next(months, (None, ()))
+            else:
+                segment = b''
+            if shared:
+                cache.set(key, segment, SEGMENT_TIMEOUT)
+        yield segment
+    yield FEED_FOOTER
+
+
+def _benchmark(programs=100_000, repeat=5):
+    import random
+    import statistics
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    from .synthetic import LOCATIONS
+    from .utils import batched
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        print(f'Loading {programs:,} programs...')
+        today = timezone.localdate()
+        for batch in batched(range(programs), 20_000):
+            rows = [Program(title=f'Workshop {i}', description='Weekly session for parents, guardians and caregivers.',
+                            date=today + timedelta(days=random.randrange(FEED_DAYS)),
+                            time=datetime.min.time().replace(hour=random.randrange(8, 20)),
+                            duration_minutes=random.choice([60, 90, 120]), location=f'{random.choice(LOCATIONS)} {i % 50}')
+                    for i in batch]
+            for program in rows:
+                program.set_schedule()
+            Program.objects.bulk_create(rows)
+        connection.cursor().execute('ANALYZE')
+
+        def measure(label, work, before=None):
+            times = []
+            for _ in range(repeat):
+                if before:
+                    before()
+                started = time.perf_counter()
+                result = work()
+                times.append(time.perf_counter() - started)
+            print(f'{label:<48} {statistics.median(times) * 1000:9.2f} ms  ({result})')
+
+        def build():
+            return f'{sum(map(len, feed())):,} bytes'
+
+        def change_one_program():
+            program = Program.objects.order_by('?').first()
+            program.title += '!'
+            program.save()  # the post_save signal bumps its month
+
+        measure('feed, nothing cached (before)', build, before=cache.clear)
+        measure('feed, after one program changed', build, before=change_one_program)
+        measure('feed, all segments cached', build)
+        measure('ETag only (304 to a re-polling client)', lambda: etag(segments()))
+        slot = Program(location=f'{LOCATIONS[0]} 7', date=today + timedelta(days=30),
+                       time=datetime.min.time().replace(hour=10), duration_minutes=90)
+        slot.set_schedule()
+        measure('conflict check for a new program', lambda: len(conflicts(slot)))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
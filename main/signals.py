@@ -0,0 +1,173 @@
+from django.contrib.auth.models import Group, Permission, User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_init, post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Program, Enrollment, Participant, MemberDocument, VendorSubmission, DataVaultItem, Donation, FundDistribution, DonationRollup, DistributionRollup
+from .previews import schedule_previews
+from . import auth, children, enrollment, rollups, savings, schedule
+
+
+def _schedule_previews(field_file):
+    # The job is part of the save's transaction: a rolled-back upload never gets rendered
+    if field_file:
+        schedule_previews(field_file.name)
+
+
+# Calendar feed: bump the month a program was in and the month it is in now.
+# Enrollment: more seats (or no limit) go to the waitlist.
+
+@receiver(post_init, sender=Program)
+def program_loaded(sender, instance, **kwargs):
+    instance._calendar_date = instance.__dict__.get('date')
+    instance._capacity = instance.__dict__.get('capacity')
+
+
+@receiver(post_save, sender=Program)
+def program_saved(sender, instance, created, **kwargs):
+    dates = (instance._calendar_date, instance.date)
+    transaction.on_commit(lambda: schedule.invalidate(*dates))
+    instance._calendar_date = instance.date
+    if not created and instance.capacity != instance._capacity:
+        program_id = instance.id
+        transaction.on_commit(lambda: enrollment.promote(program_id))
+        instance._capacity = instance.capacity
+
+
+@receiver(post_delete, sender=Program)
+def program_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda: schedule.invalidate(instance.date))
+
+
+@receiver(post_delete, sender=Enrollment)
+def enrollment_deleted(sender, instance, **kwargs):
+    # Deleted with its participant, say: free the seat for the waitlist
+    if instance.status == 'ENROLLED':
+        enrollment.release_seat(instance.program_id)
+        program_id = instance.program_id
+        transaction.on_commit(lambda: enrollment.promote(program_id))
+
+
+# Child age rows: rewritten only when the children_ages text changes
+
+@receiver(post_init, sender=Participant)
+def participant_loaded(sender, instance, **kwargs):
+    # __dict__, not the attribute: a deferred field must not trigger a query here
+    instance._children_ages = instance.__dict__.get('children_ages')
+
+
+@receiver(post_save, sender=Participant)
+def participant_saved(sender, instance, created, **kwargs):
+    if created or instance.children_ages != instance._children_ages:
+        children.set_children(instance, created)
+        instance._children_ages = instance.children_ages
+
+
+@receiver(post_save, sender=MemberDocument)
+@receiver(post_save, sender=DataVaultItem)
+def member_file_saved(sender, instance, **kwargs):
+    _schedule_previews(instance.file)
+
+
+# Price lists: stamp a new upload, so ingest_price_lists knows to load it again
+
+@receiver(post_init, sender=VendorSubmission)
+def vendor_loaded(sender, instance, **kwargs):
+    instance._price_list_name = instance.__dict__.get('price_list')
+
+
+@receiver(pre_save, sender=VendorSubmission)
+def vendor_saving(sender, instance, **kwargs):
+    if 'price_list' not in instance.__dict__:
+        return  # deferred, so not changed
+    price_list = instance.price_list
+    if price_list and (not price_list._committed or price_list.name != instance._price_list_name):
+        instance.price_list_updated_at = timezone.now()
+
+
+@receiver(post_save, sender=VendorSubmission)
+def vendor_price_list_saved(sender, instance, **kwargs):
+    _schedule_previews(instance.price_list)
+    instance._price_list_name = instance.price_list.name
+
+
+@receiver(post_save, sender=VendorSubmission)
+@receiver(post_delete, sender=VendorSubmission)
+def vendor_changed(sender, instance, **kwargs):
+    transaction.on_commit(savings.invalidate)
+
+
+# Rollups: read each row's rollup key as stored before a save or delete, then
+# move its contribution. Donation and FundDistribution save in a transaction,
+# so the row and its rollups change together.
+
+@receiver(pre_save, sender=Donation)
+@receiver(pre_delete, sender=Donation)
+def donation_changing(sender, instance, update_fields=None, **kwargs):
+    instance._rollup_key = rollups.stored_key(instance, rollups.donation_key, rollups.DONATION_KEY_FIELDS, update_fields)
+
+
+@receiver(post_save, sender=Donation)
+def donation_saved(sender, instance, **kwargs):
+    if instance._rollup_key is not rollups.UNCHANGED:
+        rollups.apply_change(DonationRollup, instance._rollup_key, rollups.donation_key(instance))
+
+
+@receiver(post_delete, sender=Donation)
+def donation_deleted(sender, instance, **kwargs):
+    rollups.apply_change(DonationRollup, instance._rollup_key, None)
+
+
+@receiver(pre_save, sender=FundDistribution)
+@receiver(pre_delete, sender=FundDistribution)
+def distribution_changing(sender, instance, update_fields=None, **kwargs):
+    instance._rollup_key = rollups.stored_key(instance, rollups.distribution_key, rollups.DISTRIBUTION_KEY_FIELDS, update_fields)
+
+
+@receiver(post_save, sender=FundDistribution)
+def distribution_saved(sender, instance, **kwargs):
+    if instance._rollup_key is not rollups.UNCHANGED:
+        rollups.apply_change(DistributionRollup, instance._rollup_key, rollups.distribution_key(instance))
+
+
+@receiver(post_delete, sender=FundDistribution)
+def distribution_deleted(sender, instance, **kwargs):
+    rollups.apply_change(DistributionRollup, instance._rollup_key, None)
+
+
+# Cached users and permissions. Forgotten at once, so the rest of the
+# transaction never sees the old row, and again after the commit, in case a
+# request cached the old row in between.
+
+def _forget_users(*user_ids):
+    auth.invalidate(*user_ids)
+    transaction.on_commit(lambda: auth.invalidate(*user_ids))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    _forget_users(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_access_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        _forget_users(instance.pk)
+    elif pk_set:
+        _forget_users(*pk_set)
+    else:  # a group or permission cleared of all its users
+        _forget_users()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def group_permissions_changed(sender, action='post_delete', **kwargs):
+    if action.startswith('post_'):
+        _forget_users()
+
@@ -0,0 +1,264 @@
+"""
+Synthetic data for benchmarks and load tests.
+
+generate(scale) fills every table the site's pages read, in proportions
+roughly like a real deployment (see ROWS_PER_PARTICIPANT): ``scale``
+participants, each with a few member documents, children's ages and a
+program enrollment, plus programs, quizzes and tests with questions, vendors with price lists,
+donations, distributions and data vault items. Rows go in with bulk_create in batches, and timestamps are
+spread over the past YEARS years so date filters and reports have realistic
+ranges to work on.
+
+Uploaded files all point at a handful of small sample files written to media
+storage (with previews generated up front), so pages that open or preview
+files behave as they would with real uploads.
+
+bulk_create skips model signals, so the donation and distribution rollups and
+program seat counts are rebuilt, and the savings table and program calendar
+invalidated, at the end. Generating again adds
+more rows on top of what is there.
+"""
+import random
+from collections import Counter
+from datetime import date, time as time_of_day, timedelta
+from decimal import Decimal
+from io import BytesIO
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import (
+    Program, Participant, Enrollment, MemberDocument, Quiz, QuizQuestion, Test, TestQuestion,
+    VendorSubmission, VendorPriceItem, Donation, FundDistribution, DataVaultItem,
+)
+from .children import backfill_children
+from .enrollment import recount_seats
+from .previews import can_preview, generate_previews
+from .rollups import rebuild_distribution_rollups, rebuild_donation_rollups
+from .utils import batched
+from . import savings, schedule
+
+BATCH_SIZE = 5000
+
+# Timestamps fall in this many years before now
+YEARS = 3
+
+# Rows of each kind per participant (at least one of each is always made)
+ROWS_PER_PARTICIPANT = {
+    'programs': 1 / 20,
+    'member_documents': 2,
+    'enrollments': 1,
+    'quizzes': 1 / 500,
+    'tests': 1 / 500,
+    'vendors': 1 / 50,
+    'donations': 2,
+    'distributions': 1 / 2,
+    'vault_items': 1 / 2,
+}
+QUESTIONS_PER_QUIZ = 10
+QUESTIONS_PER_TEST = 20
+PRICE_ITEMS_PER_VENDOR = 10
+
+SAMPLE_DOCUMENT = 'synthetic/sample-document.pdf'
+SAMPLE_IMAGE = 'synthetic/sample-certificate.png'
+SAMPLE_PRICE_LIST = 'synthetic/sample-price-list.csv'
+
+STAFF_USERNAME = 'synthetic-staff'
+
+FIRST_NAMES = ['Maria', 'James', 'Aisha', 'Wei', 'Carlos', 'Fatima', 'John', 'Priya', 'Michael', 'Sofia',
+               'David', 'Amara', 'Luis', 'Grace', 'Ahmed', 'Emily', 'Kwame', 'Hannah', 'Diego', 'Mei']
+LAST_NAMES = ['Johnson', 'Garcia', 'Nguyen', 'Williams', 'Okafor', 'Patel', 'Brown', 'Rodriguez', 'Kim', 'Smith',
+              'Hernandez', 'Chen', 'Davis', 'Mensah', 'Lopez', 'Ali', 'Miller', 'Wilson', 'Martinez', 'Thompson']
+# Program.capacity values, None for no limit
+CAPACITIES = [None, 10, 20, 30, 50]
+
+LOCATIONS = ['Community Center', 'Public Library', 'Lincoln Elementary', 'Riverside Park Pavilion', 'YMCA Hall', 'Online']
+PROGRAM_TOPICS = ['Homework Help Strategies', 'Youth Sports Safety', 'Healthy Meals on a Budget', 'Screen Time and Sleep',
+                  'College Savings 101', 'Talking About Mental Health', 'Coaching Fundamentals', 'First Aid Basics']
+SERVICES = [('Tutoring', 'tutoring', 'hour'), ('Swim Lessons', 'swimming', 'session'), ('Music Lessons', 'music', 'lesson'),
+            ('Summer Camp', 'camps', 'week'), ('Sports Equipment', 'equipment', 'item'), ('Childcare', 'childcare', 'day'),
+            ('Dance Classes', 'dance', 'class'), ('Art Workshop', 'art', 'session')]
+# (min_age, max_age) for programs; (None, None) is for all ages
+AGE_BANDS = [(None, None), (None, None), (0, 5), (5, 8), (8, 12), (13, 17)]
+PURPOSES = ['Tutoring sessions for member families', 'Camp scholarships', 'Equipment for the youth league',
+            'Swim lessons for program participants', 'After-school childcare support']
+
+
+def scheduled(program):
+    """bulk_create skips Program.save(), which fills starts_at/ends_at"""
+    program.set_schedule()
+    return program
+
+
+class Generator:
+    def __init__(self, scale, batch_size=BATCH_SIZE, seed=None, log=None):
+        self.scale = scale
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+        self.counts = {}
+
+    def count(self, kind):
+        return max(1, int(self.scale * ROWS_PER_PARTICIPANT[kind]))
+
+    def moment(self):
+        return self.now - timedelta(seconds=self.random.randrange(YEARS * 365 * 24 * 60 * 60))
+
+    def person(self):
+        first, last = self.random.choice(FIRST_NAMES), self.random.choice(LAST_NAMES)
+        return f'{first} {last}', f'{first}.{last}{self.random.randrange(10_000)}@example.com'.lower()
+
+    def insert(self, model, rows):
+        """bulk_create rows in batches; returns the ids of the new rows"""
+        start = model.objects.aggregate(last=Max('id'))['last'] or 0
+        created = 0
+        # bulk_create stamps auto_now_add fields with now(); the generated times are
+        # written back after each batch rather than by switching auto_now_add off,
+        # which would also affect every other thread saving these models meanwhile
+        stamped = [field.attname for field in model._meta.concrete_fields if getattr(field, 'auto_now_add', False)]
+        for batch in batched(rows, self.batch_size):
+            times = [[getattr(row, name) for name in stamped] for row in batch]
+            model.objects.bulk_create(batch)
+            if stamped:
+                for row, values in zip(batch, times):
+                    for name, value in zip(stamped, values):
+                        setattr(row, name, value)
+                model.objects.bulk_update(batch, stamped)
+            created += len(batch)
+        self.counts[model._meta.model_name] = self.counts.get(model._meta.model_name, 0) + created
+        self.log(f'{model._meta.verbose_name_plural}: {created}')
+        return list(model.objects.filter(id__gt=start).order_by('id').values_list('id', flat=True))
+
+    def sample_files(self):
+        """Write the shared sample uploads (and their previews) if they are missing"""
+        files = {SAMPLE_PRICE_LIST: b'item,category,price,unit\nWeekly session,tutoring,40.00,hour\n'}
+        try:
+            from PIL import Image
+        except ImportError:  # Pillow is optional; without it the samples are not real images
+            files[SAMPLE_DOCUMENT] = files[SAMPLE_IMAGE] = b'sample'
+        else:
+            for name, kind in ((SAMPLE_DOCUMENT, 'PDF'), (SAMPLE_IMAGE, 'PNG')):
+                out = BytesIO()
+                Image.new('RGB', (850, 1100), 'white').save(out, kind)
+                files[name] = out.getvalue()
+        for name, content in files.items():
+            if not default_storage.exists(name):
+                default_storage.save(name, ContentFile(content))
+            if can_preview(name):
+                generate_previews(name)
+
+    def run(self):
+        self.sample_files()
+        staff, _ = User.objects.get_or_create(username=STAFF_USERNAME, defaults={'is_staff': True, 'email': 'staff@example.com'})
+        r = self.random
+
+        programs = self.insert(Program, (
+            scheduled(Program(title=f'{r.choice(PROGRAM_TOPICS)} #{i}', description='Workshop for parents and guardians.',
+                              date=date.today() + timedelta(days=r.randrange(-365, 365)), time=time_of_day(r.choice([10, 14, 18]), 0),
+                              duration_minutes=r.choice([60, 90, 120]), location=r.choice(LOCATIONS),
+                              capacity=r.choice(CAPACITIES), min_age=min_age, max_age=max_age, created_at=self.moment()))
+            for i, (min_age, max_age) in ((i, r.choice(AGE_BANDS)) for i in range(self.count('programs')))
+        ))
+
+        participants = self.insert(Participant, (
+            Participant(name=name, email=email, phone=f'555-{r.randrange(10_000):04d}',
+                        children_ages=', '.join(str(r.randrange(3, 18)) for _ in range(r.randint(1, 3))),
+                        registered_at=self.moment())
+            for name, email in (self.person() for _ in range(self.scale))
+        ))
+        backfill_children(Participant.objects.filter(id__gte=participants[0]))
+        capacities = dict(Program.objects.filter(id__gte=programs[0]).values_list('id', 'capacity'))
+        seated = Counter()
+
+        def enrollment(participant_id, program_id, created_at):
+            capacity = capacities[program_id]
+            enrolled = capacity is None or seated[program_id] < capacity
+            seated[program_id] += enrolled
+            return Enrollment(program_id=program_id, participant_id=participant_id, created_at=created_at,
+                              status='ENROLLED' if enrolled else 'WAITLISTED', enrolled_at=created_at if enrolled else None)
+        self.insert(Enrollment, (
+            enrollment(participant_id, r.choice(programs), self.moment())
+            for participant_id in participants[:self.count('enrollments')]
+        ))
+        recount_seats(Program.objects.filter(id__gte=programs[0]))
+        document_types = [choice for choice, _ in MemberDocument.DOCUMENT_TYPE_CHOICES]
+        self.insert(MemberDocument, (
+            MemberDocument(participant_id=r.choice(participants), document_type=r.choice(document_types),
+                           file=SAMPLE_DOCUMENT, uploaded_at=uploaded_at, is_reviewed=reviewed,
+                           is_verified=reviewed and r.random() < 0.9,
+                           reviewed_at=uploaded_at + timedelta(days=r.randint(1, 14)) if reviewed else None)
+            for uploaded_at, reviewed in ((self.moment(), r.random() < 0.7) for _ in range(self.count('member_documents')))
+        ))
+
+        for model, kind, question_model, owner, per, extra in (
+            (Quiz, 'quizzes', QuizQuestion, 'quiz', QUESTIONS_PER_QUIZ, {}),
+            (Test, 'tests', TestQuestion, 'test', QUESTIONS_PER_TEST, {'points': 5}),
+        ):
+            owners = self.insert(model, (
+                model(title=f'{r.choice(PROGRAM_TOPICS)} {model.__name__} {i}', description='Check your understanding.',
+                      time_limit='15 minutes', created_by=staff, created_at=self.moment())
+                for i in range(self.count(kind))
+            ))
+            self.insert(question_model, (
+                question_model(**{f'{owner}_id': owner_id}, question=f'Question {n + 1}?', option_1='Yes', option_2='No',
+                               option_3='Sometimes', option_4='Never', correct_answer=r.randint(1, 4), **extra)
+                for owner_id in owners for n in range(per)
+            ))
+
+        frequencies = [choice for choice, _ in VendorSubmission.FREQUENCY_CHOICES]
+        services = [r.choice(SERVICES) for _ in range(self.count('vendors'))]
+        vendors = self.insert(VendorSubmission, (
+            VendorSubmission(service_name=f'{service} {i}', business_name=f'{r.choice(LAST_NAMES)} {service} LLC',
+                             contact_name=self.person()[0], email=f'vendor{i}@example.com', price_list=SAMPLE_PRICE_LIST,
+                             discount_percentage=Decimal(r.choice([5, 10, 15, 20])), service_price=Decimal(r.randrange(20, 200)),
+                             frequency=r.choice(frequencies), submitted_at=self.moment(),
+                             is_reviewed=True, is_approved=r.random() < 0.8)
+            for i, (service, category, unit) in enumerate(services)
+        ))
+        self.insert(VendorPriceItem, (
+            VendorPriceItem(vendor_id=vendor_id, item=f'{unit.title()} package {n + 1}', category=category,
+                            price=Decimal(r.randrange(1000, 30000)) / 100, unit=unit, row_number=n + 1)
+            for vendor_id, (service, category, unit) in zip(vendors, services) for n in range(PRICE_ITEMS_PER_VENDOR)
+        ))
+
+        statuses = ['COMPLETED'] * 17 + ['PENDING', 'FAILED', 'CANCELLED']
+        donations = self.insert(Donation, (
+            Donation(donor_name=name, donor_email=email, amount=Decimal(r.choice([25, 50, 100, 250, 500, 1000])),
+                     payment_method=r.choice(['Stripe', 'PayPal']), status=r.choice(statuses),
+                     transaction_id=f'SYN-{r.getrandbits(64):016x}', donated_at=self.moment())
+            for name, email in (self.person() for _ in range(self.count('donations')))
+        ))
+        completed = list(Donation.objects.filter(id__gte=donations[0], status='COMPLETED').values_list('id', 'amount'))
+        self.insert(FundDistribution, (
+            FundDistribution(donation_id=donation_id, vendor_id=r.choice(vendors), amount=amount / 4, purpose=r.choice(PURPOSES),
+                             status=status, created_by=staff, created_at=created_at,
+                             distributed_at=created_at + timedelta(days=r.randint(1, 30)) if status == 'DISTRIBUTED' else None)
+            for (donation_id, amount), status, created_at in (
+                (pick, r.choice(['PENDING', 'APPROVED', 'DISTRIBUTED', 'DISTRIBUTED']), self.moment())
+                for pick in r.sample(completed, min(len(completed), self.count('distributions')))
+            )
+        ))
+
+        categories = [choice for choice, _ in DataVaultItem.CATEGORY_CHOICES]
+        self.insert(DataVaultItem, (
+            DataVaultItem(title=f'{category.title()} {i}', category=category, file=SAMPLE_IMAGE if i % 2 else SAMPLE_DOCUMENT,
+                          participant_id=r.choice(participants) if i % 3 else None,
+                          vendor_id=r.choice(vendors) if i % 3 == 0 else None,
+                          tags='synthetic', uploaded_by=staff, uploaded_at=self.moment())
+            for i, category in ((i, r.choice(categories)) for i in range(self.count('vault_items')))
+        ))
+
+        rebuild_donation_rollups()
+        rebuild_distribution_rollups()
+        savings.invalidate()
+        schedule.invalidate()
+        return self.counts
+
+
+def generate(scale, batch_size=BATCH_SIZE, seed=None, log=None):
+    """Add synthetic rows for `scale` participants; returns rows created per model"""
+    return Generator(scale, batch_size, seed, log).run()
@@ -0,0 +1,72 @@
+"""
+Work run by the run_jobs workers instead of inside requests (see main/jobs.py).
+
+Each task takes JSON-serialisable arguments (ids, not model instances) and
+may run more than once, so each re-reads what it needs and is safe to repeat.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+
+from . import jobs, notifications, participant_import, payments, previews, pricelists
+from .jobs import task
+from .models import VendorSubmission
+
+logger = logging.getLogger(__name__)
+
+
+@task(every=notifications.SEND_INTERVAL)
+def send_notifications():
+    sent, failed = notifications.send_pending()
+    if sent or failed:
+        logger.info('Notifications: %d sent, %d failed', sent, failed)
+
+
+@task
+def generate_previews(name):
+    if previews.generate_previews(name) == 'failed':
+        # Keeps the job FAILED, which stops pages from asking for this file again (see previews.py)
+        raise jobs.PermanentError(f'Previews of {name} failed; see the log')
+
+
+@task
+def ingest_price_list(vendor_id):
+    vendor = VendorSubmission.objects.filter(id=vendor_id).first()
+    if vendor is None:
+        return
+    try:
+        imported, skipped = pricelists.ingest_price_list(vendor)
+    except pricelists.PriceListError as e:
+        raise jobs.PermanentError(str(e)) from e  # the file won't parse any better next time
+    logger.info('Price list of vendor %s: %d imported, %d skipped', vendor_id, imported, skipped)
+
+
+@task
+def import_participants(name, email=''):
+    try:
+        result = participant_import.import_upload(name, email)
+    except participant_import.ParticipantImportError as e:
+        raise jobs.PermanentError(str(e)) from e  # already emailed; the file is gone
+    if result is not None:
+        logger.info('Participant import %s: %d of %d rows imported', name, result.imported, result.rows)
+
+
+@task(priority=5, every=payments.RETRY_DELAY)
+def process_payment_notifications(batch_size=100):
+    # Until nothing is due: a failed notification waits out its own backoff, and
+    # the periodic run picks it up once it is due again
+    while any(payments.process_pending(batch_size)):
+        pass
+
+
+@task(every=timedelta(hours=1))
+def clear_expired_sessions():
+    # As the clearsessions command, for whichever engine is configured
+    from importlib import import_module
+    import_module(settings.SESSION_ENGINE).SessionStore.clear_expired()
+
+
+@task(every=timedelta(days=1))
+def purge_finished_jobs():
+    jobs.purge()
@@ -1,3 +1,1723 @@
-from django.test import TestCase
+import csv
+import os
+import shutil
+import socket
+import tempfile
 
-# Create your tests here.
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as time_of_day, timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+from urllib.parse import urlencode
+
+from django.apps import apps as django_apps
+from django.contrib.auth.models import Group, Permission, User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.db import connection
+from django.db.models import QuerySet
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:  # aiosmtpd is optional; without it the SMTP tests are skipped
+    Controller = None
+
+from . import benchmarks, exports, jobs, notifications, payments, previews, savings
+from .auth import CachedModelBackend
+from .caching import check_shared_cache
+from .children import parse_children_ages
+from .enrollment import cancel, confirmation_token, enroll, waitlist_position
+from .instrumentation import Registry, RequestMetrics, current_metrics, install_query_recorder, query_shape
+from .forms import ParticipantForm, ProgramForm
+from .loadtest import Scenario, mixed, parse_access_log, replay
+from .management.commands.smtp_standin import StandinHandler
+from .models import (
+    Program, Participant, Enrollment, MemberDocument, VendorSubmission, VendorPriceItem, Donation, FundDistribution, DataVaultItem,
+    DistributionRollup, DonationRollup, Job, Notification, PaymentNotification,
+)
+from .schedule import fold
+from .notifications import notify, send_pending
+from .parsing import parse_decimal
+from .reconciliation import reconcile
+from .rollups import rebuild_donation_rollups
+from .pricelists import PriceListError, ingest_price_list, openpyxl
+from .participant_import import COLUMN_ALIASES, ParticipantImportError, clean_row, import_participants
+from .synthetic import SAMPLE_DOCUMENT, SAMPLE_IMAGE, SAMPLE_PRICE_LIST, STAFF_USERNAME, Generator, generate
+
+def populate(size, staff):
+    """Top every table the views read up to `size` rows, with real sample uploads (use TempMediaMixin)"""
+    Generator(0).sample_files()
+    for i in range(Program.objects.count(), size):
+        Program.objects.create(title=f'Program {i}', description='Weekly session', date=date(2025, 1, 1),
+                               time=time_of_day(18, 0), location='Community Center')
+    for i in range(Participant.objects.count(), size):
+        participant = Participant.objects.create(name=f'Parent {i}', email=f'parent{i}@example.com',
+                                                 phone='555-0100', children_ages='8, 11')
+        enroll(Program.objects.order_by('id').values_list('id', flat=True).first(), participant.id)
+        MemberDocument.objects.create(participant=participant, document_type='CPR', file=SAMPLE_DOCUMENT)
+    for i in range(VendorSubmission.objects.count(), size):
+        vendor = VendorSubmission.objects.create(service_name=f'Tutoring {i}', contact_name='Vendor', email=f'v{i}@example.com',
+                                                 price_list=SAMPLE_PRICE_LIST, is_reviewed=True, is_approved=True,
+                                                 discount_percentage=Decimal('10'), service_price=Decimal('40'), frequency='MONTHLY')
+        VendorPriceItem.objects.create(vendor=vendor, item='Session', category='tutoring', price=Decimal('40'), row_number=1)
+    vendors = list(VendorSubmission.objects.order_by('id'))
+    for i in range(Donation.objects.count(), size):
+        donation = Donation.objects.create(donor_name=f'Donor {i}', donor_email=f'd{i}@example.com', amount=Decimal('100'),
+                                           status='COMPLETED', transaction_id=f'TXN{i}')
+        FundDistribution.objects.create(donation=donation, vendor=vendors[i % len(vendors)], amount=Decimal('25'),
+                                        purpose='Tutoring', created_by=staff)
+        DataVaultItem.objects.create(title=f'Certificate {i}', file=SAMPLE_IMAGE if i % 2 else SAMPLE_DOCUMENT, uploaded_by=staff,
+                                     participant=Participant.objects.order_by('id')[i % size])
+
+
+class TempMediaMixin:
+    """Runs each test with MEDIA_ROOT in a fresh temporary directory"""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class SharedCacheMixin:
+    """Runs each test over a file-based cache, which counts as shared between processes (LocMemCache doesn't)"""
+
+    def setUp(self):
+        super().setUp()
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        settings_override = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location},
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+@override_settings(PERFORMANCE_NPLUSONE_THRESHOLD=3)
+class QueryBudgetTestCase(TempMediaMixin, TestCase):
+    """
+    assertQueryBudget() requests a URL at several table sizes and fails if any
+    response runs more than `budget` queries, or if the count grows with the
+    data (an N+1). Failures list the repeated query shapes and where they ran.
+    """
+    sizes = (1, 5, 20)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.staff)
+
+    def request(self, method, url, data=None):
+        response = getattr(self.client, method)(url, data or {})
+        self.assertLess(response.status_code, 500, url)
+        if response.streaming:
+            b''.join(response)  # queries made while streaming count too
+        return response.wsgi_request.performance_metrics
+
+    def assertQueryBudget(self, url, budget, method='get', data=None):
+        counts = {}
+        for size in self.sizes:
+            populate(size, self.staff)
+            metrics = self.request(method, url, data)
+            counts[size] = metrics.queries
+            repeated = ''.join(f'\n  {metrics.shapes[shape]}x from {origin}: {shape[:200]}'
+                               for shape, origin in metrics.repeated.items())
+            self.assertLessEqual(metrics.queries, budget, f'{url} ran {metrics.queries} queries at {size} rows{repeated}')
+        self.assertEqual(counts[self.sizes[-2]], counts[self.sizes[-1]],
+                         f'{url} query count grows with table size: {counts}')
+
+
+class NPlusOneDetectorTests(TempMediaMixin, TestCase):
+    def test_query_shape_ignores_values(self):
+        self.assertEqual(query_shape("SELECT * FROM t WHERE id = 5 AND name = 'x'"),
+                         query_shape("SELECT * FROM t WHERE id = 12 AND name = 'y'"))
+        self.assertEqual(query_shape('SELECT * FROM t WHERE id IN (%s, %s)'),
+                         query_shape('SELECT * FROM t WHERE id IN (%s, %s, %s)'))
+
+    def test_repeated_foreign_key_access_is_flagged(self):
+        staff = User.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True)
+        populate(5, staff)
+        install_query_recorder()  # normally done by PerformanceMiddleware
+        metrics = RequestMetrics(nplusone_threshold=3)
+        token = current_metrics.set(metrics)
+        try:
+            [str(distribution) for distribution in FundDistribution.objects.all()]
+        finally:
+            current_metrics.reset(token)
+        self.assertEqual(len(metrics.repeated), 2)  # vendor and donation lookups
+        for origin in metrics.repeated.values():
+            self.assertIn('main/models.py', origin)
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        registry = mock.patch('main.instrumentation.registry', Registry())
+        self.registry = registry.start()
+        self.addCleanup(registry.stop)
+        self.staff = User.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True)
+
+    @override_settings(PERFORMANCE_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('main:list_programs'))
+        metrics = response.wsgi_request.performance_metrics
+        self.assertRegex(response['Server-Timing'],
+                         rf'^db;dur=[\d.]+;desc="{metrics.queries} queries", tpl;dur=[\d.]+;desc="Templates", '
+                         r'total;dur=[\d.]+;desc="main:list_programs"$')
+        self.assertGreater(metrics.template_time, 0)
+
+    @override_settings(PERFORMANCE_SERVER_TIMING=False)
+    def test_server_timing_off(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('main:list_programs')))
+
+    @override_settings(PERFORMANCE_QUERY_BUDGETS={'main:list_programs': 0})
+    def test_over_budget_requests_are_logged_and_counted(self):
+        with self.assertLogs('main.instrumentation', 'WARNING') as logs:
+            self.client.get(reverse('main:list_programs'))
+        self.assertIn('budget 0', logs.output[0])
+        stats = self.registry.views[('main:list_programs', 'GET', 200)]
+        self.assertEqual((stats.count, stats.over_budget), (1, 1))
+
+    def test_metrics_are_staff_only_by_default(self):
+        self.assertEqual(self.client.get(reverse('main:metrics')).status_code, 403)
+        with override_settings(PERFORMANCE_METRICS_IPS=['127.0.0.1']):
+            self.assertEqual(self.client.get(reverse('main:metrics')).status_code, 200)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse('main:metrics')).status_code, 200)
+
+    def test_prometheus_output(self):
+        metrics = RequestMetrics()
+        metrics.queries, metrics.db_time = 3, 0.002
+        self.registry.observe('main:index', 'GET', 200, 0.02, metrics, 1500, False)
+        self.registry.observe('main:index', 'GET', 204, 0.3, metrics, 0, True)
+        self.registry.observe('main:index', 'POST', 302, 20.0, metrics, 0, False)
+        lines = self.registry.render().splitlines()
+        labels = 'view="main:index",method="GET",status="2xx"'
+        for line in [
+            '# TYPE pep_request_duration_seconds histogram',
+            f'pep_request_duration_seconds_bucket{{{labels},le="0.01"}} 0',
+            f'pep_request_duration_seconds_bucket{{{labels},le="0.025"}} 1',
+            f'pep_request_duration_seconds_bucket{{{labels},le="0.5"}} 2',
+            f'pep_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2',
+            f'pep_request_duration_seconds_sum{{{labels}}} 0.320000',
+            f'pep_request_duration_seconds_count{{{labels}}} 2',
+            'pep_request_duration_seconds_bucket{view="main:index",method="POST",status="3xx",le="10.0"} 0',
+            'pep_request_duration_seconds_bucket{view="main:index",method="POST",status="3xx",le="+Inf"} 1',
+            f'pep_db_queries_total{{{labels}}} 6',
+            f'pep_db_seconds_total{{{labels}}} 0.004000',
+            f'pep_response_bytes_total{{{labels}}} 1500',
+            f'pep_query_budget_exceeded_total{{{labels}}} 1',
+        ]:
+            self.assertIn(line, lines)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('main:metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        self.assertIn(f'pep_db_queries_total{{{labels}}} 6', response.content.decode().splitlines())
+
+
+class ViewQueryBudgetTests(QueryBudgetTestCase):
+    """One budget per URL in main/urls.py"""
+
+    def test_every_url_has_a_budget(self):
+        names = {pattern.name for pattern in get_resolver('main.urls').url_patterns}
+        tested = {name[len('test_'):] for name in dir(self) if name.startswith('test_') and name != 'test_every_url_has_a_budget'}
+        self.assertEqual(names - tested, set())
+
+    def test_index(self):
+        self.assertQueryBudget(reverse('main:index'), 4)
+
+    def test_about(self):
+        self.assertQueryBudget(reverse('main:about'), 2)
+
+    def test_list_programs(self):
+        self.assertQueryBudget(reverse('main:list_programs') + '?month=2025-01', 3)
+
+    def test_program_calendar(self):
+        cache.clear()
+        self.assertQueryBudget(reverse('main:program_calendar'), 3)
+
+    def test_program_detail(self):
+        populate(1, self.staff)
+        self.assertQueryBudget(reverse('main:program_detail', args=[Program.objects.first().id]), 3)
+
+    def test_program_detail_with_age_band(self):
+        populate(1, self.staff)
+        program = Program.objects.first()
+        Program.objects.filter(id=program.id).update(min_age=8, max_age=12)
+        self.assertQueryBudget(reverse('main:program_detail', args=[program.id]), 4)
+
+    def test_program_enroll(self):
+        populate(1, self.staff)
+        url = reverse('main:program_enroll', args=[Program.objects.first().id])
+        self.assertQueryBudget(url, 3)
+        self.assertQueryBudget(url, 3, 'post', {'email': 'parent0@example.com'})
+
+    def test_program_enroll_confirm(self):
+        populate(1, self.staff)
+        program, participant = Program.objects.first(), Participant.objects.first()
+        url = reverse('main:program_enroll_confirm', args=[confirmation_token(program.id, participant.id)])
+        self.assertQueryBudget(url, 4)
+        self.assertQueryBudget(url, 11, 'post')  # already enrolled: the costliest path
+
+    def test_new_program(self):
+        self.assertQueryBudget(reverse('main:new_program'), 2)
+
+    def test_list_participants(self):
+        self.assertQueryBudget(reverse('main:list_participants'), 3)
+
+    def test_list_participants_by_age(self):
+        self.assertQueryBudget(reverse('main:list_participants') + '?min_age=8&max_age=12', 4)
+
+    def test_new_participant(self):
+        self.assertQueryBudget(reverse('main:new_participant'), 2)
+
+    def test_membership(self):
+        self.assertQueryBudget(reverse('main:membership'), 2)
+
+    def test_upload_document(self):
+        self.assertQueryBudget(reverse('main:upload_document'), 2)
+
+    def test_donate(self):
+        self.assertQueryBudget(reverse('main:donate'), 2)
+
+    def test_paypal_ipn(self):
+        # The notification, then the payments job in a savepoint, rolled back if one is queued already
+        self.assertQueryBudget(reverse('main:paypal_ipn'), 5, method='post', data={'txn_id': 'X', 'payment_status': 'Completed'})
+
+    def test_vendor(self):
+        self.assertQueryBudget(reverse('main:vendor'), 2)
+
+    def test_member_savings(self):
+        populate(3, self.staff)
+        ids = ','.join(str(pk) for pk in VendorSubmission.objects.values_list('id', flat=True)[:3])
+        self.assertQueryBudget(reverse('main:member_savings') + f'?vendors={ids}', 1)
+
+    @override_settings(PERFORMANCE_METRICS_IPS=['127.0.0.1'])
+    def test_metrics(self):
+        # An allowlisted scraper never touches the database
+        self.client.logout()
+        self.assertQueryBudget(reverse('main:metrics'), 0)
+
+    def test_register(self):
+        self.assertQueryBudget(reverse('main:register'), 2)
+
+    def test_admin_login(self):
+        self.assertQueryBudget(reverse('main:admin_login'), 2)
+
+    def test_admin_dashboard(self):
+        self.assertQueryBudget(reverse('main:admin_dashboard'), 13)
+
+    def test_participant_import(self):
+        self.assertQueryBudget(reverse('main:participant_import'), 3)
+
+    def test_fund_distribution_list(self):
+        self.assertQueryBudget(reverse('main:fund_distribution_list'), 3)
+
+    def test_fund_distribution_new(self):
+        self.assertQueryBudget(reverse('main:fund_distribution_new'), 2)
+
+    def test_fund_distribution_donations(self):
+        self.assertQueryBudget(reverse('main:fund_distribution_donations') + '?q=donor', 5)
+
+    def test_fund_distribution_vendors(self):
+        self.assertQueryBudget(reverse('main:fund_distribution_vendors') + '?q=tut', 4)
+
+    def test_fund_distribution_approve(self):
+        populate(1, self.staff)
+        distribution = FundDistribution.objects.first()
+        # Includes queueing the vendor's notification email, the save's savepoint and locked re-read of the
+        # rollup key, and the database session
+        self.assertQueryBudget(reverse('main:fund_distribution_approve', args=[distribution.id]), 13, method='post')
+
+    def test_fund_distribution_distribute(self):
+        populate(1, self.staff)
+        distribution = FundDistribution.objects.first()
+        FundDistribution.objects.filter(id=distribution.id).update(status='APPROVED')
+        self.assertQueryBudget(reverse('main:fund_distribution_distribute', args=[distribution.id]), 15, method='post')
+
+    def test_member_document_review(self):
+        self.assertQueryBudget(reverse('main:member_document_review'), 3)
+
+    def test_vendor_catalog(self):
+        self.assertQueryBudget(reverse('main:vendor_catalog') + '?category=tutoring', 3)
+
+    def test_financial_report(self):
+        self.assertQueryBudget(reverse('main:financial_report'), 5)
+
+    def test_export_csv(self):
+        self.assertQueryBudget(reverse('main:export_csv', args=['distributions']), 2)
+
+    def test_preview(self):
+        self.assertQueryBudget(reverse('main:preview', args=['missing.thumb.jpg']), 2)
+
+    def test_data_vault_list(self):
+        self.assertQueryBudget(reverse('main:data_vault_list'), 3)
+
+    def test_data_vault_upload(self):
+        self.assertQueryBudget(reverse('main:data_vault_upload'), 2)
+
+    def test_data_vault_participants(self):
+        self.assertQueryBudget(reverse('main:data_vault_participants') + '?q=parent', 3)
+
+    def test_data_vault_vendors(self):
+        self.assertQueryBudget(reverse('main:data_vault_vendors') + '?q=tut', 4)
+
+    def test_data_vault_view(self):
+        populate(1, self.staff)
+        self.assertQueryBudget(reverse('main:data_vault_view', args=[DataVaultItem.objects.first().id]), 3)
+
+    def test_data_vault_download(self):
+        populate(1, self.staff)
+        self.assertQueryBudget(reverse('main:data_vault_download', args=[DataVaultItem.objects.first().id]), 4)
+
+
+class FundDistributionSearchTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True)
+        self.client.force_login(self.staff)
+        populate(30, self.staff)
+
+    def test_donations_match_name_or_email_prefix(self):
+        url = reverse('main:fund_distribution_donations')
+        results = self.client.get(url, {'q': 'DONOR 1'}).json()['results']
+        self.assertEqual([r['donor_name'] for r in results], [f'Donor {i}' for i in [1, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19]])
+        self.assertEqual(results[0]['remaining'], '75.00')  # 100 less the 25 already distributed
+        results = self.client.get(url, {'q': 'd2@'}).json()['results']
+        self.assertEqual([r['donor_email'] for r in results], ['d2@example.com'])
+
+    def test_results_are_limited(self):
+        results = self.client.get(reverse('main:fund_distribution_donations')).json()['results']
+        self.assertEqual(len(results), 20)
+
+    def test_vendors_exclude_unapproved(self):
+        VendorSubmission.objects.filter(service_name='Tutoring 3').update(is_approved=False)
+        results = self.client.get(reverse('main:fund_distribution_vendors'), {'q': 'tutoring 3'}).json()['results']
+        self.assertEqual([r['service_name'] for r in results], [])
+
+
+class DataVaultSearchTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True)
+        self.client.force_login(self.staff)
+        populate(30, self.staff)
+
+    def test_participants_match_email_prefix(self):
+        results = self.client.get(reverse('main:data_vault_participants'), {'q': 'PARENT2'}).json()['results']
+        self.assertEqual([r['email'] for r in results], sorted(['parent2@example.com'] + [f'parent2{i}@example.com' for i in range(10)]))
+
+    def test_vendors_include_unapproved(self):
+        VendorSubmission.objects.filter(service_name='Tutoring 3').update(is_approved=False)
+        results = self.client.get(reverse('main:data_vault_vendors'), {'q': 'tutoring 3'}).json()['results']
+        self.assertEqual([r['service_name'] for r in results], ['Tutoring 3'])
+
+    def test_upload_page_lists_no_participants_or_vendors(self):
+        response = self.client.get(reverse('main:data_vault_upload'))
+        self.assertNotContains(response, 'parent7@example.com')
+        self.assertNotContains(response, 'Tutoring 4')
+        self.assertContains(response, '<input type="hidden" name="participant" id="id_participant">', html=True)
+
+    def test_upload_links_the_chosen_participant_and_vendor(self):
+        participant = Participant.objects.get(email='parent7@example.com')
+        vendor = VendorSubmission.objects.get(service_name='Tutoring 4')
+        response = self.client.post(reverse('main:data_vault_upload'), {
+            'title': 'Waiver', 'category': 'OTHER', 'file': SimpleUploadedFile('waiver.pdf', b'%PDF-1.4'),
+            'participant': participant.id, 'vendor': vendor.id,
+        })
+        self.assertEqual(response.status_code, 302)
+        item = DataVaultItem.objects.get(title='Waiver')
+        self.assertEqual((item.participant, item.vendor), (participant, vendor))
+
+
+
+class ParticipantImportTests(TempMediaMixin, TestCase):
+    CSV = (
+        'Full Name,E-mail,Phone Number,Children\'s Ages\n'
+        'Ana Lopez,ana@example.com,555-0101,"4, 7"\n'
+        'Ben Ode,not-an-email,555-0102,9\n'
+        '\n'
+        'Ana Again,ANA@example.com,555-0103,5\n'
+        'Cara Mills,cara@example.com,555-0104,\n'
+        'Dev Shah,DEV@Example.com,555-0105,12\n'
+        'Eve Tran,eve@example.com,555-0106,3\n'
+    )
+
+    def import_csv(self, text, **kwargs):
+        errors = []
+        result = import_participants(SimpleUploadedFile('parents.csv', text.encode()),
+                                     on_error=lambda row, messages: errors.append((row, sorted(messages))), **kwargs)
+        return result, errors
+
+    def test_valid_rows_are_imported_and_others_reported(self):
+        Participant.objects.create(name='Dev Shah', email='dev@example.com', phone='555-0100', children_ages='12')
+        result, errors = self.import_csv(self.CSV, batch_size=2)
+        self.assertEqual((result.rows, result.imported, result.duplicates, result.invalid), (6, 2, 2, 2))
+        self.assertEqual(sorted(errors), [(3, ['email']), (5, ['email']), (6, ['children_ages']), (7, ['email'])])
+        birth_years = Participant.objects.filter(name__in=['Ana Lopez', 'Eve Tran']).values_list('children__birth_year', flat=True)
+        self.assertEqual(sorted(timezone.now().year - year for year in birth_years), [3, 4, 7])
+
+    def test_rows_follow_participant_form_rules(self):
+        rows = [
+            {'name': 'A' * 200, 'email': 'a@example.com', 'phone': '5' * 20, 'children_ages': '1'},
+            {'name': 'A' * 201, 'email': 'a@example.com', 'phone': '555', 'children_ages': '1'},
+            {'name': 'A', 'email': 'a@example', 'phone': '5' * 21, 'children_ages': ''},
+            {'name': ' ', 'email': ' a@example.com ', 'phone': '555', 'children_ages': '1'},
+        ]
+        columns = {name: index for index, name in enumerate(COLUMN_ALIASES)}
+        for row in rows:
+            data, errors = clean_row(columns, [row[name] for name in columns])
+            form = ParticipantForm(row)
+            self.assertEqual(form.is_valid(), not errors, row)
+            self.assertEqual(sorted(form.errors), sorted(errors), row)
+
+    def test_missing_columns_are_rejected(self):
+        with self.assertRaisesMessage(ParticipantImportError, 'Missing column(s): Phone, Children ages.'):
+            self.import_csv('name,email\nAna,ana@example.com\n')
+
+    def upload(self, name, content):
+        self.client.force_login(User.objects.get_or_create(username='staff', email='staff@example.com', is_staff=True)[0])
+        return self.client.post(reverse('main:participant_import'), {'file': SimpleUploadedFile(name, content)}, follow=True)
+
+    def run_jobs(self):
+        with mock.patch('main.jobs.close_old_connections'):
+            jobs.work('test', until_empty=True)
+
+    def test_admin_upload_is_imported_by_a_job(self):
+        response = self.upload('parents.csv', self.CSV.encode())
+        self.assertContains(response, 'parents.csv will be imported shortly. The results will be emailed to staff@example.com.')
+        self.assertFalse(Participant.objects.exists())
+        job = Job.objects.get(name='import_participants')
+        self.assertTrue(default_storage.exists(job.kwargs['name']))
+
+        self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'DONE')
+        self.assertEqual(Participant.objects.count(), 3)
+        self.assertFalse(default_storage.exists(job.kwargs['name']))
+        notification = Notification.objects.get(template='participant_import_finished')
+        self.assertEqual(notification.to_email, 'staff@example.com')
+        self.assertEqual({key: notification.context[key] for key in ('rows', 'imported', 'duplicates', 'invalid', 'more_errors')},
+                         {'rows': 6, 'imported': 3, 'duplicates': 1, 'invalid': 2, 'more_errors': 0})
+        self.assertEqual([row for row, messages in notification.context['errors']], [3, 6, 5])
+        subject, text, html = notifications.email_templates('participant_import_finished')
+        self.assertIn('Row 6: children_ages:', text.render(notification.context))
+        self.assertContains(self.client.get(reverse('main:participant_import')), 'Done')
+
+    def test_unreadable_upload_fails_the_job(self):
+        self.assertContains(self.upload('parents.txt', b'name'), 'Unsupported file format')
+        self.assertFalse(Job.objects.exists())
+        self.upload('parents.csv', b'name,email\nAna,ana@example.com\n')
+        with self.assertLogs('main.jobs', 'ERROR'):
+            self.run_jobs()
+        job = Job.objects.get(name='import_participants')
+        self.assertEqual(job.status, 'FAILED')
+        self.assertFalse(default_storage.exists(job.kwargs['name']))
+        notification = Notification.objects.get(template='participant_import_finished')
+        self.assertEqual(notification.context['error'], 'Missing column(s): Phone, Children ages.')
+        self.assertContains(self.client.get(reverse('main:participant_import')), 'Missing column(s)')
+
+
+class ChildrenAgesTests(TestCase):
+    def ages(self, participant):
+        return sorted(timezone.now().year - year for year in participant.children.values_list('birth_year', flat=True))
+
+    def test_parse(self):
+        for text, ages in [('4, 7', [4, 7]), ('6 and 9', [6, 9]), ('twins, 5', [5]), ('18 months, 3', [1, 3]),
+                           ('9 mos', [0]), ('3yo & 11 yrs', [3, 11]), ('born 2015', []), ('', [])]:
+            self.assertEqual(parse_children_ages(text), ages, text)
+
+    def test_child_rows_follow_the_text(self):
+        participant = Participant.objects.create(name='Ana', email='ana@example.com', phone='555', children_ages='4, 7')
+        self.assertEqual(self.ages(participant), [4, 7])
+        participant = Participant.objects.get(id=participant.id)
+        participant.children_ages = '5, 8, 1'
+        participant.save()
+        self.assertEqual(self.ages(participant), [1, 5, 8])
+        with self.assertNumQueries(1):  # just the UPDATE: ages unchanged
+            participant.save()
+
+    def test_age_band_listing(self):
+        for i, text in enumerate(['3', '8', '5, 12', '14', '10']):
+            Participant.objects.create(name=f'Parent {i}', email=f'p{i}@example.com', phone='555', children_ages=text)
+        with mock.patch('main.views.AGE_BAND_PAGE_SIZE', 2):
+            response = self.client.get(reverse('main:list_participants'), {'min_age': 8, 'max_age': 12})
+            self.assertEqual(response.context['families'], 3)
+            self.assertEqual([p.name for p in response.context['participants']], ['Parent 4', 'Parent 2'])
+            response = self.client.get(reverse('main:list_participants'),
+                                       {'min_age': 8, 'max_age': 12, 'after': response.context['next_after']})
+        self.assertEqual([p.name for p in response.context['participants']], ['Parent 1'])
+        self.assertIsNone(response.context['next_after'])
+        response = self.client.get(reverse('main:list_participants'), {'min_age': 13})
+        self.assertEqual([p.name for p in response.context['participants']], ['Parent 3'])
+
+    def test_children_grow_older(self):
+        from .children import backfill_children, count_families
+
+        participant = Participant.objects.create(name='Ana', email='ana@example.com', phone='555', children_ages='5')
+        three_years_ago = timezone.now() - timedelta(days=3 * 366)
+        Participant.objects.filter(id=participant.id).update(registered_at=three_years_ago)
+        participant.children.all().delete()
+        self.assertEqual(backfill_children(), 1)  # ages as of registration
+        self.assertEqual(self.ages(participant), [8])
+        self.assertEqual((count_families(5, 5), count_families(8, 12)), (0, 1))
+        # Ages typed in later are as of that day
+        participant = Participant.objects.get(id=participant.id)
+        participant.children_ages = '9'
+        participant.save()
+        self.assertEqual(self.ages(participant), [9])
+
+class ProgramCalendarTests(SharedCacheMixin, TestCase):
+    def program(self, day, hour, minutes=90, location='Community Center', title='Workshop'):
+        return Program.objects.create(title=title, description='For parents, guardians; and carers', date=day,
+                                      time=time_of_day(hour, 0), duration_minutes=minutes, location=location)
+
+    def form(self, day, hour, location='Community Center', instance=None):
+        return ProgramForm({'title': 'New', 'description': 'x', 'date': day, 'time': f'{hour}:00',
+                            'duration_minutes': 60, 'location': location}, instance=instance)
+
+    def test_double_booking_is_rejected(self):
+        day = date(2026, 3, 2)
+        booked = self.program(day, 10)  # 10:00-11:30
+        self.assertTrue(self.form(day, 9).is_valid())  # 9:00-10:00 ends as it starts
+        form = self.form(day, 11)
+        self.assertFalse(form.is_valid())
+        self.assertIn('"Workshop"', form.non_field_errors()[0])
+        self.assertTrue(self.form(day, 12).is_valid())
+        self.assertTrue(self.form(day, 11, location='Public Library').is_valid())
+        self.assertTrue(self.form(day, 11, location='Online').is_valid())
+        self.assertTrue(self.form(day, 10, instance=booked).is_valid())  # moving a program onto itself
+
+    def test_feed_is_cached_by_month(self):
+        cache.clear()
+        today = date.today()
+        upcoming = self.program(today + timedelta(days=3), 18, title='Screen Time, Sleep')
+        later = self.program(today + timedelta(days=70), 18, title='Budget Meals')
+        self.program(today - timedelta(days=3), 18, title='Past Workshop')
+        url = reverse('main:program_calendar')
+
+        response = self.client.get(url)
+        feed = b''.join(response).decode()
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        self.assertTrue(feed.startswith('BEGIN:VCALENDAR\r\n') and feed.endswith('END:VCALENDAR\r\n'))
+        self.assertIn(f'UID:program-{upcoming.id}@', feed)
+        self.assertIn('SUMMARY:Screen Time\\, Sleep', feed)
+        self.assertIn('DESCRIPTION:For parents\\, guardians\\; and carers', feed)
+        self.assertNotIn('Past Workshop', feed)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            later.title = 'Healthy Meals'
+            later.save()
+        with self.assertNumQueries(1):  # only the changed month is read again
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            feed = b''.join(response).decode()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('SUMMARY:Healthy Meals', feed)
+        self.assertIn('SUMMARY:Screen Time', feed)
+        with self.assertNumQueries(0):
+            b''.join(self.client.get(url))
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_feed_without_shared_cache_follows_the_database(self):
+        upcoming = self.program(date.today() + timedelta(days=3), 18, title='Screen Time')
+        url = reverse('main:program_calendar')
+        response = self.client.get(url)
+        self.assertIn(b'SUMMARY:Screen Time', response.content)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        # As if saved by another process, whose invalidation this one's cache never sees
+        Program.objects.filter(id=upcoming.id).update(title='Sleep')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'SUMMARY:Sleep', response.content)
+
+    def test_schedule_from_strings(self):
+        program = Program.objects.create(title='CPR', description='x', date='2026-11-01', time='10:00',
+                                         location='YMCA Hall', duration_minutes=60)
+        self.assertEqual((program.date, program.time), (date(2026, 11, 1), time_of_day(10, 0)))
+        self.assertEqual(timezone.localtime(program.ends_at).hour, 11)
+
+    def test_fold_long_lines(self):
+        line = 'DESCRIPTION:' + 'Taller para padres y niños. ' * 10
+        folded = fold(line)
+        self.assertTrue(all(len(piece) <= 75 for piece in folded.split(b'\r\n')))
+        self.assertEqual(folded.replace(b'\r\n ', b'').decode(), line + '\r\n')
+
+    def test_month_listing(self):
+        self.program(date(2026, 3, 20), 10, title='Late March')
+        self.program(date(2026, 3, 2), 10, title='Early March')
+        self.program(date(2026, 4, 1), 10, title='April')
+        response = self.client.get(reverse('main:list_programs'), {'month': '2026-03'})
+        self.assertEqual([p.title for p in response.context['programs']], ['Early March', 'Late March'])
+        self.assertEqual(response.context['next_month'], date(2026, 4, 1))
+
+
+class EnrollmentTests(TestCase):
+    def setUp(self):
+        self.program = Program.objects.create(title='CPR', description='x', date=date(2026, 5, 1),
+                                              time=time_of_day(10, 0), location='YMCA Hall', capacity=2)
+        self.parents = [Participant.objects.create(name=f'Parent {i}', email=f'p{i}@example.com', phone='555',
+                                                   children_ages='6') for i in range(5)]
+
+    def enroll(self, i):
+        return enroll(self.program.id, self.parents[i].id)
+
+    def seats_taken(self):
+        self.program.refresh_from_db()
+        return self.program.seats_taken
+
+    def test_waitlist_promotion(self):
+        first, second, third, fourth = [self.enroll(i) for i in range(4)]
+        self.assertEqual([e.status for e in (first, second, third, fourth)], ['ENROLLED', 'ENROLLED', 'WAITLISTED', 'WAITLISTED'])
+        self.assertEqual([waitlist_position(third), waitlist_position(fourth)], [1, 2])
+        self.assertEqual(self.enroll(0).id, first.id)  # enrolling twice changes nothing
+        self.assertEqual(self.seats_taken(), 2)
+
+        self.assertEqual(cancel(first), [third.id])
+        self.assertEqual(cancel(first), [])  # a second cancel frees no second seat
+        self.assertEqual(self.seats_taken(), 2)
+        self.assertEqual(self.enroll(0).status, 'WAITLISTED')  # back of the queue
+        self.assertEqual(waitlist_position(Enrollment.objects.get(id=fourth.id)), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.program.capacity = 4
+            self.program.save()
+        self.assertEqual(Enrollment.objects.filter(status='ENROLLED').count(), 4)
+        self.assertEqual(self.seats_taken(), 4)
+
+    def test_program_edit_keeps_seat_count(self):
+        stale = Program.objects.get(id=self.program.id)
+        self.enroll(0)
+        stale.title = 'CPR and First Aid'
+        stale.save()
+        self.assertEqual(self.seats_taken(), 1)
+
+    def test_enroll_page(self):
+        url = reverse('main:program_enroll', args=[self.program.id])
+        answers = []
+        for email in ('P0@example.com', 'nobody@example.com'):
+            response = self.client.post(url, {'email': email}, follow=True)
+            self.assertRedirects(response, reverse('main:program_detail', args=[self.program.id]))
+            answers.append([str(message).replace(email, '<email>') for message in response.context['messages']])
+        self.assertEqual(answers[0], answers[1])  # nothing tells a registered address from another
+        self.assertNotIn('Parent 0', str(answers))
+        self.assertFalse(Enrollment.objects.exists())  # not until the link is followed
+
+        notification = Notification.objects.get(template='enrollment_confirmation')
+        self.assertEqual(notification.to_email, 'p0@example.com')
+        link = notification.context['link']
+        self.assertEqual(self.client.get(link).status_code, 200)  # only asks
+        self.assertFalse(Enrollment.objects.exists())
+        self.assertRedirects(self.client.post(link), reverse('main:program_detail', args=[self.program.id]))
+        self.assertEqual(self.parents[0].enrollments.get().status, 'ENROLLED')
+
+        forged = link.replace(str(self.program.id), '0')
+        self.assertRedirects(self.client.post(forged), reverse('main:list_programs'))
+        with mock.patch('main.enrollment.CONFIRMATION_MAX_AGE', timedelta(seconds=-1)):
+            self.assertRedirects(self.client.post(link), reverse('main:list_programs'))
+
+
+class ConcurrentEnrollmentTests(TransactionTestCase):
+    def run_concurrently(self, work, items, threads=50):
+        def run(item):
+            try:
+                return work(item)
+            finally:
+                connection.close()  # each thread has its own connection
+        with ThreadPoolExecutor(threads) as pool:
+            return list(pool.map(run, items))
+
+    def test_no_overbooking(self):
+        program = Program.objects.create(title='Coaching', description='x', date=date(2026, 5, 1),
+                                         time=time_of_day(18, 0), location='Lincoln Elementary', capacity=20)
+        parents = Participant.objects.bulk_create([
+            Participant(name=f'Parent {i}', email=f'p{i}@example.com', phone='555', children_ages='9') for i in range(300)
+        ])
+        statuses = self.run_concurrently(lambda parent: enroll(program.id, parent.id).status, parents)
+        self.assertEqual(statuses.count('ENROLLED'), 20)
+        self.assertEqual(statuses.count('WAITLISTED'), 280)
+        program.refresh_from_db()
+        self.assertEqual(program.seats_taken, 20)
+
+        # Cancellations racing each other: every freed seat goes to the waitlist, in order
+        enrolled = list(Enrollment.objects.filter(status='ENROLLED'))
+        queue = list(Enrollment.objects.filter(status='WAITLISTED').order_by('id').values_list('id', flat=True))
+        promoted = self.run_concurrently(cancel, enrolled[:10])
+        self.assertCountEqual(sum(promoted, []), queue[:10])
+        program.refresh_from_db()
+        self.assertEqual(program.seats_taken, 20)
+        self.assertEqual(Enrollment.objects.filter(status='ENROLLED').count(), 20)
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.calls = []
+
+        def record(n, fail=0):
+            self.calls.append(n)
+            if self.calls.count(n) <= fail:
+                raise ValueError(f'attempt {self.calls.count(n)} of {n}')
+
+        def broken():
+            raise jobs.PermanentError('bad input')
+
+        jobs.task(record, name='test_record', max_attempts=3)
+        jobs.task(broken, name='test_broken')
+        self.addCleanup(jobs.TASKS.pop, 'test_record')
+        self.addCleanup(jobs.TASKS.pop, 'test_broken')
+        # It would close the test's transaction
+        patcher = mock.patch('main.jobs.close_old_connections')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_due(self):
+        return jobs.work('test', until_empty=True)
+
+    def job(self, n):
+        return Job.objects.get(kwargs__n=n)
+
+    def test_priority_order(self):
+        for n, priority in [(1, 0), (2, 5), (3, 0), (4, -1), (5, 5)]:
+            jobs.enqueue('test_record', {'n': n}, priority=priority)
+        jobs.enqueue('test_record', {'n': 6}, priority=9, delay=timedelta(hours=1))  # not due yet
+        self.run_due()
+        self.assertEqual(self.calls, [2, 5, 1, 3, 4])
+        self.assertEqual(self.job(6).status, 'QUEUED')
+
+    def test_retries_with_backoff_then_fails(self):
+        jobs.enqueue('test_record', {'n': 1, 'fail': 1})
+        jobs.enqueue('test_record', {'n': 2, 'fail': 10})
+        self.run_due()
+        first = self.job(1)
+        self.assertEqual((first.status, first.attempts), ('QUEUED', 1))
+        self.assertIn('ValueError: attempt 1 of 1', first.error)
+        delay = first.run_at - timezone.now()
+        self.assertTrue(timedelta(seconds=8) < delay <= jobs.RETRY_DELAY * 1.1, delay)
+
+        for attempt in range(2):
+            Job.objects.update(run_at=timezone.now())
+            self.run_due()
+        self.assertEqual(self.job(1).status, 'DONE')
+        self.assertEqual((self.job(2).status, self.job(2).attempts), ('FAILED', 3))
+        self.assertEqual(self.calls.count(2), 3)
+
+        jobs.enqueue('test_broken')
+        self.run_due()
+        self.assertEqual(Job.objects.get(name='test_broken').attempts, 1)
+        self.assertEqual(Job.objects.get(name='test_broken').status, 'FAILED')
+
+    def test_backoff_is_capped(self):
+        self.assertLessEqual(jobs.backoff(30), jobs.RETRY_MAX_DELAY * 1.1)
+        self.assertGreaterEqual(jobs.backoff(3), jobs.RETRY_DELAY * 4)
+
+    def test_key_allows_one_queued_job(self):
+        first = jobs.enqueue('test_record', {'n': 1}, key='once')
+        self.assertIsNone(jobs.enqueue('test_record', {'n': 2}, key='once'))
+        self.run_due()
+        self.assertEqual(self.calls, [1])
+        self.assertIsNotNone(jobs.enqueue('test_record', {'n': 3}, key='once'))  # the first one finished
+        self.assertEqual(Job.objects.get(id=first.id).status, 'DONE')
+
+    def test_lost_jobs_are_requeued(self):
+        job = jobs.enqueue('test_record', {'n': 1})
+        [claimed] = jobs.claim('dead-worker')
+        Job.objects.filter(id=job.id).update(locked_at=timezone.now() - jobs.LEASE - timedelta(seconds=1))
+        self.assertEqual(jobs.requeue_lost(), 1)
+        self.run_due()
+        self.assertEqual((self.job(1).status, self.job(1).attempts), ('DONE', 2))
+        self.assertEqual(jobs.finish(claimed, status='FAILED'), 0)  # the dead worker's claim is gone
+
+    def test_stopping_worker_releases_claimed_jobs(self):
+        for n in range(3):
+            jobs.enqueue('test_record', {'n': n})
+        jobs.work('test', stop=lambda: len(self.calls) == 1)
+        self.assertEqual(Job.objects.filter(name='test_record', status='QUEUED', attempts=0).count(), 2)
+
+
+class ConcurrentJobTests(TransactionTestCase):
+    def test_each_job_runs_once(self):
+        ran = []
+        jobs.task(lambda n: ran.append(n), name='test_append')
+        self.addCleanup(jobs.TASKS.pop, 'test_append')
+        Job.objects.bulk_create([Job(name='test_append', kwargs={'n': n}) for n in range(500)])
+
+        def worker(i):
+            try:
+                return jobs.work(f'worker-{i}', batch_size=7, until_empty=True)
+            finally:
+                connection.close()
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(worker, range(8)))
+        self.assertEqual(sorted(ran), list(range(500)))
+        self.assertEqual(Job.objects.filter(name='test_append', status='DONE', attempts=1).count(), 500)
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+                   AUTHENTICATION_BACKENDS=['main.auth.CachedModelBackend'])
+class CachedAuthTests(SharedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.staff = User.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True)
+        self.client.force_login(self.staff)
+
+    def get(self, name):
+        return self.client.get(reverse(f'main:{name}'))
+
+    def test_staff_pages_skip_session_and_user_queries(self):
+        self.get('fund_distribution_new')  # caches the user
+        response = self.get('fund_distribution_new')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.performance_metrics.queries, 0)
+
+    def test_user_changes_are_seen_at_once(self):
+        self.get('fund_distribution_new')
+        self.staff.is_active = False
+        self.staff.save()
+        self.assertRedirects(self.get('fund_distribution_new'), f"{reverse('main:admin_login')}?next={reverse('main:fund_distribution_new')}",
+                             fetch_redirect_response=False)
+
+    def test_permission_changes_are_seen_at_once(self):
+        backend = CachedModelBackend()
+        permission = Permission.objects.get(codename='change_donation')
+        group = Group.objects.create(name='Treasurers')
+        self.staff.groups.add(group)
+        self.assertFalse(backend.get_user(self.staff.id).has_perm('main.change_donation'))
+        with self.assertNumQueries(0):
+            self.assertFalse(backend.get_user(self.staff.id).has_perm('main.change_donation'))
+        group.permissions.add(permission)
+        self.assertTrue(backend.get_user(self.staff.id).has_perm('main.change_donation'))
+        self.staff.groups.remove(group)
+        self.assertFalse(backend.get_user(self.staff.id).has_perm('main.change_donation'))
+
+
+    def test_cached_sessions_and_users_need_a_shared_cache(self):
+        self.assertEqual(check_shared_cache(), [])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual([error.id for error in check_shared_cache()], ['main.E001', 'main.E002'])
+            with override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db',
+                                   AUTHENTICATION_BACKENDS=['django.contrib.auth.backends.ModelBackend']):
+                self.assertEqual(check_shared_cache(), [])
+
+
+class NotificationTests(TestCase):
+    def test_register_queues_welcome_email(self):
+        self.client.post(reverse('main:register'), {
+            'username': 'newparent', 'email': 'new@example.com', 'first_name': 'Ana', 'last_name': "O'Brien",
+            'password1': 'a-Long-pass-phrase-9', 'password2': 'a-Long-pass-phrase-9',
+        })
+        self.assertEqual(len(mail.outbox), 0)  # queued, not sent during the request
+        self.assertEqual(send_pending(), (1, 0))
+        [message] = mail.outbox
+        self.assertEqual((message.subject, message.to), ('Welcome to the Parent Enrichment Program', ['new@example.com']))
+        self.assertIn('Hi Ana,', message.body)
+        self.assertEqual(message.alternatives[0][1], 'text/html')
+        self.assertEqual(Notification.objects.get().status, 'SENT')
+
+    def test_broken_template_fails_only_its_notification(self):
+        notify('no_such_email', 'a@example.com')
+        notify('document_received', 'b@example.com', {'name': 'Ben', 'document_type': 'Pay stub & W-2'})
+        self.assertEqual(send_pending(), (1, 1))
+        self.assertEqual(mail.outbox[0].subject, 'We received your Pay stub & W-2')
+        self.assertIn('no_such_email', Notification.objects.get(status='FAILED').error)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@skipUnless(Controller, 'aiosmtpd is not installed')
+class SMTPBatchingTests(TestCase):
+    """Sending to a local aiosmtpd stand-in"""
+
+    def setUp(self):
+        self.handler = StandinHandler()
+        self.port = free_port()
+        controller = Controller(self.handler, hostname='127.0.0.1', port=self.port)
+        controller.start()
+        self.addCleanup(controller.stop)
+
+    def smtp(self, port=None):
+        return mail.get_connection('django.core.mail.backends.smtp.EmailBackend', host='127.0.0.1', port=port or self.port)
+
+    def test_messages_share_connections(self):
+        for i in range(250):
+            notify('welcome', f'parent{i}@example.com', {'name': f'Parent {i}'})
+        with mock.patch('main.notifications.MESSAGES_PER_CONNECTION', 100):
+            self.assertEqual(send_pending(batch_size=40, connection=self.smtp()), (250, 0))
+        self.assertEqual((self.handler.received, self.handler.sessions), (250, 3))
+        self.assertEqual(Notification.objects.filter(status='SENT').count(), 250)
+
+    def test_refused_address_fails_for_good(self):
+        notify('welcome', 'a@example.com', {'name': 'A'})
+        notify('welcome', 'nobody@refused.invalid', {'name': 'B'})
+        notify('welcome', 'c@example.com', {'name': 'C'})
+        self.assertEqual(send_pending(connection=self.smtp()), (2, 1))
+        self.assertEqual(Notification.objects.get(status='FAILED').to_email, 'nobody@refused.invalid')
+        self.assertEqual(self.handler.sessions, 1)
+
+    def test_unreachable_server_leaves_the_queue(self):
+        for i in range(3):
+            notify('welcome', f'parent{i}@example.com', {'name': f'Parent {i}'})
+        self.assertEqual(send_pending(connection=self.smtp(port=free_port())), (0, 0))
+        self.assertEqual(list(Notification.objects.order_by('id').values_list('status', 'attempts')),
+                         [('PENDING', 1), ('PENDING', 0), ('PENDING', 0)])
+        self.assertEqual(send_pending(connection=self.smtp()), (3, 0))
+
+
+class AdminChangelistQueryBudgetTests(QueryBudgetTestCase):
+    """Admin changelists using LargeTableAdminMixin"""
+
+    def setUp(self):
+        User.objects.filter(id=self.staff.id).update(is_superuser=True)
+        super().setUp()
+
+    def test_data_vault_item_changelist(self):
+        self.assertQueryBudget(reverse('admin:main_datavaultitem_changelist'), 7)
+
+    def test_fund_distribution_changelist(self):
+        self.assertQueryBudget(reverse('admin:main_funddistribution_changelist'), 7)
+
+    def test_member_document_changelist(self):
+        self.assertQueryBudget(reverse('admin:main_memberdocument_changelist'), 7)
+
+    def test_notification_changelist(self):
+        self.assertQueryBudget(reverse('admin:main_notification_changelist'), 7)
+
+    def test_job_changelist(self):
+        self.assertQueryBudget(reverse('admin:main_job_changelist'), 7)
+
+    def test_enrollment_changelist(self):
+        self.assertQueryBudget(reverse('admin:main_enrollment_changelist'), 7)
+
+    def test_donation_changelist(self):
+        self.assertQueryBudget(reverse('admin:main_donation_changelist') + '?donated_at__year=2025', 7)
+
+    def test_large_table_count_is_estimated(self):
+        populate(5, self.staff)
+        url = reverse('admin:main_donation_changelist')
+        with mock.patch('main.changelists.ESTIMATE_COUNT_ABOVE', 2), mock.patch('main.changelists.FILTERED_COUNT_LIMIT', 3):
+            self.assertContains(self.client.get(url), 'the result count is approximate')
+            response = self.client.get(url + '?status=COMPLETED')
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+    def test_foreign_keys_use_autocomplete(self):
+        response = self.client.get(reverse('admin:main_funddistribution_add'))
+        for field in ('donation', 'vendor', 'created_by', 'approved_by'):
+            self.assertIn('admin-autocomplete', str(response.context['adminform'].form[field]))
+
+
+class BenchmarkSuiteTests(TempMediaMixin, TestCase):
+    def test_generate_fills_every_table(self):
+        counts = generate(20, batch_size=7, seed=1)
+        for model in (Program, Participant, MemberDocument, VendorSubmission, VendorPriceItem, Donation, DataVaultItem):
+            self.assertEqual(model.objects.count(), counts[model._meta.model_name])
+            self.assertGreater(counts[model._meta.model_name], 0)
+        self.assertGreater(Participant.objects.values('registered_at__date').distinct().count(), 1)
+        self.assertLess(Donation.objects.order_by('donated_at').first().donated_at, timezone.now() - timedelta(days=1))
+
+    def test_generate_leaves_auto_now_add_on(self):
+        # A row saved by another thread during generate() must still get its timestamp
+        seen = []
+        bulk_create = QuerySet.bulk_create
+
+        def recording_bulk_create(queryset, objs, *args, **kwargs):
+            seen.append(all(field.auto_now_add for field in queryset.model._meta.concrete_fields
+                            if field.name in ('created_at', 'registered_at', 'uploaded_at', 'donated_at', 'submitted_at')))
+            return bulk_create(queryset, objs, *args, **kwargs)
+
+        with mock.patch.object(QuerySet, 'bulk_create', recording_bulk_create):
+            generate(5, seed=1)
+        self.assertTrue(seen)
+        self.assertTrue(all(seen))
+
+    def test_benchmark_covers_every_url(self):
+        self.assertEqual(benchmarks.uncovered_urls(), [])
+        generate(20, seed=1)
+        results = benchmarks.run(User.objects.get(username=STAFF_USERNAME), requests=1, warmup=0)
+        self.assertEqual({label.split(':')[0] for label in results['views']}, set(benchmarks.CASES))
+        for label, result in results['views'].items():
+            self.assertLess(result['status'], 500, label)
+        self.assertEqual(benchmarks.compare(results, results)[0][-1], '')
+
+
+class TrafficReplayTests(SimpleTestCase):
+    def test_access_log_replays_gets_in_order(self):
+        scenarios = parse_access_log([
+            '127.0.0.1 - - [19/Oct/2026:10:00:00 +0000] "GET /programs/12/ HTTP/1.1" 200 5120 "-" "Mozilla/5.0"',
+            '127.0.0.1 - - [19/Oct/2026:10:00:01 +0000] "POST /participants/new/ HTTP/1.1" 302 0',
+            'not a request line',
+            '10.0.0.2 - - [19/Oct/2026:10:00:02 +0000] "GET /admin/dashboard/?tab=1 HTTP/1.1" 200 300',
+        ])
+        self.assertEqual([(s.name, s.path, s.staff) for s in scenarios],
+                         [('/programs/N/', '/programs/12/', False), ('/admin/dashboard/', '/admin/dashboard/?tab=1', True)])
+        traffic = replay(scenarios)
+        self.assertEqual([next(traffic).path for _ in range(3)], ['/programs/12/', '/admin/dashboard/?tab=1', '/programs/12/'])
+
+    def test_mix_follows_weights(self):
+        traffic = mixed([Scenario('a', '/a/', weight=9), Scenario('b', '/b/', weight=1)], seed=1)
+        picks = [next(traffic).name for _ in range(1000)]
+        self.assertAlmostEqual(picks.count('a') / 1000, 0.9, delta=0.05)
+
+
+@skipUnless(previews.Image is not None, 'needs Pillow')
+class PreviewTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.name = default_storage.save('member_documents/scan.png', ContentFile(self.png(1600, 1200)))
+        patcher = mock.patch('main.jobs.close_old_connections')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def png(self, width, height):
+        out = BytesIO()
+        previews.Image.new('RGB', (width, height), 'white').save(out, 'PNG')
+        return out.getvalue()
+
+    def test_every_size_is_generated_once(self):
+        self.assertEqual(previews.generate_previews(self.name), 'generated')
+        for size, box in previews.PREVIEW_SIZES.items():
+            with default_storage.open(previews.preview_name(self.name, size)) as preview:
+                image = previews.Image.open(preview)
+                self.assertEqual((image.format, max(image.size)), ('JPEG', max(box)))
+        self.assertEqual(previews.generate_previews(self.name), 'skipped')
+        self.assertEqual(previews.generate_previews(self.name, force=True), 'generated')
+        self.assertEqual(previews.generate_previews('notes.txt'), 'unsupported')
+
+    def test_missing_preview_is_queued_once(self):
+        field_file = MemberDocument(file=self.name).file
+        self.assertIsNone(previews.preview_url(field_file))
+        self.assertIsNone(previews.preview_url(field_file))
+        self.assertEqual(Job.objects.filter(name='generate_previews').count(), 1)
+
+        jobs.work('test', until_empty=True)
+        self.assertEqual(Job.objects.get(name='generate_previews').status, 'DONE')
+        url = previews.preview_url(field_file)
+        self.assertEqual(url, reverse('main:preview', args=['member_documents/scan.thumb.jpg']))
+        self.client.force_login(User.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True))
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('max-age', response['Cache-Control'])
+
+    def test_missing_or_broken_originals_are_not_retried(self):
+        self.assertIsNone(previews.schedule_previews('member_documents/gone.png'))
+        broken = default_storage.save('member_documents/broken.png', ContentFile(b'not an image'))
+        self.assertIsNotNone(previews.schedule_previews(broken))
+        with self.assertLogs('main', 'ERROR'):
+            jobs.work('test', until_empty=True)
+        self.assertEqual(Job.objects.get(key=f'previews:{broken}').status, 'FAILED')
+        self.assertIsNone(previews.schedule_previews(broken))
+        self.assertEqual(Job.objects.filter(name='generate_previews').count(), 1)
+
+
+@mock.patch('main.views.REVIEW_PAGE_SIZE', 3)
+class MemberDocumentReviewTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_superuser('staff', 'staff@example.com', 'pw')
+        self.client.force_login(self.staff)
+        participant = Participant.objects.create(name='Parent', email='parent@example.com', phone='555-0100')
+        self.ids = [MemberDocument.objects.create(participant=participant, document_type='CPR',
+                                                  file=f'member_documents/{i}.pdf').id for i in range(8)]
+        MemberDocument.objects.filter(id=self.ids[-1]).update(is_reviewed=True, is_verified=True)
+
+    def page(self, after=''):
+        response = self.client.get(reverse('main:member_document_review'), {'after': after} if after else {})
+        return [document.id for document in response.context['documents']], response.context['next_after']
+
+    def test_pages_follow_the_after_cursor_to_the_end(self):
+        pending = self.ids[-2::-1]  # newest first, without the reviewed one
+        first, cursor = self.page()
+        self.assertEqual((first, cursor), (pending[:3], pending[2]))
+        second, cursor = self.page(cursor)
+        self.assertEqual((second, cursor), (pending[3:6], pending[5]))
+        last, cursor = self.page(cursor)
+        self.assertEqual((last, cursor), (pending[6:], None))
+        self.assertEqual(self.page(pending[-1]), ([], None))
+        self.assertEqual(self.page('not-an-id'), (pending[:3], pending[2]))
+
+    def test_decisions_leave_the_queue_and_keep_the_page(self):
+        first, cursor = self.page()
+        response = self.client.post(reverse('main:member_document_review'), {
+            f'decision_{first[0]}': 'verify', f'decision_{first[1]}': 'reject', f'decision_{first[2]}': '',
+            f'decision_{self.ids[-1]}': 'reject',  # already reviewed: left alone
+            'after': '',
+        })
+        self.assertRedirects(response, reverse('main:member_document_review'), fetch_redirect_response=False)
+        verified, rejected = MemberDocument.objects.get(id=first[0]), MemberDocument.objects.get(id=first[1])
+        self.assertEqual((verified.is_reviewed, verified.is_verified), (True, True))
+        self.assertEqual((rejected.is_reviewed, rejected.is_verified), (True, False))
+        self.assertIsNotNone(rejected.reviewed_at)
+        self.assertTrue(MemberDocument.objects.get(id=self.ids[-1]).is_verified)
+        self.assertEqual(self.page()[0][0], first[2])
+
+        response = self.client.post(reverse('main:member_document_review'), {'after': str(cursor)})
+        self.assertRedirects(response, reverse('main:member_document_review') + f'?after={cursor}',
+                             fetch_redirect_response=False)
+
+    def test_admin_actions(self):
+        changelist = reverse('admin:main_memberdocument_changelist')
+        for action, verified in (('mark_verified', True), ('mark_rejected', False)):
+            self.client.post(changelist, {'action': action, '_selected_action': self.ids[:2]})
+            for document in MemberDocument.objects.filter(id__in=self.ids[:2]):
+                self.assertEqual((document.is_reviewed, document.is_verified), (True, verified))
+                self.assertIsNotNone(document.reviewed_at)
+        self.assertEqual(MemberDocument.objects.filter(is_reviewed=False).count(), 5)
+
+    def test_migration_marks_verified_documents_reviewed(self):
+        from django.apps import apps
+        migration = import_module('main.migrations.0007_memberdocument_review')
+        MemberDocument.objects.update(is_reviewed=False, is_verified=False)
+        MemberDocument.objects.filter(id__in=self.ids[:3]).update(is_verified=True)
+        migration.mark_verified_as_reviewed(apps, None)
+        self.assertEqual(set(MemberDocument.objects.filter(is_reviewed=True).values_list('id', flat=True)), set(self.ids[:3]))
+
+
+class PriceListTests(TempMediaMixin, TestCase):
+    def vendor(self, content, name='prices.csv'):
+        return VendorSubmission.objects.create(service_name='Tutoring', contact_name='Vendor', email='v@example.com',
+                                               discount_percentage=Decimal('10'),
+                                               price_list=SimpleUploadedFile(name, content))
+
+    def test_parse_decimal(self):
+        for value, expected in [('$1,234.50', Decimal('1234.50')), ('10%', Decimal('10')), (12.5, Decimal('12.5')),
+                                (3, Decimal('3')), (' ', None), (None, None), ('call us', None),
+                                ('NaN', None), ('-Infinity', None), ('sNaN', None), (float('nan'), None)]:
+            self.assertEqual(parse_decimal(value), expected, value)
+
+    def test_rows_are_loaded_and_bad_ones_skipped(self):
+        vendor = self.vendor(b'Service,Cost,Per,Discount %,Type\n'
+                             b'Weekly session,$40.00,hour,,Tutoring\n'
+                             b'Group class,"1,250",term,15%,Classes\n'
+                             b',10,hour,,\n'
+                             b'Free trial,NaN,hour,,\n'
+                             b'Refund,-5,hour,,\n'
+                             b'Short row\n')
+        self.assertEqual(ingest_price_list(vendor), (2, 4))
+        items = list(VendorPriceItem.objects.filter(vendor=vendor).order_by('row_number'))
+        self.assertEqual([(i.item, i.price, i.unit, i.discount_percentage, i.category, i.row_number) for i in items], [
+            ('Weekly session', Decimal('40.00'), 'hour', Decimal('10'), 'tutoring', 2),
+            ('Group class', Decimal('1250'), 'term', Decimal('15'), 'classes', 3),
+        ])
+        self.assertEqual(ingest_price_list(vendor), (2, 4))  # replaces, not adds
+        self.assertEqual(VendorPriceItem.objects.filter(vendor=vendor).count(), 2)
+
+    def test_values_the_columns_cannot_hold_are_skipped(self):
+        vendor = self.vendor(b'item,price,discount\n'
+                             b'Session,99999999.99,\n'
+                             b'Too dear,100000000,\n'
+                             b'Rounds up,99999999.999,\n'
+                             b'Half off,40,50\n'
+                             b'Over,40,150\n'
+                             b'Under,40,-5\n'
+                             b'Too precise,40,12345\n')
+        self.assertEqual(ingest_price_list(vendor), (2, 5))
+        self.assertEqual(list(VendorPriceItem.objects.filter(vendor=vendor).order_by('row_number')
+                              .values_list('item', 'price', 'discount_percentage')),
+                         [('Session', Decimal('99999999.99'), Decimal('10')), ('Half off', Decimal('40'), Decimal('50'))])
+
+    def test_unreadable_lists_are_rejected(self):
+        vendor = self.vendor(b'foo,bar\n1,2\n')
+        with self.assertRaisesMessage(PriceListError, 'item and a price'):
+            ingest_price_list(vendor)
+        self.assertTrue(vendor.price_list.closed)
+        with self.assertRaisesMessage(PriceListError, 'empty'):
+            ingest_price_list(self.vendor(b''))
+        with self.assertRaisesMessage(PriceListError, 'Unsupported'):
+            ingest_price_list(self.vendor(b'%PDF', name='prices.pdf'))
+
+    @skipUnless(openpyxl, 'needs openpyxl')
+    def test_xlsx(self):
+        workbook = openpyxl.Workbook()
+        workbook.active.append(['Item', 'Price'])
+        workbook.active.append(['Weekly session', 40])
+        out = BytesIO()
+        workbook.save(out)
+        vendor = self.vendor(out.getvalue(), name='prices.xlsx')
+        self.assertEqual(ingest_price_list(vendor), (1, 0))
+        self.assertEqual(VendorPriceItem.objects.get(vendor=vendor).price, Decimal('40'))
+
+    def test_command_loads_new_and_replaced_lists_only(self):
+        vendor = self.vendor(b'item,price\nSession,40\n')
+        self.assertIsNotNone(vendor.price_list_updated_at)
+        call_command('ingest_price_lists', stdout=StringIO())
+        self.assertEqual(VendorPriceItem.objects.filter(vendor=vendor).count(), 1)
+
+        vendor = VendorSubmission.objects.get(id=vendor.id)
+        vendor.description = 'Edited'
+        vendor.save()
+        self.assertEqual(VendorSubmission.objects.get(id=vendor.id).price_list_updated_at, vendor.price_list_updated_at)
+        VendorPriceItem.objects.all().delete()
+        call_command('ingest_price_lists', stdout=StringIO())
+        self.assertFalse(VendorPriceItem.objects.exists())  # nothing new to load
+
+        vendor.price_list = SimpleUploadedFile('prices.csv', b'item,price\nSession,40\nClass,60\n')
+        vendor.save()
+        call_command('ingest_price_lists', stdout=StringIO())
+        self.assertEqual(VendorPriceItem.objects.filter(vendor=vendor).count(), 2)
+
+
+class SavingsTests(TestCase):
+    def vendor(self, **fields):
+        fields = {'service_name': 'Tutoring', 'contact_name': 'Vendor', 'email': 'v@example.com', 'is_approved': True,
+                  'service_price': Decimal('40'), 'discount_percentage': Decimal('10'), 'frequency': 'MONTHLY', **fields}
+        return VendorSubmission.objects.create(**fields)
+
+    def test_annual_savings(self):
+        self.assertEqual([savings.free_occurrences_per_year(text) for text in
+                          ['Once per week', 'Monthly', 'Annually', 'one-time', 'Whenever', '']], [52, 12, 1, 1, 1, 0])
+        discount = self.vendor()
+        free = self.vendor(frequency='WEEKLY', free_service_name='Trial', free_service_frequency='Once per month',
+                           overall_value=Decimal('25'))
+        self.vendor(is_approved=False)
+        table = savings.build_table()
+        self.assertEqual(set(table), {discount.id, free.id})
+        self.assertEqual(table[discount.id]['total_cents'], 4800)  # 10% of $40, 12 times a year
+        self.assertEqual((table[free.id]['discount_cents'], table[free.id]['free_service_cents']), (20800, 30000))
+
+    def test_api(self):
+        first, second = self.vendor(), self.vendor(frequency='YEARLY')
+        url = reverse('main:member_savings')
+        response = self.client.get(url, {'vendors': f'{first.id},{second.id},{first.id},999999'})
+        self.assertEqual(response.json()['total_annual_savings'], '52.00')
+        self.assertEqual([row['id'] for row in response.json()['vendors']], [first.id, second.id])
+        self.assertEqual(self.client.get(url, {'vendors': 'a,b'}).status_code, 400)
+        self.assertEqual(len(self.client.get(url).json()['vendors']), 2)
+
+    def test_without_a_shared_cache_every_lookup_reads_vendors(self):
+        vendor = self.vendor()
+        savings.get_table()
+        VendorSubmission.objects.filter(id=vendor.id).update(discount_percentage=Decimal('20'))  # no signals
+        with self.assertNumQueries(1):
+            self.assertEqual(savings.get_table()[vendor.id]['total_cents'], 9600)
+        with self.assertNumQueries(1):  # every vendor: the table is built once, not again for the bundle
+            self.assertEqual(len(self.client.get(reverse('main:member_savings')).json()['vendors']), 1)
+
+
+class SharedSavingsTableTests(SharedCacheMixin, TestCase):
+    def test_table_is_rebuilt_after_vendor_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            vendor = VendorSubmission.objects.create(service_name='Tutoring', contact_name='Vendor', email='v@example.com',
+                                                     is_approved=True, service_price=Decimal('40'),
+                                                     discount_percentage=Decimal('10'), frequency='MONTHLY')
+        self.assertEqual(savings.get_table()[vendor.id]['total_cents'], 4800)
+        with self.assertNumQueries(0):
+            savings.get_table()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            vendor.discount_percentage = Decimal('20')
+            vendor.save()
+        self.assertEqual(savings.get_table()[vendor.id]['total_cents'], 9600)
+        with self.captureOnCommitCallbacks(execute=True):
+            vendor.delete()
+        self.assertEqual(savings.get_table(), {})
+
+
+@mock.patch('main.payments.verify_ipn', return_value=True)
+class PaymentNotificationTests(TestCase):
+    def ipn(self, **fields):
+        fields = {'txn_id': 'TXN1', 'payment_status': 'Completed', 'mc_gross': '25.00', 'mc_currency': 'USD', 'first_name': 'Ada',
+                  'last_name': 'Lovelace', 'payer_email': 'ada@example.com', **fields}
+        return PaymentNotification.objects.create(payload=urlencode(fields))
+
+    def test_notifications_upsert_one_donation_per_transaction(self, verify):
+        self.ipn(payment_status='Pending')
+        self.ipn()
+        self.ipn(payment_status='Pending')  # late replay: doesn't undo Completed
+        self.assertEqual(payments.process_pending(), (3, 0))
+        donation = Donation.objects.get(transaction_id='TXN1')
+        self.assertEqual((donation.status, donation.amount, donation.donor_name), ('COMPLETED', Decimal('25.00'), 'Ada Lovelace'))
+        self.assertEqual(donation.payment_notifications.filter(processed_at__isnull=False).count(), 3)
+        self.assertEqual(verify.call_count, 3)
+
+        self.ipn(txn_id='TXN2', parent_txn_id='TXN1', payment_status='Refunded')
+        self.assertEqual(payments.process_pending(), (1, 0))
+        self.assertEqual(Donation.objects.get().status, 'CANCELLED')
+        self.assertEqual(payments.process_pending(), (0, 0))
+
+    def test_unverified_notifications_are_not_applied(self, verify):
+        verify.return_value = False
+        notification = self.ipn()
+        self.assertEqual(payments.process_pending(), (0, 1))
+        notification.refresh_from_db()
+        self.assertIsNone(notification.processed_at)
+        self.assertIn('did not verify', notification.error)
+        self.assertFalse(Donation.objects.exists())
+
+    def test_failures_back_off_and_do_not_block_the_queue(self, verify):
+        crash = self.ipn(txn_id='TXN2')
+        good = self.ipn(txn_id='TXN3')
+        real_upsert = payments.upsert_donation
+
+        def upsert(fields):
+            if fields['txn_id'] == 'TXN2':
+                raise ValueError('unexpected payload')
+            return real_upsert(fields)
+        with mock.patch('main.payments.upsert_donation', side_effect=upsert):
+            with self.assertLogs('main.payments', 'WARNING'):
+                self.assertEqual(payments.process_pending(), (1, 1))
+            good.refresh_from_db()
+            self.assertIsNotNone(good.processed_at)
+            crash.refresh_from_db()
+            self.assertEqual((crash.attempts, crash.claimed_by), (1, ''))
+            self.assertIn('unexpected payload', crash.error)
+            self.assertGreater(crash.next_attempt_at, timezone.now() + payments.RETRY_DELAY * 0.9)
+
+            self.assertEqual(payments.process_pending(), (0, 0))  # not due yet
+            for attempt in range(2, payments.MAX_ATTEMPTS + 1):
+                PaymentNotification.objects.update(next_attempt_at=timezone.now())
+                with self.assertLogs('main.payments', 'WARNING'):
+                    self.assertEqual(payments.process_pending(), (0, 1))
+                self.assertEqual(PaymentNotification.objects.get(id=crash.id).attempts, attempt)
+            PaymentNotification.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(payments.process_pending(), (0, 0))  # has had MAX_ATTEMPTS
+        self.assertLessEqual(payments.retry_delay(30), payments.RETRY_MAX_DELAY)
+
+    def test_invalid_notifications_fail_for_good_at_once(self, verify):
+        bad = [self.ipn(txn_id=f'BAD{n}', **fields) for n, fields in enumerate([
+            {'mc_gross': 'lots'}, {'mc_gross': 'NaN'}, {'mc_gross': 'Infinity'}, {'mc_gross': '-5'},
+            {'mc_gross': '1e12'}, {'mc_currency': 'EUR'}, {'mc_currency': ''},
+        ])]
+        with self.assertLogs('main.payments', 'ERROR'):
+            self.assertEqual(payments.process_pending(), (0, len(bad)))
+        PaymentNotification.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(payments.process_pending(), (0, 0))  # never claimed again
+        errors = [PaymentNotification.objects.get(id=n.id).error for n in bad]
+        self.assertTrue(all(error.startswith('Invalid mc_gross') for error in errors[:5]), errors)
+        self.assertTrue(all(error.startswith('Unexpected mc_currency') for error in errors[5:]), errors)
+        self.assertFalse(Donation.objects.exists())
+
+    def test_job_tries_each_notification_once_while_paypal_is_down(self, verify):
+        verify.side_effect = OSError('Connection refused')
+        for n in range(3):
+            self.ipn(txn_id=f'TXN{n}')
+        with mock.patch('main.jobs.close_old_connections'), self.assertLogs('main.payments', 'WARNING'):
+            jobs.enqueue('process_payment_notifications', key='payments')
+            jobs.work('test', until_empty=True)
+        self.assertEqual(verify.call_count, 3)
+        self.assertEqual(set(PaymentNotification.objects.values_list('attempts', flat=True)), {1})
+        self.assertTrue(Job.objects.filter(name='process_payment_notifications', status='QUEUED',
+                                           run_at__gt=timezone.now()).exists())  # the next sweep
+
+    def test_lost_claims_are_retried(self, verify):
+        notification = self.ipn()
+        [claimed] = payments.claim()
+        self.assertEqual(payments.claim(), [])
+        PaymentNotification.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(payments.process_pending(), (1, 0))
+        verify.return_value = False
+        with self.assertLogs('main.payments', 'WARNING'):
+            self.assertFalse(payments.process(claimed))
+        notification.refresh_from_db()  # the lost claim's failure isn't recorded over the success
+        self.assertEqual((notification.attempts, notification.error), (2, ''))
+        self.assertIsNotNone(notification.processed_at)
+
+
+class ReconciliationTests(TestCase):
+    EXPORT = ('Date,Transaction ID,Gross,Status\n'
+              '2025-03-15,TXN1,100.00,Completed\n'
+              '2025-03-15,TXN2,50.00,Completed\n'
+              '2025-04-02,TXN3,"$35.00",Completed\n'
+              '2025-04-02,TXN9,10.00,Completed\n'
+              '2025-04-02,TXN1,100.00,Completed\n'
+              '2025-04-02,TXN5,-20.00,Refunded\n'
+              '2025-04-03,TXN6,NaN,Completed\n'
+              '2025-04-03\n')
+
+    def setUp(self):
+        for txn, amount, status, month in [('TXN1', '100', 'COMPLETED', 3), ('TXN2', '50', 'PENDING', 3),
+                                           ('TXN3', '30', 'COMPLETED', 4), ('TXN4', '15', 'COMPLETED', 4),
+                                           ('TXN5', '20', 'COMPLETED', 4)]:
+            donation = Donation.objects.create(donor_name='Donor', donor_email='d@example.com', amount=Decimal(amount),
+                                               status=status, transaction_id=txn, payment_method='PayPal')
+            Donation.objects.filter(id=donation.id).update(donated_at=timezone.make_aware(datetime(2025, month, 15)))
+        rebuild_donation_rollups()
+
+    def reconcile(self, **options):
+        report = StringIO()
+        counts, corrected = reconcile(StringIO(self.EXPORT), report=report, **options)
+        return counts, corrected, list(csv.reader(StringIO(report.getvalue())))
+
+    def rollups(self):
+        return list(DonationRollup.objects.order_by('month', 'status').values_list('month', 'status', 'count', 'total'))
+
+    def test_rows_are_classified(self):
+        counts, corrected, report = self.reconcile()
+        self.assertEqual(counts, {'matched': 1, 'amount_mismatch': 1, 'status_mismatch': 2, 'missing': 1,
+                                  'duplicate': 1, 'not_in_export': 1, 'unreadable': 2})
+        self.assertEqual(corrected, 0)
+        self.assertEqual(Donation.objects.get(transaction_id='TXN2').status, 'PENDING')
+        self.assertEqual({(row[0], row[1]) for row in report[1:]}, {
+            ('amount_mismatch', 'TXN3'), ('status_mismatch', 'TXN2'), ('status_mismatch', 'TXN5'),
+            ('missing', 'TXN9'), ('duplicate', 'TXN1'), ('not_in_export', 'TXN4'),
+        })
+
+    def test_corrections_rebuild_the_affected_months(self):
+        march, april = date(2025, 3, 1), date(2025, 4, 1)
+        DonationRollup.objects.create(month=date(2025, 1, 1), status='COMPLETED', payment_method='PayPal',
+                                      count=7, total=Decimal('700'))  # deliberately wrong: not a touched month
+        _, corrected, _ = self.reconcile(apply=True)
+        self.assertEqual(corrected, 2)
+        self.assertEqual(dict(Donation.objects.values_list('transaction_id', 'status')),
+                         {'TXN1': 'COMPLETED', 'TXN2': 'COMPLETED', 'TXN3': 'COMPLETED', 'TXN4': 'COMPLETED',
+                          'TXN5': 'CANCELLED'})
+        self.assertEqual(Donation.objects.get(transaction_id='TXN3').amount, Decimal('30'))
+        self.assertEqual(self.rollups(), [
+            (date(2025, 1, 1), 'COMPLETED', 7, Decimal('700')),
+            (march, 'COMPLETED', 2, Decimal('150')),
+            (april, 'CANCELLED', 1, Decimal('20')),
+            (april, 'COMPLETED', 2, Decimal('45')),
+        ])
+
+        _, corrected, _ = self.reconcile(apply=True, fix_amounts=True)
+        self.assertEqual(corrected, 1)
+        self.assertEqual(Donation.objects.get(transaction_id='TXN3').amount, Decimal('35'))
+        self.assertIn((april, 'COMPLETED', 2, Decimal('50')), self.rollups())
+
+    def test_export_needs_the_key_columns(self):
+        with self.assertRaisesMessage(ValueError, 'amount, status'):
+            reconcile(StringIO('Transaction ID,Date\nTXN1,2025-03-15\n'))
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        staff = User.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True)
+        self.donation = Donation.objects.create(donor_name='=HYPERLINK("http://evil.example","x")', donor_email='@d@example.com',
+                                                amount=Decimal('-5.50'), status='COMPLETED', transaction_id='TXN1')
+        self.plain = Donation.objects.create(donor_name='Ada Lovelace', donor_email='ada@example.com', amount=Decimal('20'),
+                                             status='PENDING', transaction_id='TXN2', processed_by=staff)
+
+    def test_csv_cells_never_start_like_formulas(self):
+        rows = list(csv.reader(StringIO(''.join(exports.iter_csv('donations', chunk_size=1)))))
+        self.assertEqual(rows[0], exports.EXPORTS['donations'][1])
+        self.assertEqual(rows[1][1:4], ['\'=HYPERLINK("http://evil.example","x")', "'@d@example.com", '-5.50'])
+        self.assertEqual(rows[2][1:4], ['Ada Lovelace', 'ada@example.com', '20.00'])
+        self.assertEqual(rows[2][-1], 'staff')
+        self.assertEqual([exports.spreadsheet_text(value) for value in ['+1 555 0100', '-x', '\tcmd', 'a=b', 3]],
+                         ["'+1 555 0100", "'-x", "'\tcmd", 'a=b', 3])
+
+    def test_csv_view_streams_an_attachment(self):
+        self.client.force_login(User.objects.get(username='staff'))
+        response = self.client.get(reverse('main:export_csv', args=['donations']))
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="donations.csv"')
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 3)
+        self.assertEqual(self.client.get(reverse('main:export_csv', args=['nothing'])).status_code, 404)
+
+    @skipUnless(exports.pq is not None, 'needs pyarrow')
+    def test_parquet_keeps_types_and_values(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'donations.parquet')
+        self.assertEqual(exports.write_parquet('donations', path, chunk_size=1), 2)
+        table = exports.pq.read_table(path)
+        self.assertEqual(table.column_names, exports.EXPORTS['donations'][1])
+        self.assertEqual(str(table.schema.field('amount').type), 'decimal128(10, 2)')
+        self.assertEqual(table.column('donor_name').to_pylist(), [self.donation.donor_name, 'Ada Lovelace'])
+        self.assertEqual(table.column('amount').to_pylist(), [Decimal('-5.50'), Decimal('20.00')])
+        self.assertEqual(table.column('processed_by__username').to_pylist(), [None, 'staff'])
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.vendor = VendorSubmission.objects.create(service_name='Tutoring', contact_name='Vendor', email='v@example.com')
+
+    def donation_rollups(self):
+        return {(row.status, row.payment_method): (row.count, row.total)
+                for row in DonationRollup.objects.filter(count__gt=0)}
+
+    def test_saves_and_deletes_move_donation_totals(self):
+        donation = Donation.objects.create(donor_name='Ada', donor_email='ada@example.com', amount=Decimal('20'))
+        self.assertEqual(self.donation_rollups(), {('PENDING', 'Stripe'): (1, Decimal('20'))})
+        donation.status = 'COMPLETED'
+        donation.amount = Decimal('25')
+        donation.save()
+        self.assertEqual(self.donation_rollups(), {('COMPLETED', 'Stripe'): (1, Decimal('25'))})
+        Donation.objects.create(donor_name='Bob', donor_email='bob@example.com', amount=Decimal('5'), status='COMPLETED')
+        self.assertEqual(self.donation_rollups(), {('COMPLETED', 'Stripe'): (2, Decimal('30'))})
+        donation.delete()
+        self.assertEqual(self.donation_rollups(), {('COMPLETED', 'Stripe'): (1, Decimal('5'))})
+
+    def test_distribution_moves_to_the_month_it_was_distributed(self):
+        donation = Donation.objects.create(donor_name='Ada', donor_email='ada@example.com', amount=Decimal('20'))
+        distribution = FundDistribution.objects.create(donation=donation, vendor=self.vendor, amount=Decimal('15'), purpose='Fees')
+        distribution.status = 'DISTRIBUTED'
+        distribution.distributed_at = timezone.make_aware(datetime(2025, 3, 9, 12))
+        distribution.save()
+        rows = DistributionRollup.objects.filter(count__gt=0)
+        self.assertEqual([(row.month, row.vendor_id, row.status, row.count, row.total) for row in rows],
+                         [(date(2025, 3, 1), self.vendor.id, 'DISTRIBUTED', 1, Decimal('15'))])
+
+    def test_deferred_loads_dont_query_per_row(self):
+        for i in range(5):
+            Donation.objects.create(donor_name=f'Donor {i}', donor_email=f'd{i}@example.com', amount=Decimal('10'))
+        with self.assertNumQueries(1):
+            list(Donation.objects.only('id', 'donor_name'))
+
+    def test_saving_a_deferred_load_keeps_totals(self):
+        Donation.objects.create(donor_name='Ada', donor_email='ada@example.com', amount=Decimal('20'))
+        donation = Donation.objects.only('id', 'status').get()
+        donation.status = 'COMPLETED'
+        donation.save(update_fields=['status'])
+        self.assertEqual(self.donation_rollups(), {('COMPLETED', 'Stripe'): (1, Decimal('20'))})
+        Donation.objects.defer('amount').get().delete()
+        self.assertEqual(self.donation_rollups(), {})
+
+    def test_stale_copies_dont_drift_the_totals(self):
+        Donation.objects.create(donor_name='Ada', donor_email='ada@example.com', amount=Decimal('20'))
+        # Two requests load the same row, then save one after the other
+        first, second = Donation.objects.get(), Donation.objects.get()
+        first.status = 'COMPLETED'
+        first.save()
+        second.status = 'CANCELLED'
+        second.save()
+        self.assertEqual(self.donation_rollups(), {('CANCELLED', 'Stripe'): (1, Decimal('20'))})
+        first.delete()
+        self.assertEqual(self.donation_rollups(), {})
+
+    def test_a_failed_delta_rolls_back_the_save(self):
+        with mock.patch('main.rollups.add', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            Donation.objects.create(donor_name='Ada', donor_email='ada@example.com', amount=Decimal('20'))
+        self.assertFalse(Donation.objects.exists())
+
+    def test_backfill_migration_matches_the_signals(self):
+        donation = Donation.objects.create(donor_name='Ada', donor_email='ada@example.com', amount=Decimal('20'))
+        FundDistribution.objects.create(donation=donation, vendor=self.vendor, amount=Decimal('15'), purpose='Fees')
+        expected = self.donation_rollups()
+        DonationRollup.objects.all().delete()
+        DistributionRollup.objects.all().delete()
+        migration = import_module('main.migrations.0010_rollups')
+        migration.backfill_rollups(django_apps, None)
+        self.assertEqual(self.donation_rollups(), expected)
+        self.assertEqual(DistributionRollup.objects.get().total, Decimal('15'))
+
+    def test_financial_report_totals_and_year_filter(self):
+        self.client.force_login(User.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True))
+        for year, amount in [(2024, '12.50'), (2025, '30'), (2025, '7.25')]:
+            donation = Donation.objects.create(donor_name='Ada', donor_email='ada@example.com', amount=Decimal(amount), status='COMPLETED')
+            Donation.objects.filter(id=donation.id).update(donated_at=timezone.make_aware(datetime(year, 6, 1)))
+        rebuild_donation_rollups()
+        response = self.client.get(reverse('main:financial_report'))
+        self.assertEqual(response.context['years'], [2025, 2024])
+        self.assertContains(response, '$37.25')
+        self.assertContains(response, '$12.50')
+        response = self.client.get(reverse('main:financial_report'), {'year': '2024'})
+        self.assertContains(response, '$12.50')
+        self.assertNotContains(response, '$37.25')
+
+
+class AsyncViewTests(TempMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True)
+        self.item = DataVaultItem.objects.create(title='Certificate', uploaded_by=self.staff,
+                                                 file=SimpleUploadedFile('certificate.pdf', b'%PDF' + b'x' * 1000))
+
+    async def test_vendor_submission(self):
+        response = await self.async_client.post(reverse('main:vendor'), {
+            'service_name': 'Tutoring', 'contact_name': 'Vendor', 'email': 'v@example.com', 'frequency': 'MONTHLY',
+            'price_list': SimpleUploadedFile('prices.csv', b'Service,Cost\nSession,40\n'),
+        })
+        self.assertRedirects(response, reverse('main:vendor'), fetch_redirect_response=False)
+        vendor = await VendorSubmission.objects.aget()
+        self.assertEqual(vendor.service_name, 'Tutoring')
+        self.assertTrue(await Notification.objects.filter(template='vendor_submission_received', to_email='v@example.com').aexists())
+        response = await self.async_client.post(reverse('main:vendor'), {'service_name': 'Missing the rest'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(await VendorSubmission.objects.acount(), 1)
+
+    async def test_csv_export_streams_asynchronously(self):
+        for n in range(5):
+            await Donation.objects.acreate(donor_name=f'Donor {n}', donor_email=f'd{n}@example.com', amount=Decimal('10'))
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(reverse('main:export_csv', args=['donations']))
+        self.assertTrue(response.is_async)  # not read into a list before sending
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(content.splitlines()), 6)
+        chunks = [chunk async for chunk in exports.aiter_csv('donations', chunk_size=2)]
+        self.assertEqual([chunk.count('\n') for chunk in chunks], [2, 2, 2])
+        self.assertEqual(''.join(chunks).encode(), content)
+
+    async def test_upload_document(self):
+        response = await self.async_client.post(reverse('main:upload_document'), {
+            'participant_email': 'ada@example.com', 'participant_name': 'Ada', 'document_type': 'CPR',
+            'file': SimpleUploadedFile('cpr.pdf', b'%PDF'),
+        })
+        self.assertRedirects(response, reverse('main:membership'), fetch_redirect_response=False)
+        document = await MemberDocument.objects.select_related('participant').aget()
+        self.assertEqual((document.participant.email, document.document_type), ('ada@example.com', 'CPR'))
+        response = await self.async_client.post(reverse('main:upload_document'), {
+            'document_type': 'CPR', 'file': SimpleUploadedFile('cpr.pdf', b'%PDF'),
+        })
+        self.assertContains(response, 'Please provide your email address.')
+
+    async def test_donate(self):
+        response = await self.async_client.get(reverse('main:donate'), {'success': '1'})
+        self.assertContains(response, 'Thank you for your donation!')
+        response = await self.async_client.post(reverse('main:donate'))
+        self.assertRedirects(response, reverse('main:donate'), fetch_redirect_response=False)
+
+    async def test_paypal_ipn_stores_the_body_and_queues_one_job(self):
+        body = 'txn_id=TXN1&payment_status=Completed&mc_gross=10.00'
+        for _ in range(2):
+            response = await self.async_client.post(reverse('main:paypal_ipn'), body,
+                                                    content_type='application/x-www-form-urlencoded')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual([n.payload async for n in PaymentNotification.objects.all()], [body, body])
+        self.assertEqual(await Job.objects.filter(name='process_payment_notifications').acount(), 1)
+
+    async def test_data_vault_pages_need_staff(self):
+        response = await self.async_client.get(reverse('main:data_vault_list'))
+        self.assertEqual(response.status_code, 302)
+        await self.async_client.aforce_login(self.staff)
+        for url in (reverse('main:data_vault_list'), reverse('main:data_vault_upload'),
+                    reverse('main:data_vault_view', args=[self.item.id])):
+            with self.subTest(url=url):
+                self.assertContains(await self.async_client.get(url), 'Certificate')
+
+    async def test_data_vault_download_streams_and_counts(self):
+        await self.async_client.aforce_login(self.staff)
+        response = await self.async_client.get(reverse('main:data_vault_download', args=[self.item.id]))
+        self.assertEqual(response['Content-Length'], '1004')
+        self.assertEqual(response['Cache-Control'], 'private, no-store')
+        self.assertIn('attachment; filename="certificate', response['Content-Disposition'])
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), b'%PDF' + b'x' * 1000)
+        await self.item.arefresh_from_db()
+        self.assertEqual(self.item.access_count, 1)
+        response = await self.async_client.get(reverse('main:data_vault_download', args=[self.item.id + 1]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_data_vault_download_closes_the_file_on_error(self):
+        await self.async_client.aforce_login(self.staff)
+        opened = []
+        storage_open = default_storage.open
+
+        def tracking_open(name, mode='rb'):
+            opened.append(storage_open(name, mode))
+            return opened[-1]
+
+        with mock.patch.object(default_storage, 'open', tracking_open), \
+                mock.patch('django.db.models.QuerySet.aupdate', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                await self.async_client.get(reverse('main:data_vault_download', args=[self.item.id]))
+        self.assertEqual(len(opened), 1)
+        self.assertTrue(opened[0].closed)
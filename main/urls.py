@@ -7,23 +7,40 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('about/', views.about, name='about'),
     path('programs/', views.list_programs, name='list_programs'),
+    path('programs/calendar.ics', views.program_calendar, name='program_calendar'),
     path('programs/<int:program_id>/', views.program_detail, name='program_detail'),
+    path('programs/<int:program_id>/enroll/', views.program_enroll, name='program_enroll'),
+    path('programs/enroll/<str:token>/', views.program_enroll_confirm, name='program_enroll_confirm'),
     path('programs/new/', views.new_program, name='new_program'),
     path('participants/', views.list_participants, name='list_participants'),
     path('participants/new/', views.new_participant, name='new_participant'),
     path('membership/', views.membership, name='membership'),
     path('membership/upload-document/', views.upload_document, name='upload_document'),
     path('donate/', views.donate, name='donate'),
+    path('donate/ipn/', views.paypal_ipn, name='paypal_ipn'),
     path('vendor/', views.vendor, name='vendor'),
+    path('api/savings/', views.member_savings, name='member_savings'),
+    path('metrics/', views.metrics, name='metrics'),
     path('register/', views.register, name='register'),
     path('admin/login/', views.admin_login, name='admin_login'),
     path('admin/dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('admin/participants/import/', views.participant_import, name='participant_import'),
     path('admin/fund-distributions/', views.fund_distribution_list, name='fund_distribution_list'),
     path('admin/fund-distributions/new/', views.fund_distribution_new, name='fund_distribution_new'),
+    path('admin/fund-distributions/donations/', views.fund_distribution_donations, name='fund_distribution_donations'),
+    path('admin/fund-distributions/vendors/', views.fund_distribution_vendors, name='fund_distribution_vendors'),
     path('admin/fund-distributions/<int:distribution_id>/approve/', views.fund_distribution_approve, name='fund_distribution_approve'),
     path('admin/fund-distributions/<int:distribution_id>/distribute/', views.fund_distribution_distribute, name='fund_distribution_distribute'),
+    path('admin/member-documents/review/', views.member_document_review, name='member_document_review'),
+    path('admin/vendor-catalog/', views.vendor_catalog, name='vendor_catalog'),
+    path('admin/reports/financial/', views.financial_report, name='financial_report'),
+    path('admin/exports/<slug:name>.csv', views.export_csv, name='export_csv'),
+    path('admin/previews/<path:name>', views.preview, name='preview'),
     path('admin/data-vault/', views.data_vault_list, name='data_vault_list'),
     path('admin/data-vault/upload/', views.data_vault_upload, name='data_vault_upload'),
+    path('admin/data-vault/participants/', views.data_vault_participants, name='data_vault_participants'),
+    path('admin/data-vault/vendors/', views.data_vault_vendors, name='data_vault_vendors'),
     path('admin/data-vault/<int:item_id>/', views.data_vault_view, name='data_vault_view'),
+    path('admin/data-vault/<int:item_id>/download/', views.data_vault_download, name='data_vault_download'),
 ]
 
@@ -0,0 +1,9 @@
+"""Small helpers shared by the app's modules and benchmarks."""
+from itertools import islice
+
+
+def batched(iterable, size):
+    """Lists of up to `size` items from an iterable, without reading ahead of the current one"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
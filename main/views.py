@@ -1,15 +1,50 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
 from django.views.decorators.http import require_http_methods
-from django.views.decorators.csrf import csrf_protect
+from django.views.decorators.csrf import csrf_protect, csrf_exempt
 from django.db import models as django_models
-from .models import Program, Participant, Document, Course, Quiz, Video, Test, Certification, MemberDocument, VendorSubmission, Donation, FundDistribution, DataVaultItem
-from .forms import ProgramForm, ParticipantForm, UserRegistrationForm, DocumentUploadForm, VendorSubmissionForm
+from .models import Program, Participant, Document, Course, Quiz, Video, Test, Certification, MemberDocument, VendorSubmission, Donation, FundDistribution, DataVaultItem, DonationRollup, DistributionRollup
+from .forms import ProgramForm, ProgramEnrollmentForm, ParticipantForm, ParticipantImportForm, UserRegistrationForm, DocumentUploadForm, VendorSubmissionForm, DataVaultItemForm
+from .previews import PREVIEW_DIR, thumbnail_url
+from .parsing import parse_decimal
+from .pricelists import search_catalog
+from . import savings
 from decimal import Decimal
 
+# Number of documents shown per page of the review queue
+REVIEW_PAGE_SIZE = 50
+
+# Browser cache lifetime for generated previews (seconds)
+PREVIEW_MAX_AGE = 7 * 24 * 60 * 60
+
+# Shared cache lifetime for the program calendar feed; changes show up after at most this long (seconds)
+CALENDAR_MAX_AGE = 15 * 60
+
+# Number of families shown per page when listing participants by children's ages
+AGE_BAND_PAGE_SIZE = 50
+
+# Number of items shown per page of the data vault
+VAULT_PAGE_SIZE = 50
+
+# Bytes read per step when streaming a vault file
+VAULT_CHUNK_SIZE = 256 * 1024
+
+# Most matches returned by the distribution form's search endpoints
+AUTOCOMPLETE_LIMIT = 20
+
+# Sorts after every character: key >= term AND key < term + PREFIX_END selects keys starting with term
+PREFIX_END = chr(0x10FFFF)
+
+# Template rendering reads the session and user lazily, which must happen off the event loop
+arender = sync_to_async(render)
+
 
 def index(request):
     """Home page"""
@@ -27,15 +62,112 @@ def about(request):
 
 
 def list_programs(request):
-    """List all programs"""
-    programs = Program.objects.all()
-    return render(request, 'programs.html', {'programs': programs})
+    """List the programs in one month (?month=YYYY-MM, default this month) in date order"""
+    from datetime import datetime, timedelta
+    from django.utils import timezone
+    from .schedule import local_midnight, next_month
+
+    try:
+        month = datetime.strptime(request.GET.get('month', ''), '%Y-%m').date()
+    except ValueError:
+        month = timezone.localdate().replace(day=1)
+    programs = Program.objects.filter(
+        starts_at__gte=local_midnight(month), starts_at__lt=local_midnight(next_month(month))
+    ).order_by('starts_at', 'id')
+    return render(request, 'programs.html', {
+        'programs': programs,
+        'month': month,
+        'previous_month': (month - timedelta(days=1)).replace(day=1),
+        'next_month': next_month(month),
+    })
+
+
+def program_calendar(request):
+    """iCalendar feed of upcoming programs, for calendar apps to subscribe to"""
+    from django.http import HttpResponse, StreamingHttpResponse
+    from django.utils.cache import get_conditional_response, patch_cache_control
+    from . import caching, schedule
+
+    plan = schedule.segments()
+    if caching.is_shared():
+        etag = schedule.etag(plan)
+        # Unchanged since the subscriber's last poll: 304 without reading any programs
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = StreamingHttpResponse(schedule.feed(plan), content_type='text/calendar; charset=utf-8')
+    else:
+        # No shared cache to version the months by: build the feed and tag its bytes
+        content = b''.join(schedule.feed(plan))
+        etag = schedule.content_etag(content)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(content, content_type='text/calendar; charset=utf-8')
+    if response.status_code == 200:
+        response['Content-Disposition'] = 'inline; filename="programs.ics"'
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=CALENDAR_MAX_AGE)
+    return response
 
 
 def program_detail(request, program_id):
     """View a single program"""
+    from .children import count_families
+
     program = get_object_or_404(Program, id=program_id)
-    return render(request, 'program_detail.html', {'program': program})
+    # Staff see how many registered families the program's age band reaches
+    families = None
+    if program.age_band and request.user.is_staff:
+        families = count_families(*program.age_band)
+    return render(request, 'program_detail.html', {'program': program, 'families': families})
+
+
+@require_http_methods(["GET", "POST"])
+def program_enroll(request, program_id):
+    """Email a registered participant a link that enrolls them in a program"""
+    from .enrollment import confirmation_token
+    from .notifications import notify
+
+    program = get_object_or_404(Program, id=program_id)
+    if request.method == 'POST':
+        form = ProgramEnrollmentForm(request.POST)
+        if form.is_valid():
+            participant = form.participant
+            if participant is not None:
+                link = reverse('main:program_enroll_confirm', args=[confirmation_token(program.id, participant.id)])
+                notify('enrollment_confirmation', participant.email, {
+                    'name': participant.name, 'program': program.title, 'date': f'{program.date:%B %d, %Y}',
+                    'link': request.build_absolute_uri(link),
+                })
+            # The same answer for any address, registered or not
+            messages.info(request, f'If {form.cleaned_data["email"]} is registered with us, we have emailed it '
+                                   f'a link to confirm the enrollment in {program.title}.')
+            return redirect('main:program_detail', program_id=program.id)
+    else:
+        form = ProgramEnrollmentForm()
+    return render(request, 'program_enroll.html', {'program': program, 'form': form})
+
+
+@require_http_methods(["GET", "POST"])
+def program_enroll_confirm(request, token):
+    """Enroll a participant from their emailed link, or waitlist them if the program is full"""
+    from .enrollment import confirmed_enrollment, enroll, waitlist_position
+
+    confirmed = confirmed_enrollment(token)
+    if confirmed is None:
+        messages.error(request, 'This enrollment link is invalid or has expired. Please enroll again.')
+        return redirect('main:list_programs')
+    program = get_object_or_404(Program, id=confirmed[0])
+    participant = get_object_or_404(Participant, id=confirmed[1])
+    # A GET only asks: mail scanners follow links, and must not enroll anyone
+    if request.method == 'POST':
+        enrollment = enroll(program.id, participant.id)
+        if enrollment.status == 'ENROLLED':
+            messages.success(request, f'{participant.name} is enrolled in {program.title}.')
+        else:
+            messages.info(request, f'{program.title} is full, so {participant.name} is on the waitlist '
+                                   f'(position {waitlist_position(enrollment)}). We will enroll you when a seat opens.')
+        return redirect('main:program_detail', program_id=program.id)
+    return render(request, 'program_enroll_confirm.html', {'program': program, 'participant': participant})
 
 
 @require_http_methods(["GET", "POST"])
@@ -46,16 +178,37 @@ def new_program(request):
         if form.is_valid():
             form.save()
             messages.success(request, 'Program created successfully!')
-            return redirect('list_programs')
+            return redirect('main:list_programs')
     else:
         form = ProgramForm()
     return render(request, 'new_program.html', {'form': form})
 
 
 def list_participants(request):
-    """List all participants"""
-    participants = Participant.objects.all()
-    return render(request, 'participants.html', {'participants': participants})
+    """List all participants, or those with children in an age band"""
+    from .children import count_families, with_children_aged
+
+    min_age, max_age = request.GET.get('min_age', ''), request.GET.get('max_age', '')
+    low = int(min_age) if min_age.isdigit() else None
+    high = int(max_age) if max_age.isdigit() else None
+    if low is None and high is None:
+        participants = Participant.objects.all()
+        return render(request, 'participants.html', {'participants': participants})
+
+    # Keyset pagination, newest first: the band can match most of the table
+    after = request.GET.get('after', '')
+    participants = with_children_aged(Participant.objects.order_by('-id'), low, high)
+    if after.isdigit():
+        participants = participants.filter(id__lt=int(after))
+    page = list(participants[:AGE_BAND_PAGE_SIZE + 1])
+    next_after = page[AGE_BAND_PAGE_SIZE - 1].id if len(page) > AGE_BAND_PAGE_SIZE else None
+    return render(request, 'participants.html', {
+        'participants': page[:AGE_BAND_PAGE_SIZE],
+        'min_age': low,
+        'max_age': high,
+        'families': count_families(low, high),
+        'next_after': next_after,
+    })
 
 
 @require_http_methods(["GET", "POST"])
@@ -66,7 +219,7 @@ def new_participant(request):
         if form.is_valid():
             form.save()
             messages.success(request, 'Participant registered successfully!')
-            return redirect('list_participants')
+            return redirect('main:list_participants')
     else:
         form = ParticipantForm()
     return render(request, 'new_participant.html', {'form': form})
@@ -78,12 +231,16 @@ def membership(request):
 
 
 @require_http_methods(["GET", "POST"])
-def vendor(request):
+async def vendor(request):
     """Vendor page"""
     if request.method == 'POST':
         form = VendorSubmissionForm(request.POST, request.FILES)
-        if form.is_valid():
-            form.save()
+        if await sync_to_async(form.is_valid)():
+            from .notifications import notify
+            submission = await sync_to_async(form.save)()
+            await sync_to_async(notify)('vendor_submission_received', submission.email, {
+                'contact_name': submission.contact_name, 'service_name': submission.service_name,
+            })
             messages.success(request, 'Thank you for your submission! We will review your service offering and get back to you soon.')
             return redirect('main:vendor')
         else:
@@ -91,19 +248,19 @@ def vendor(request):
     else:
         form = VendorSubmissionForm()
     
-    return render(request, 'vendor.html', {'vendor_form': form})
+    return await arender(request, 'vendor.html', {'vendor_form': form})
 
 
 @require_http_methods(["GET", "POST"])
-def upload_document(request):
+async def upload_document(request):
     """Handle document uploads for membership pre-qualification"""
     if request.method == 'POST':
         form = DocumentUploadForm(request.POST, request.FILES)
-        if form.is_valid():
+        if await sync_to_async(form.is_valid)():
             # Get or create participant based on email
             email = request.POST.get('participant_email')
             if email:
-                participant, created = Participant.objects.get_or_create(
+                participant, created = await Participant.objects.aget_or_create(
                     email=email,
                     defaults={
                         'name': request.POST.get('participant_name', ''),
@@ -113,7 +270,11 @@ def upload_document(request):
                 )
                 document = form.save(commit=False)
                 document.participant = participant
-                document.save()
+                await document.asave()
+                from .notifications import notify
+                await sync_to_async(notify)('document_received', participant.email, {
+                    'name': participant.name, 'document_type': document.get_document_type_display(),
+                })
                 messages.success(request, f'Document uploaded successfully! Your {document.get_document_type_display()} has been received.')
                 return redirect('main:membership')
             else:
@@ -123,11 +284,11 @@ def upload_document(request):
     else:
         form = DocumentUploadForm()
     
-    return render(request, 'membership.html', {'document_form': form})
+    return await arender(request, 'membership.html', {'document_form': form})
 
 
 @require_http_methods(["GET", "POST"])
-def donate(request):
+async def donate(request):
     """Donate page"""
     # Handle PayPal return URLs
     if request.GET.get('success') == '1':
@@ -137,9 +298,25 @@ def donate(request):
     
     if request.method == 'POST':
         messages.success(request, 'Thank you for your donation! Your support makes a difference.')
-        return redirect('donate')
+        return redirect('main:donate')
     
-    return render(request, 'donate.html')
+    return await arender(request, 'donate.html')
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def paypal_ipn(request):
+    """Receive a PayPal IPN and queue it for the payment worker"""
+    from django.http import HttpResponse
+    from .models import PaymentNotification
+
+    from .jobs import enqueue
+
+    # Store the body untouched: verification must echo it back to PayPal byte for byte
+    await PaymentNotification.objects.acreate(provider='PAYPAL', payload=request.body.decode('ascii', 'replace'))
+    # One queued run drains every pending notification, however many arrive before it starts
+    await sync_to_async(enqueue)('process_payment_notifications', key='payments')
+    return HttpResponse(status=200)
 
 
 @csrf_protect
@@ -155,6 +332,8 @@ def register(request):
         form = UserRegistrationForm(request.POST)
         if form.is_valid():
             user = form.save()
+            from .notifications import notify
+            notify('welcome', user.email, {'name': user.first_name or user.username})
             # Automatically log in the user after registration
             login(request, user)
             messages.success(request, f'Account created successfully! Welcome, {user.username}!')
@@ -204,8 +383,9 @@ def admin_dashboard(request):
     """Admin dashboard"""
     from django.db.models import Sum
     
-    total_donations = Donation.objects.filter(status='COMPLETED').aggregate(Sum('amount'))['amount__sum'] or Decimal('0.00')
-    total_distributed = FundDistribution.objects.filter(status='DISTRIBUTED').aggregate(Sum('amount'))['amount__sum'] or Decimal('0.00')
+    # Read totals from the monthly rollups rather than summing every donation
+    total_donations = DonationRollup.objects.filter(status='COMPLETED').aggregate(Sum('total'))['total__sum'] or Decimal('0.00')
+    total_distributed = DistributionRollup.objects.filter(status='DISTRIBUTED').aggregate(Sum('total'))['total__sum'] or Decimal('0.00')
     available_funds = total_donations - total_distributed
     
     stats = {
@@ -225,6 +405,34 @@ def admin_dashboard(request):
     return render(request, 'admin/dashboard.html', {'stats': stats})
 
 
+@staff_member_required
+@require_http_methods(["GET", "POST"])
+def participant_import(request):
+    """Queue a bulk import of participants from a CSV or XLSX file"""
+    from .models import Job
+    from .participant_import import ParticipantImportError, queue_import
+
+    if request.method == 'POST':
+        form = ParticipantImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                queue_import(form.cleaned_data['file'], request.user.email)
+            except ParticipantImportError as e:
+                form.add_error('file', str(e))
+            else:
+                results = f' The results will be emailed to {request.user.email}.' if request.user.email else ''
+                messages.success(request, f'{form.cleaned_data["file"].name} will be imported shortly.{results}')
+                return redirect('main:participant_import')
+        messages.error(request, 'Please correct the errors below.')
+    else:
+        form = ParticipantImportForm()
+
+    return render(request, 'admin/participants/import.html', {
+        'form': form,
+        'imports': Job.objects.filter(name='import_participants').order_by('-id')[:10],
+    })
+
+
 @staff_member_required
 def fund_distribution_list(request):
     """List all fund distributions"""
@@ -272,13 +480,69 @@ def fund_distribution_new(request):
         except (Donation.DoesNotExist, VendorSubmission.DoesNotExist, ValueError) as e:
             messages.error(request, 'Invalid donation or vendor selected, or invalid amount.')
     
-    # Get available donations and approved vendors
-    available_donations = Donation.objects.filter(status='COMPLETED').order_by('-donated_at')
-    approved_vendors = VendorSubmission.objects.filter(is_approved=True).order_by('service_name')
-    
-    return render(request, 'admin/fund_distributions/new.html', {
-        'donations': available_donations,
-        'vendors': approved_vendors,
+    # Donations and vendors are picked through the search endpoints below, so the form is the same size however many there are
+    return render(request, 'admin/fund_distributions/new.html')
+
+
+def _prefix_search(queryset, fields, term, limit=AUTOCOMPLETE_LIMIT):
+    """Up to `limit` rows (dicts, from a values() queryset) with any of `fields` starting with term, ignoring case"""
+    from django.db.models.functions import Lower
+
+    term = term.strip().lower()
+    matches = {}
+    # One range scan of each field's Lower() index, so the cost doesn't grow with the table
+    for field in fields:
+        rows = (queryset.annotate(search_key=Lower(field))
+                .filter(search_key__gte=term, search_key__lt=term + PREFIX_END)
+                .order_by('search_key')[:limit])
+        for row in rows:
+            matches.setdefault(row['id'], row)
+    return sorted(matches.values(), key=lambda row: row['search_key'])[:limit]
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def fund_distribution_donations(request):
+    """Completed donations whose donor name or email starts with ?q=, with the amount left to distribute, as JSON"""
+    from django.db.models import Sum
+    from django.http import JsonResponse
+
+    donations = _prefix_search(
+        Donation.objects.filter(status='COMPLETED').values('id', 'donor_name', 'donor_email', 'amount', 'donated_at'),
+        ['donor_name', 'donor_email'], request.GET.get('q', ''))
+    allocated = dict(
+        FundDistribution.objects.filter(donation__in=[donation['id'] for donation in donations], status__in=['PENDING', 'APPROVED', 'DISTRIBUTED'])
+        .values('donation').annotate(total=Sum('amount')).values_list('donation', 'total')
+    )
+    return JsonResponse({
+        'results': [
+            {
+                'id': donation['id'],
+                'donor_name': donation['donor_name'],
+                'donor_email': donation['donor_email'],
+                'amount': f"{donation['amount']:.2f}",
+                'remaining': f"{donation['amount'] - allocated.get(donation['id'], Decimal('0.00')):.2f}",
+                'donated_at': donation['donated_at'].date().isoformat(),
+            }
+            for donation in donations
+        ],
+    })
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def fund_distribution_vendors(request):
+    """Approved vendors whose service or business name starts with ?q=, as JSON"""
+    from django.http import JsonResponse
+
+    vendors = _prefix_search(
+        VendorSubmission.objects.filter(is_approved=True).values('id', 'service_name', 'business_name', 'contact_name'),
+        ['service_name', 'business_name'], request.GET.get('q', ''))
+    return JsonResponse({
+        'results': [
+            {name: vendor[name] for name in ('id', 'service_name', 'business_name', 'contact_name')}
+            for vendor in vendors
+        ],
     })
 
 
@@ -286,13 +550,19 @@ def fund_distribution_new(request):
 @require_http_methods(["GET", "POST"])
 def fund_distribution_approve(request, distribution_id):
     """Approve a fund distribution"""
-    distribution = get_object_or_404(FundDistribution, id=distribution_id)
+    from .notifications import notify
+
+    distribution = get_object_or_404(FundDistribution.objects.select_related('vendor'), id=distribution_id)
     
     if request.method == 'POST':
         if distribution.status == 'PENDING':
             distribution.status = 'APPROVED'
             distribution.approved_by = request.user
             distribution.save()
+            vendor = distribution.vendor
+            notify('distribution_approved', vendor.email, {
+                'contact_name': vendor.contact_name, 'service_name': vendor.service_name, 'amount': str(distribution.amount),
+            })
             messages.success(request, f'Fund distribution of ${distribution.amount} has been approved.')
         else:
             messages.error(request, 'Only pending distributions can be approved.')
@@ -318,3 +588,314 @@ def fund_distribution_distribute(request, distribution_id):
             messages.error(request, 'Only approved distributions can be marked as distributed.')
     
     return redirect('main:fund_distribution_list')
+
+
+@staff_member_required
+@require_http_methods(["GET", "POST"])
+def member_document_review(request):
+    """Review queue for member documents awaiting verification"""
+    from django.utils import timezone
+
+    pending = MemberDocument.objects.filter(is_reviewed=False)
+
+    if request.method == 'POST':
+        verify_ids = []
+        reject_ids = []
+        for key, decision in request.POST.items():
+            if not key.startswith('decision_'):
+                continue
+            try:
+                document_id = int(key[len('decision_'):])
+            except ValueError:
+                continue
+            if decision == 'verify':
+                verify_ids.append(document_id)
+            elif decision == 'reject':
+                reject_ids.append(document_id)
+
+        # One UPDATE per decision instead of a load-and-save per document
+        now = timezone.now()
+        verified = pending.filter(id__in=verify_ids).update(is_reviewed=True, is_verified=True, reviewed_at=now) if verify_ids else 0
+        rejected = pending.filter(id__in=reject_ids).update(is_reviewed=True, is_verified=False, reviewed_at=now) if reject_ids else 0
+        messages.success(request, f'{verified} document(s) verified, {rejected} rejected.')
+
+        # Reviewed documents drop out of the queue, so stay on the same page
+        url = reverse('main:member_document_review')
+        after = request.POST.get('after', '')
+        if after.isdigit():
+            url += f'?after={after}'
+        return redirect(url)
+
+    # Keyset pagination: page by id instead of OFFSET so deep pages stay cheap
+    after = request.GET.get('after', '')
+    documents = pending.select_related('participant').order_by('-id')
+    if after.isdigit():
+        documents = documents.filter(id__lt=int(after))
+    else:
+        after = ''
+
+    page = list(documents[:REVIEW_PAGE_SIZE + 1])
+    next_after = page[REVIEW_PAGE_SIZE - 1].id if len(page) > REVIEW_PAGE_SIZE else None
+    page = page[:REVIEW_PAGE_SIZE]
+    for document in page:
+        document.thumbnail_url = thumbnail_url(document.file)
+
+    return render(request, 'admin/member_documents/review.html', {
+        'documents': page,
+        'after': after,
+        'next_after': next_after,
+    })
+
+
+@staff_member_required
+def preview(request, name):
+    """Serve a generated preview image with cache headers"""
+    from django.core.files.storage import default_storage
+    from django.http import FileResponse, Http404
+    from django.utils.cache import patch_cache_control
+
+    path = f'{PREVIEW_DIR}/{name}'
+    if '..' in name.split('/') or not default_storage.exists(path):
+        raise Http404('Preview not found')
+
+    response = FileResponse(default_storage.open(path, 'rb'), content_type='image/jpeg')
+    # Previews of member files are sensitive, so only the browser may cache them
+    patch_cache_control(response, private=True, max_age=PREVIEW_MAX_AGE)
+    return response
+
+
+@staff_member_required
+def data_vault_list(request):
+    """List data vault items"""
+    category = request.GET.get('category', '')
+    query = request.GET.get('q', '').strip()
+
+    items = DataVaultItem.objects.select_related('participant', 'vendor', 'uploaded_by').order_by('-id')
+    if category:
+        items = items.filter(category=category)
+    if query:
+        items = items.filter(
+            django_models.Q(title__icontains=query) | django_models.Q(tags__icontains=query) |
+            django_models.Q(participant__name__icontains=query) | django_models.Q(vendor__service_name__icontains=query)
+        )
+    # Keyset pagination: ?after=<id> stays fast however deep the list goes
+    after = request.GET.get('after')
+    if after and after.isdigit():
+        items = items.filter(id__lt=int(after))
+    items = list(items[:VAULT_PAGE_SIZE + 1])
+    next_after = items[VAULT_PAGE_SIZE - 1].id if len(items) > VAULT_PAGE_SIZE else None
+
+    return render(request, 'admin/data_vault/list.html', {
+        'items': items[:VAULT_PAGE_SIZE],
+        'categories': DataVaultItem.CATEGORY_CHOICES,
+        'category': category,
+        'query': query,
+        'next_after': next_after,
+    })
+
+
+@staff_member_required
+@require_http_methods(["GET", "POST"])
+def data_vault_upload(request):
+    """Upload a certificate or document to the data vault"""
+    if request.method == 'POST':
+        form = DataVaultItemForm(request.POST, request.FILES)
+        if form.is_valid():
+            item = form.save(commit=False)
+            item.uploaded_by = request.user
+            item.save()
+            messages.success(request, f'"{item.title}" has been added to the data vault.')
+            return redirect('main:data_vault_view', item_id=item.id)
+        else:
+            messages.error(request, 'Please correct the errors below.')
+    else:
+        form = DataVaultItemForm()
+
+    return render(request, 'admin/data_vault/upload.html', {'form': form})
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def data_vault_participants(request):
+    """Participants whose email starts with ?q=, for the upload page's participant search, as JSON"""
+    from django.http import JsonResponse
+
+    participants = _prefix_search(Participant.objects.values('id', 'name', 'email'), ['email'], request.GET.get('q', ''))
+    return JsonResponse({
+        'results': [{name: participant[name] for name in ('id', 'name', 'email')} for participant in participants],
+    })
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def data_vault_vendors(request):
+    """Vendors, approved or not, whose service or business name starts with ?q=, as JSON"""
+    from django.http import JsonResponse
+
+    vendors = _prefix_search(
+        VendorSubmission.objects.values('id', 'service_name', 'business_name', 'contact_name'),
+        ['service_name', 'business_name'], request.GET.get('q', ''))
+    return JsonResponse({
+        'results': [
+            {name: vendor[name] for name in ('id', 'service_name', 'business_name', 'contact_name')}
+            for vendor in vendors
+        ],
+    })
+
+
+@staff_member_required
+def data_vault_view(request, item_id):
+    """View a data vault item"""
+    item = get_object_or_404(DataVaultItem.objects.select_related('participant', 'vendor', 'uploaded_by'), id=item_id)
+    return render(request, 'admin/data_vault/view.html', {
+        'item': item,
+        'thumbnail': thumbnail_url(item.file),
+    })
+
+
+async def read_chunks(file, chunk_size=VAULT_CHUNK_SIZE):
+    """Yield a file's contents, reading in a worker thread so the event loop never blocks on disk"""
+    try:
+        while chunk := await asyncio.to_thread(file.read, chunk_size):
+            yield chunk
+    finally:
+        await asyncio.to_thread(file.close)
+
+
+@staff_member_required
+async def data_vault_download(request, item_id):
+    """Stream a data vault file and record the access"""
+    import mimetypes
+    import os
+    from django.core.handlers.asgi import ASGIRequest
+    from django.db.models import F
+    from django.http import FileResponse, Http404, StreamingHttpResponse
+    from django.utils import timezone
+    from django.utils.http import content_disposition_header
+
+    item = await DataVaultItem.objects.only('file').filter(id=item_id).afirst()
+    if item is None or not item.file:
+        raise Http404('Item not found')
+    try:
+        file = await asyncio.to_thread(item.file.storage.open, item.file.name, 'rb')
+    except FileNotFoundError:
+        raise Http404('File not found')
+    try:
+        size = await asyncio.to_thread(item.file.storage.size, item.file.name)
+        await DataVaultItem.objects.filter(id=item_id).aupdate(access_count=F('access_count') + 1, last_accessed=timezone.now())
+
+        filename = os.path.basename(item.file.name)
+        if isinstance(request, ASGIRequest):
+            response = StreamingHttpResponse(read_chunks(file), content_type=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+            response['Content-Length'] = size
+            response['Content-Disposition'] = content_disposition_header(True, filename)
+        else:
+            # Under WSGI the server thread is tied up either way; let it use wsgi.file_wrapper
+            response = FileResponse(file, as_attachment=True, filename=filename)
+        file = None  # the response closes it once sent
+    finally:
+        if file is not None:
+            await asyncio.to_thread(file.close)
+    response['Cache-Control'] = 'private, no-store'
+    return response
+
+
+def metrics(request):
+    """Request metrics in Prometheus text format"""
+    from django.conf import settings
+    from django.http import HttpResponse, HttpResponseForbidden
+    from .instrumentation import registry
+
+    allowed_ips = getattr(settings, 'PERFORMANCE_METRICS_IPS', [])
+    if request.META.get('REMOTE_ADDR') not in allowed_ips and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@staff_member_required
+def vendor_catalog(request):
+    """Search the vendor pricing catalog"""
+    category = request.GET.get('category', '').strip()
+    max_price = parse_decimal(request.GET.get('max_price'))
+    min_discount = parse_decimal(request.GET.get('min_discount'))
+
+    items = search_catalog(category=category, max_price=max_price, min_discount=min_discount)
+    return render(request, 'admin/vendor_catalog.html', {
+        'items': items,
+        'category': category,
+        'max_price': max_price,
+        'min_discount': min_discount,
+    })
+
+
+def _dollars(cents):
+    return f'{cents / 100:.2f}'
+
+
+@require_http_methods(["GET"])
+def member_savings(request):
+    """Annual member savings for a bundle of vendors, as JSON"""
+    from django.http import JsonResponse
+
+    vendor_ids = request.GET.get('vendors', '')
+    if vendor_ids:
+        try:
+            ids = [int(vendor_id) for vendor_id in vendor_ids.split(',') if vendor_id.strip()]
+        except ValueError:
+            return JsonResponse({'error': 'vendors must be a comma-separated list of ids'}, status=400)
+        bundle = savings.bundle_savings(ids)
+    else:
+        bundle = savings.bundle_savings()
+
+    return JsonResponse({
+        'vendors': [
+            {
+                'id': row['id'],
+                'service_name': row['service_name'],
+                'business_name': row['business_name'],
+                'discount_savings': _dollars(row['discount_cents']),
+                'free_service_savings': _dollars(row['free_service_cents']),
+                'annual_savings': _dollars(row['total_cents']),
+            }
+            for row in bundle['vendors']
+        ],
+        'total_annual_savings': _dollars(bundle['total_cents']),
+    })
+
+
+@staff_member_required
+def export_csv(request, name):
+    """Stream a data export as CSV"""
+    from django.core.handlers.asgi import ASGIRequest
+    from django.http import Http404, StreamingHttpResponse
+    from .exports import EXPORTS, aiter_csv, iter_csv
+
+    if name not in EXPORTS:
+        raise Http404('Unknown export')
+    # ASGI would read a sync generator into memory whole before sending it
+    rows = aiter_csv(name) if isinstance(request, ASGIRequest) else iter_csv(name)
+    response = StreamingHttpResponse(rows, content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{name}.csv"'
+    return response
+
+
+@staff_member_required
+def financial_report(request):
+    """Monthly donation and distribution report, read from the rollup tables"""
+    donation_rows = DonationRollup.objects.filter(count__gt=0)
+    distribution_rows = DistributionRollup.objects.filter(count__gt=0).select_related('vendor')
+
+    year = request.GET.get('year', '')
+    if year.isdigit():
+        donation_rows = donation_rows.filter(month__year=int(year))
+        distribution_rows = distribution_rows.filter(month__year=int(year))
+    else:
+        year = ''
+
+    years = DonationRollup.objects.dates('month', 'year', order='DESC')
+    return render(request, 'admin/reports/financial.html', {
+        'donation_rows': donation_rows,
+        'distribution_rows': distribution_rows,
+        'year': year,
+        'years': [d.year for d in years],
+    })
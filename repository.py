@@ -0,0 +1,184 @@
+"""
+In-memory repository layer for the Flask app (app.py).
+
+Records are kept in a dict keyed by id, so lookups are O(1) instead of a scan
+over a list, and ids come from a monotonic counter, so deleting a record can
+never cause a later one to reuse its id. Records use __slots__ rather than a
+per-item dict to keep memory per record down.
+
+Run ``python repository.py`` for a lookup/memory benchmark.
+"""
+import itertools
+from contextlib import contextmanager
+
+
+class Record:
+    """Base for fixed-field records; subclasses list their fields in __slots__"""
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.pop(name, ''))
+        if fields:
+            raise TypeError(f"Unknown field(s) for {type(self).__name__}: {', '.join(fields)}")
+
+    def __getitem__(self, name):
+        # Keeps dict-style access (record['title']) working for existing callers
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name)
+
+    def get(self, name, default=None):
+        return getattr(self, name, default)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def to_row(self):
+        """Field values as a tuple, in __slots__ order"""
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    @classmethod
+    def from_row(cls, row):
+        """Inverse of to_row(); skips __init__'s checks, so only for trusted rows"""
+        record = object.__new__(cls)
+        for name, value in zip(cls.__slots__, row):
+            setattr(record, name, value)
+        return record
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.id}>'
+
+
+class Program(Record):
+    __slots__ = ('id', 'title', 'description', 'date', 'time', 'location', 'created_at')
+
+
+class Participant(Record):
+    __slots__ = ('id', 'name', 'email', 'phone', 'children_ages', 'registered_at')
+
+
+class Document(Record):
+    __slots__ = ('id', 'title', 'content', 'category', 'created_at', 'created_by')
+
+
+class Course(Record):
+    __slots__ = ('id', 'title', 'description', 'content', 'duration', 'level', 'created_at', 'created_by')
+
+
+class Quiz(Record):
+    __slots__ = ('id', 'title', 'description', 'questions', 'time_limit', 'created_at', 'created_by')
+
+
+class Video(Record):
+    __slots__ = ('id', 'title', 'description', 'video_url', 'thumbnail_url', 'duration', 'category', 'created_at', 'created_by')
+
+
+class Test(Record):
+    __slots__ = ('id', 'title', 'description', 'questions', 'time_limit', 'passing_score', 'created_at', 'created_by')
+
+
+class Certification(Record):
+    __slots__ = ('id', 'title', 'description', 'requirements', 'validity_period', 'associated_course', 'created_at', 'created_by')
+
+
+class MemoryBackend:
+    """
+    Default backend: records live only in this process.
+
+    A backend exposes ``items`` (id -> record), ``refresh()`` to pick up changes
+    made elsewhere, a ``writing()`` context manager held around each change,
+    and ``next_id()``/``put()``/``remove()``. See storage.LogBackend for one
+    that persists to disk.
+    """
+
+    def __init__(self, start_id=1):
+        self.items = {}
+        self._ids = itertools.count(start_id)  # next() is atomic under the GIL
+
+    def refresh(self):
+        pass
+
+    @contextmanager
+    def writing(self):
+        yield
+
+    def next_id(self):
+        return next(self._ids)
+
+    def put(self, record):
+        self.items[record.id] = record
+
+    def remove(self, record_id):
+        return self.items.pop(record_id, None)
+
+
+class Repository:
+    """Dict-backed store of one record type with monotonic id allocation"""
+
+    def __init__(self, record_class, start_id=1, backend=None):
+        self.record_class = record_class
+        self.backend = backend if backend is not None else MemoryBackend(start_id)
+
+    def add(self, **fields):
+        """Create a record with the next id and store it"""
+        with self.backend.writing():
+            record = self.record_class(id=self.backend.next_id(), **fields)
+            self.backend.put(record)
+        return record
+
+    def get(self, record_id):
+        self.backend.refresh()
+        return self.backend.items.get(record_id)
+
+    def delete(self, record_id):
+        with self.backend.writing():
+            return self.backend.remove(record_id)
+
+    def all(self):
+        """Snapshot of all records in creation order"""
+        self.backend.refresh()
+        return list(self.backend.items.values())
+
+    def __len__(self):
+        self.backend.refresh()
+        return len(self.backend.items)
+
+    def __iter__(self):
+        return iter(self.all())
+
+
+def _benchmark():
+    import timeit
+    import tracemalloc
+
+    print(f"{'items':>10} {'list scan (us)':>16} {'repository (us)':>16}")
+    for size in (10, 1_000, 100_000, 1_000_000):
+        as_dicts = [{'id': i, 'title': f'Doc {i}', 'content': 'x'} for i in range(1, size + 1)]
+        repo = Repository(Document)
+        for i in range(size):
+            repo.add(title=f'Doc {i}', content='x')
+        target = size  # worst case for the scan: the last item
+        scan_runs = max(1, 100_000 // size)
+        scan = timeit.timeit(lambda: next((d for d in as_dicts if d['id'] == target), None), number=scan_runs) / scan_runs
+        lookup = timeit.timeit(lambda: repo.get(target), number=100_000) / 100_000
+        print(f'{size:>10} {scan * 1e6:>16.3f} {lookup * 1e6:>16.3f}')
+
+    count = 100_000
+    for label, build in (
+        ('dict records', lambda: [{'id': i, 'title': 'Doc', 'content': 'x', 'category': 'General',
+                                   'created_at': '', 'created_by': 'Admin'} for i in range(count)]),
+        ('slots records', lambda: [Document(id=i, title='Doc', content='x', category='General',
+                                            created_at='', created_by='Admin') for i in range(count)]),
+    ):
+        tracemalloc.start()
+        records = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del records
+        print(f'{label}: {size / count:.0f} bytes per record')
+
+
+if __name__ == '__main__':
+    _benchmark()
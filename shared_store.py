@@ -0,0 +1,207 @@
+"""
+Shared data layer: lets the Flask app (app.py) use the Django project's database.
+
+With ``FLASK_STORAGE=django`` every Flask repository is a ModelRepository that
+reads and writes the ``main`` app's models through the Django ORM, configured
+standalone from config.settings, so Flask and Django serve the same rows with
+no second copy to keep in sync. Reads use values_list() and build lightweight
+records directly from the row tuples, skipping model instances. Pages are
+rendered with Django's template engine, since the templates are Django
+templates.
+
+Run ``python shared_store.py`` to benchmark list_programs under Flask on the
+shared store against the Django view.
+"""
+import os
+from itertools import groupby
+
+
+def setup():
+    """Configure Django for use outside manage.py / the WSGI handler"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+
+def init_app(app):
+    """Give Flask the connection handling Django does around each request"""
+    from django.db import close_old_connections
+
+    app.before_request(close_old_connections)
+    app.teardown_request(lambda exc: close_old_connections())
+
+
+class FlashMessage:
+    """Flask flash message shaped like a django.contrib.messages message for base.html"""
+
+    def __init__(self, category, message):
+        self.tags = category
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+
+def render_template(template_name, **context):
+    from django.template.loader import render_to_string
+    from flask import get_flashed_messages
+
+    messages = [FlashMessage(category, message) for category, message in get_flashed_messages(with_categories=True)]
+    return render_to_string(template_name, {'messages': messages, **context})
+
+
+class ModelRepository:
+    """Repository (see repository.py) over a Django model instead of process memory"""
+
+    # Record field -> ORM lookup, where the names differ
+    lookups = {
+        'created_by': 'created_by__username',
+        'associated_course': 'associated_course_id',
+    }
+
+    def __init__(self, model, record_class, question_model=None):
+        self.model = model
+        self.record_class = record_class
+        self.question_model = question_model
+        self.fields = [name for name in record_class.__slots__ if name != 'questions']
+        self.values = [self.lookups.get(name, name) for name in self.fields]
+
+    def _records(self, queryset):
+        rows = queryset.values_list(*self.values)
+        if self.question_model is None:
+            return [self.record_class(**dict(zip(self.fields, row))) for row in rows]
+
+        records = [self.record_class(**dict(zip(self.fields, row)), questions=[]) for row in rows]
+        by_id = {record.id: record for record in records}
+        # One query for every record's questions rather than one per record
+        owner = self.question_model._meta.get_field(self.model._meta.model_name).attname
+        columns = [owner, 'question', 'option_1', 'option_2', 'option_3', 'option_4', 'correct_answer']
+        has_points = any(field.name == 'points' for field in self.question_model._meta.fields)
+        if has_points:
+            columns.append('points')
+        questions = self.question_model.objects.filter(**{f'{owner}__in': by_id}).order_by(owner, 'id').values_list(*columns)
+        for owner_id, rows in groupby(questions, key=lambda row: row[0]):
+            for row in rows:
+                question = {'question': row[1], 'options': list(row[2:6]), 'correct_answer': row[6]}
+                if has_points:
+                    question['points'] = row[7]
+                by_id[owner_id].questions.append(question)
+        return records
+
+    def add(self, **fields):
+        """Create a row from Flask form fields and return it as a record"""
+        from django.contrib.auth.models import User
+        from django.db import transaction
+
+        questions = fields.pop('questions', [])
+        values = {}
+        for name, value in fields.items():
+            field = self.model._meta.get_field(name)
+            if getattr(field, 'auto_now_add', False):
+                continue  # the model stamps its own timestamps
+            if name == 'created_by':
+                value = User.objects.filter(username=value).first()
+            elif field.is_relation:
+                name, value = field.attname, int(value) if value else None
+            values[name] = value
+
+        with transaction.atomic():
+            instance = self.model.objects.create(**values)
+            if self.question_model is not None:
+                owner = self.model._meta.model_name
+                self.question_model.objects.bulk_create([
+                    self.question_model(
+                        **{owner: instance},
+                        question=question['question'],
+                        option_1=question['options'][0], option_2=question['options'][1],
+                        option_3=question['options'][2], option_4=question['options'][3],
+                        correct_answer=question['correct_answer'],
+                        **({'points': question['points']} if 'points' in question else {}),
+                    )
+                    for question in questions
+                ])
+        return self.get(instance.pk)
+
+    def get(self, record_id):
+        records = self._records(self.model.objects.filter(pk=record_id))
+        return records[0] if records else None
+
+    def delete(self, record_id):
+        record = self.get(record_id)
+        if record is not None:
+            self.model.objects.filter(pk=record_id).delete()
+        return record
+
+    def all(self):
+        return self._records(self.model.objects.all())
+
+    def __len__(self):
+        return self.model.objects.count()
+
+    def __iter__(self):
+        return iter(self.all())
+
+
+def repositories():
+    """A ModelRepository for each of the Flask app's stores, keyed by store name"""
+    from main import models
+    import repository
+
+    return {
+        'programs': ModelRepository(models.Program, repository.Program),
+        'participants': ModelRepository(models.Participant, repository.Participant),
+        'documents': ModelRepository(models.Document, repository.Document),
+        'courses': ModelRepository(models.Course, repository.Course),
+        'quizzes': ModelRepository(models.Quiz, repository.Quiz, models.QuizQuestion),
+        'videos': ModelRepository(models.Video, repository.Video),
+        'tests': ModelRepository(models.Test, repository.Test, models.TestQuestion),
+        'certifications': ModelRepository(models.Certification, repository.Certification),
+    }
+
+
+def _benchmark(count=200, requests=200):
+    os.environ['FLASK_STORAGE'] = 'django'
+    setup()
+    import time
+    from datetime import date, time as time_of_day
+
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+
+    from main.models import Program
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        programs = [
+            Program(title=f'Program {i}', description='Weekly session for parents and guardians',
+                    date=date(2025, 1, 1), time=time_of_day(18, 0), location='Community Center')
+            for i in range(count)
+        ]
+        for program in programs:
+            program.set_schedule()  # bulk_create skips save(), which fills starts_at/ends_at
+        Program.objects.bulk_create(programs)
+        import app as flask_app
+        flask_client = flask_app.app.test_client()
+        django_client = Client()
+
+        def timed(label, call, number):
+            call()
+            start = time.perf_counter()
+            for _ in range(number):
+                call()
+            elapsed = time.perf_counter() - start
+            print(f'{label:>28}: {number / elapsed:8.1f} /s  {elapsed / number * 1000:7.2f} ms')
+
+        print(f'list_programs, {count} programs (in-process, no network)')
+        timed('data: shared store records', flask_app.programs.all, requests)
+        timed('data: Django model instances', lambda: list(Program.objects.all()), requests)
+        timed('page: Flask + shared store', lambda: flask_client.get('/programs'), requests)
+        timed('page: Django view', lambda: django_client.get('/programs/'), requests)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    _benchmark()
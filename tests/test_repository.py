@@ -0,0 +1,65 @@
+import unittest
+
+from repository import Document, MemoryBackend, Program, Repository
+
+
+class RecordTests(unittest.TestCase):
+    def test_missing_fields_default_to_empty(self):
+        document = Document(id=1, title='Guide')
+        self.assertEqual(document.to_dict(), {'id': 1, 'title': 'Guide', 'content': '', 'category': '',
+                                              'created_at': '', 'created_by': ''})
+
+    def test_unknown_fields_are_rejected(self):
+        with self.assertRaisesRegex(TypeError, 'Unknown field'):
+            Document(id=1, colour='red')
+
+    def test_dict_style_access(self):
+        document = Document(id=1, title='Guide')
+        self.assertEqual(document['title'], 'Guide')
+        self.assertEqual(document.get('nothing', 'x'), 'x')
+        with self.assertRaises(KeyError):
+            document['nothing']
+
+    def test_rows_round_trip(self):
+        program = Program(id=3, title='Swim', date='2026-11-01', time='10:00')
+        row = program.to_row()
+        self.assertEqual(row[:2], (3, 'Swim'))
+        self.assertEqual(Program.from_row(row).to_dict(), program.to_dict())
+
+
+class RepositoryTests(unittest.TestCase):
+    def setUp(self):
+        self.repo = Repository(Document)
+
+    def test_add_get_all(self):
+        first = self.repo.add(title='One')
+        second = self.repo.add(title='Two')
+        self.assertEqual((first.id, second.id), (1, 2))
+        self.assertIs(self.repo.get(2), second)
+        self.assertIsNone(self.repo.get(3))
+        self.assertEqual([record.title for record in self.repo.all()], ['One', 'Two'])
+        self.assertEqual(len(self.repo), 2)
+        self.assertEqual(list(self.repo), [first, second])
+
+    def test_delete(self):
+        record = self.repo.add(title='One')
+        self.assertIs(self.repo.delete(record.id), record)
+        self.assertIsNone(self.repo.delete(record.id))
+        self.assertEqual(self.repo.all(), [])
+
+    def test_deleted_ids_are_never_reused(self):
+        for title in ('One', 'Two', 'Three'):
+            self.repo.add(title=title)
+        self.repo.delete(3)
+        self.repo.delete(2)
+        self.assertEqual(self.repo.add(title='Four').id, 4)
+
+    def test_start_id(self):
+        self.assertEqual(Repository(Document, start_id=10).add(title='One').id, 10)
+        self.assertEqual(Repository(Document, backend=MemoryBackend(5)).add().id, 5)
+
+    def test_all_is_a_snapshot(self):
+        self.repo.add(title='One')
+        records = self.repo.all()
+        self.repo.add(title='Two')
+        self.assertEqual(len(records), 1)
@@ -0,0 +1,122 @@
+"""
+Flask app on the shared Django store (FLASK_STORAGE=django).
+
+Needs Django configured: DJANGO_SETTINGS_MODULE defaults to config.settings,
+and the tests run against a throwaway test database. Run with
+``python -m unittest discover -s tests -t .``.
+"""
+import importlib
+import os
+from datetime import date, time as time_of_day
+
+import shared_store
+
+shared_store.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import TestCase  # noqa: E402
+from django.test.utils import setup_test_environment, teardown_test_environment  # noqa: E402
+
+from main import models  # noqa: E402
+import repository  # noqa: E402
+
+flask_app = None
+old_name = None
+
+
+def setUpModule():
+    global flask_app, old_name
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    os.environ['FLASK_STORAGE'] = 'django'
+    flask_app = importlib.import_module('app')
+    # As Django's test client does: keep the connection open for each test's transaction
+    flask_app.app.before_request_funcs.pop(None, None)
+    flask_app.app.teardown_request_funcs.pop(None, None)
+
+
+def tearDownModule():
+    connection.creation.destroy_test_db(old_name, verbosity=0)
+    teardown_test_environment()
+
+
+class ModelRepositoryTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user('admin', 'admin@example.com', 'pw')
+        self.repositories = shared_store.repositories()
+
+    def test_add_get_delete(self):
+        documents = self.repositories['documents']
+        document = documents.add(title='Guide', content='Text', category='General', created_at='2026-01-01 10:00:00',
+                                 created_by='admin')
+        self.assertIsInstance(document, repository.Document)
+        self.assertEqual((document.title, document.created_by), ('Guide', 'admin'))
+        self.assertNotEqual(document.created_at, '2026-01-01 10:00:00')  # the model stamps its own
+        self.assertEqual(documents.get(document.id).to_dict(), document.to_dict())
+        self.assertEqual(len(documents), 1)
+        self.assertEqual([record.id for record in documents], [document.id])
+        self.assertEqual(documents.delete(document.id).id, document.id)
+        self.assertIsNone(documents.delete(document.id))
+        self.assertIsNone(documents.get(document.id))
+
+    def test_unknown_creator_is_left_empty(self):
+        course = self.repositories['courses'].add(title='Basics', description='', content='', created_by='nobody')
+        self.assertIsNone(course.created_by)
+
+    def test_program_from_form_strings(self):
+        program = self.repositories['programs'].add(title='CPR', description='', date='2026-11-01', time='10:00',
+                                                    location='YMCA Hall', created_at='2026-01-01 10:00:00')
+        self.assertEqual((program.date, program.time), (date(2026, 11, 1), time_of_day(10)))
+        self.assertIsNotNone(models.Program.objects.get().starts_at)
+
+    def test_questions_round_trip(self):
+        quizzes, tests = self.repositories['quizzes'], self.repositories['tests']
+        questions = [
+            {'question': '2 + 2?', 'options': ['3', '4', '5', ''], 'correct_answer': 2},
+            {'question': 'Capital of France?', 'options': ['Paris', 'Rome', '', ''], 'correct_answer': 1},
+        ]
+        quiz = quizzes.add(title='Maths', description='', questions=questions, created_by='admin')
+        quizzes.add(title='Empty', description='', questions=[], created_by='admin')
+        self.assertEqual(quiz.questions, questions)
+        test = tests.add(title='Final', description='', passing_score=80, created_by='admin',
+                         questions=[{**questions[0], 'points': 3}])
+        self.assertEqual(test.questions, [{**questions[0], 'points': 3}])
+        self.assertEqual(models.TestQuestion.objects.get().points, 3)
+
+        # One query for the records and one for all their questions
+        with self.assertNumQueries(2):
+            by_title = {record.title: record.questions for record in quizzes.all()}
+        self.assertEqual(by_title, {'Maths': questions, 'Empty': []})
+        quizzes.delete(quiz.id)
+        self.assertFalse(models.QuizQuestion.objects.exists())
+
+
+class FlaskPageTests(TestCase):
+    def setUp(self):
+        self.client = flask_app.app.test_client()
+        models.Program.objects.create(title='Story Time', description='Weekly reading', date=date(2026, 11, 2),
+                                      time=time_of_day(10), location='Library')
+
+    def test_public_pages(self):
+        for url in ('/', '/programs', '/participants', '/about', '/membership'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertIn(b'Story Time', self.client.get('/programs').data)
+
+    def test_registration_writes_the_shared_database(self):
+        response = self.client.post('/participants/new', data={
+            'name': 'Ada', 'email': 'ada@example.com', 'phone': '555-0100', 'children_ages': '4, 7',
+        }, follow_redirects=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Participant registered successfully!', response.data)  # Flask flash in base.html
+        self.assertEqual(models.Participant.objects.get().email, 'ada@example.com')
+        self.assertIn(b'Ada', self.client.get('/participants').data)
+
+    def test_admin_dashboard_counts(self):
+        shared_store.repositories()['documents'].add(title='Guide', content='', category='General')
+        self.client.post('/admin/login', data={'username': 'admin', 'password': 'admin123'})
+        response = self.client.get('/admin')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(flask_app.documents.model, models.Document)
+        self.assertEqual(len(flask_app.documents), 1)
@@ -0,0 +1,145 @@
+import fcntl
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from repository import Repository, Document
+from storage import LogBackend
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Appends records until it is killed
+STORAGE_WRITER = '''
+import sys
+sys.path.insert(0, {root!r})
+from repository import Repository, Document
+from storage import LogBackend
+repo = Repository(Document, backend=LogBackend({path!r}, Document, compact_every=200))
+print('ready', flush=True)
+while True:
+    repo.add(title='Doc', content='x' * 500)
+'''
+
+
+class LogBackendRecoveryTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'documents')
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def open(self, **kwargs):
+        backend = LogBackend(self.path, Document, **kwargs)
+        self.addCleanup(backend.close)
+        return Repository(Document, backend=backend)
+
+    def assertIntact(self, repo):
+        ids = sorted(record.id for record in repo)
+        self.assertEqual(ids, list(range(1, len(ids) + 1)))
+        for record in repo:
+            self.assertEqual((record.title, record.content), ('Doc', 'x' * 500))
+
+    def test_reopen_restores_records(self):
+        repo = self.open(compact_every=3)
+        for _ in range(5):
+            repo.add(title='Doc', content='x' * 500)
+        repo.delete(2)
+
+        reopened = self.open()
+        self.assertEqual([record.id for record in reopened], [1, 3, 4, 5])
+        self.assertEqual(reopened.add(title='Doc').id, 6)
+
+    def test_torn_tail_is_dropped(self):
+        repo = self.open()
+        repo.add(title='Doc', content='x' * 500)
+        with open(self.path + '.log', 'ab') as log:
+            log.write(b'0badc0de {"op":"put","record":{"id":2,')
+
+        reopened = self.open()
+        self.assertIntact(reopened)
+        self.assertEqual(len(reopened), 1)
+        self.assertEqual(reopened.add(title='Doc', content='x' * 500).id, 2)
+        self.assertIntact(self.open())
+
+    def test_crash_between_snapshot_and_log_swap(self):
+        repo = self.open()
+        for _ in range(3):
+            repo.add(title='Doc', content='x' * 500)
+        shutil.copy(self.path + '.log', self.path + '.old')
+        repo.backend.compact()
+        # Put back the pre-compaction log, as if the process died before replacing it
+        os.replace(self.path + '.old', self.path + '.log')
+
+        reopened = self.open()
+        self.assertEqual(len(reopened), 3)
+        reopened.add(title='Doc', content='x' * 500)
+        self.assertEqual(len(self.open()), 4)
+
+    def test_other_processes_see_changes(self):
+        writer, reader = self.open(compact_every=2), self.open()
+        writer.add(title='Doc', content='x' * 500)
+        self.assertEqual(len(reader), 1)
+        writer.add(title='Doc', content='x' * 500)  # compacts
+        writer.add(title='Doc', content='x' * 500)
+        self.assertEqual([record.id for record in reader], [1, 2, 3])
+        self.assertEqual(reader.add(title='Doc').id, 4)
+        self.assertEqual(len(writer), 4)
+
+    def test_readers_see_the_old_items_during_a_reload(self):
+        writer, reader = self.open(compact_every=2), self.open()
+        for _ in range(3):
+            writer.add(title='Doc', content='x' * 500)
+        self.assertEqual(len(reader), 3)
+        writer.add(title='Doc', content='x' * 500)  # compacts, so the reader reloads from the snapshot
+        seen = []
+        read_snapshot = reader.backend._read_snapshot
+
+        def reading_snapshot():
+            seen.append(len(reader.backend.items))  # what another thread would get meanwhile
+            return read_snapshot()
+        with mock.patch.object(reader.backend, '_read_snapshot', reading_snapshot):
+            self.assertEqual(len(reader), 4)
+        self.assertEqual(seen, [3])
+
+    def test_killed_mid_write(self):
+        script = STORAGE_WRITER.format(root=ROOT, path=self.path)
+        for delay in (0.05, 0.2, 0.13, 0.31, 0.08):
+            process = subprocess.Popen([sys.executable, '-c', script], stdout=subprocess.PIPE)
+            self.assertEqual(process.stdout.readline(), b'ready\n')
+            time.sleep(delay)
+            process.send_signal(signal.SIGKILL)
+            process.wait()
+            process.stdout.close()
+
+            repo = self.open()
+            self.assertIntact(repo)
+            self.assertGreater(len(repo), 0)
+            repo.backend.close()
+
+    def test_forked_workers_lock_each_other_out(self):
+        repo = self.open()
+        repo.add(title='Doc', content='x' * 500)  # opened before the fork, as app.py does at import
+        locked, done = os.pipe(), os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                with repo.backend.writing():
+                    os.write(locked[1], b'x')
+                    os.read(done[0], 1)
+            finally:
+                os._exit(0)
+        try:
+            self.assertEqual(os.read(locked[0], 1), b'x')
+            with self.assertRaises(BlockingIOError):
+                fcntl.flock(repo.backend._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        finally:
+            os.write(done[1], b'x')
+            os.waitpid(pid, 0)
+            for fd in (*locked, *done):
+                os.close(fd)
+        self.assertEqual(len(repo), 1)